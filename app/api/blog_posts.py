@@ -1,69 +1,177 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from app.core.database import get_db
+from app.core.cache import POSTS_SCOPE, RELATED_SCOPE, TRENDING_SCOPE, post_scope, response_cache
+from app.core.config import settings
+from app.core.database import SessionLocal, engine, get_async_db, get_db
 from app.models.blog_post import BlogPost, BlogPostTag, BlogPostImage
 from app.schemas.blog_post import (
     BlogPostCreate,
     BlogPostUpdate,
     BlogPostResponse,
+    BlogPostBatchCreateRequest,
+    BlogPostBatchUpdateRequest,
     AIGenerateRequest
 )
-from app.services.blog_post_service import BlogPostService
-from app.services.ai_service import AIService
+from app.services.blog_post_service import BlogPostService, migrate_post_indexes
+from app.services.comment_service import migrate_comment_count
+from app.services.async_blog_post_service import AsyncBlogPostService
+from app.services.ai_service import ai_service
+from app.services.archive_service import export_posts, import_posts
+from app.services.generation_jobs import QueueFullError, generated_post_data, generation_jobs
+from app.services.post_render_service import migrate_post_rendering
+from app.services.related_posts import related_posts
+from app.services.search_service import init_search_index
+from app.services.stats_service import ensure_statistics, migrate_statistics
+from app.services.tag_service import migrate_tag_links
+from app.services.trending import WINDOWS, migrate_view_buckets, trending_posts
+from app.services.view_counter import view_counter
 from datetime import datetime
+from sqlalchemy.exc import SQLAlchemyError
+import httpx
+import json
 
 router = APIRouter()
+router.add_event_handler("startup", lambda: migrate_tag_links(engine))
+router.add_event_handler("startup", lambda: migrate_post_rendering(engine))
+router.add_event_handler("startup", lambda: migrate_comment_count(engine))
+router.add_event_handler("startup", lambda: migrate_post_indexes(engine))
+router.add_event_handler("startup", lambda: migrate_statistics(engine))
+router.add_event_handler("startup", lambda: migrate_view_buckets(engine))
+router.add_event_handler("startup", lambda: init_search_index(engine))
+router.add_event_handler("startup", view_counter.start)
+router.add_event_handler("shutdown", view_counter.stop)
+router.add_event_handler("startup", lambda: ensure_statistics(SessionLocal))
+router.add_event_handler("startup", ai_service.start)
+router.add_event_handler("shutdown", ai_service.stop)
+router.add_event_handler("startup", generation_jobs.start)
+router.add_event_handler("shutdown", generation_jobs.stop)
+router.add_event_handler("startup", related_posts.start)
+router.add_event_handler("shutdown", related_posts.stop)
+router.add_event_handler("startup", trending_posts.start)
+router.add_event_handler("shutdown", trending_posts.stop)
+
+
+if settings.DB_ASYNC:
+    async def get_post_service(db: AsyncSession = Depends(get_async_db)):
+        """Blog post service on the async engine"""
+        return AsyncBlogPostService(db)
+else:
+    async def get_post_service(db: Session = Depends(get_db)):
+        """Blog post service on the sync engine"""
+        return BlogPostService(db)
+
 
 @router.get("/posts", response_model=dict)
 async def get_all_published_posts(
+    request: Request,
     page: int = Query(0, ge=0),
     size: int = Query(10, ge=1, le=100),
     sort_by: str = Query("created_at"),
     sort_dir: str = Query("desc"),
     lang: str = Query("en"),
-    db: Session = Depends(get_db)
+    fields: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None),
+    include_total: Optional[bool] = Query(None),
+    service: BlogPostService = Depends(get_post_service)
 ):
-    """Get all published blog posts with pagination"""
-    service = BlogPostService(db)
-    return await service.get_published_posts(page, size, sort_by, sort_dir, lang)
+    """Get all published blog posts with pagination
+    
+    Title and excerpt are in `lang` where a post has been translated, in
+    English otherwise; only that language's columns are read. Post bodies
+    are left out of the list; pass e.g. `fields=content` to include them.
+    Pass `cursor` (empty for the first page, then the returned
+    `next_cursor`) to page by keyset instead of offset.
+    """
+    try:
+        return await response_cache.respond(request, [POSTS_SCOPE], lambda: service.get_published_posts(
+            page, size, sort_by, sort_dir, lang, fields, cursor, include_total
+        ))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
-@router.get("/posts/{post_id}", response_model=BlogPostResponse)
+@router.get("/posts/{post_id:int}", response_model=BlogPostResponse)
 async def get_post_by_id(
+    request: Request,
     post_id: int,
-    db: Session = Depends(get_db)
+    lang: str = Query("en"),
+    service: BlogPostService = Depends(get_post_service)
 ):
-    """Get single blog post by ID and increment view count"""
-    service = BlogPostService(db)
-    post = await service.get_post_by_id(post_id)
-    if not post:
-        raise HTTPException(status_code=404, detail="Post not found")
+    """Get single blog post by ID and increment view count
+    
+    Title, excerpt and content are in `lang` where the post has been
+    translated, in English otherwise. `content_html` is the markdown content
+    rendered to sanitized HTML when the post was written.
+    """
+    async def load_post():
+        post = await service.get_localized_post(post_id, lang)
+        if not post:
+            raise HTTPException(status_code=404, detail="Post not found")
+        return BlogPostResponse.model_validate(post)
+    
+    response = await response_cache.respond(request, [post_scope(post_id)], load_post)
     
     # Increment view count
     await service.increment_view_count(post_id)
     
-    return post
+    return response
 
 
 @router.post("/posts", response_model=BlogPostResponse, status_code=201)
 async def create_post(
     post_data: BlogPostCreate,
-    db: Session = Depends(get_db)
+    service: BlogPostService = Depends(get_post_service)
 ):
     """Create a new blog post"""
-    service = BlogPostService(db)
     return await service.create_post(post_data)
 
 
+@router.post("/posts/batch", status_code=201)
+async def create_posts_batch(
+    request: BlogPostBatchCreateRequest,
+    service: BlogPostService = Depends(get_post_service)
+):
+    """Create many posts in one transaction
+    
+    Returns one result per post, in request order, with the new id.
+    """
+    try:
+        results = await service.create_posts(request.posts)
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=409, detail=f"Batch rolled back: {getattr(e, 'orig', None) or e}")
+    return {"created": len(results), "results": results}
+
+
+@router.patch("/posts/batch")
+async def update_posts_batch(
+    request: BlogPostBatchUpdateRequest,
+    service: BlogPostService = Depends(get_post_service)
+):
+    """Apply many partial updates in one transaction
+    
+    Each item takes the fields of PUT /posts/{id} plus the post `id`. Returns
+    one result per item, in request order: `updated`, `not_found` or `error`.
+    """
+    try:
+        results = await service.update_posts(request.posts)
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=409, detail=f"Batch rolled back: {getattr(e, 'orig', None) or e}")
+    return {
+        "updated": sum(result["status"] == "updated" for result in results),
+        "results": results
+    }
+
+
 @router.put("/posts/{post_id}", response_model=BlogPostResponse)
 async def update_post(
     post_id: int,
     post_data: BlogPostUpdate,
-    db: Session = Depends(get_db)
+    service: BlogPostService = Depends(get_post_service)
 ):
     """Update an existing blog post"""
-    service = BlogPostService(db)
     updated_post = await service.update_post(post_id, post_data)
     if not updated_post:
         raise HTTPException(status_code=404, detail="Post not found")
@@ -73,10 +181,9 @@ async def update_post(
 @router.delete("/posts/{post_id}", status_code=204)
 async def delete_post(
     post_id: int,
-    db: Session = Depends(get_db)
+    service: BlogPostService = Depends(get_post_service)
 ):
     """Delete a blog post"""
-    service = BlogPostService(db)
     success = await service.delete_post(post_id)
     if not success:
         raise HTTPException(status_code=404, detail="Post not found")
@@ -86,10 +193,9 @@ async def delete_post(
 @router.patch("/posts/{post_id}/publish")
 async def toggle_publish_status(
     post_id: int,
-    db: Session = Depends(get_db)
+    service: BlogPostService = Depends(get_post_service)
 ):
     """Toggle publish status of a blog post"""
-    service = BlogPostService(db)
     post = await service.toggle_publish(post_id)
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
@@ -101,84 +207,277 @@ async def search_posts(
     keyword: str = Query(..., min_length=1),
     page: int = Query(0, ge=0),
     size: int = Query(10, ge=1, le=100),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None),
+    include_total: Optional[bool] = Query(None),
+    fields: Optional[str] = Query(None),
+    service: BlogPostService = Depends(get_post_service)
 ):
-    """Search posts by keyword"""
-    service = BlogPostService(db)
-    return await service.search_posts(keyword, page, size)
+    """Full-text search over published posts, ranked by relevance
+    
+    Each result carries a `snippet` with the matches wrapped in `<mark>`.
+    """
+    try:
+        return await service.search_posts(keyword, page, size, cursor, include_total, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/posts/tag/{tag}", response_model=dict)
 async def get_posts_by_tag(
+    request: Request,
     tag: str,
     page: int = Query(0, ge=0),
     size: int = Query(10, ge=1, le=100),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None),
+    include_total: Optional[bool] = Query(None),
+    fields: Optional[str] = Query(None),
+    service: BlogPostService = Depends(get_post_service)
 ):
     """Get posts by tag"""
-    service = BlogPostService(db)
-    return await service.get_posts_by_tag(tag, page, size)
+    try:
+        return await response_cache.respond(request, [POSTS_SCOPE], lambda: service.get_posts_by_tag(
+            tag, page, size, cursor, include_total, fields
+        ))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/tags")
+async def get_tags(
+    request: Request,
+    limit: int = Query(500, ge=1, le=5000),
+    service: BlogPostService = Depends(get_post_service)
+):
+    """Get all tags that have published posts, by name, with post counts"""
+    return await response_cache.respond(request, [POSTS_SCOPE], lambda: service.get_tags(limit))
+
+
+@router.get("/tags/popular")
+async def get_popular_tags(
+    request: Request,
+    limit: int = Query(10, ge=1, le=100),
+    service: BlogPostService = Depends(get_post_service)
+):
+    """Get the tags with the most published posts"""
+    return await response_cache.respond(request, [POSTS_SCOPE], lambda: service.get_popular_tags(limit))
+
+
+@router.get("/posts/{post_id:int}/related")
+async def get_related_posts(
+    request: Request,
+    post_id: int,
+    limit: int = Query(5, ge=1, le=settings.RELATED_POSTS_K),
+    lang: str = Query("en"),
+    service: BlogPostService = Depends(get_post_service)
+):
+    """Get the published posts most related to a post, best first
+    
+    Related posts share words and tags with the post; they are precomputed,
+    so this reads only the posts returned.
+    """
+    async def load_related_posts():
+        posts = await service.get_related_posts(post_id, limit, lang)
+        if posts is None:
+            raise HTTPException(status_code=404, detail="Post not found")
+        return posts
+    
+    return await response_cache.respond(request, [POSTS_SCOPE, RELATED_SCOPE], load_related_posts)
+
+
+@router.get("/posts/trending")
+async def get_trending_posts(
+    request: Request,
+    window: str = Query("24h"),
+    limit: int = Query(10, ge=1, le=settings.TRENDING_MAX_POSTS),
+    lang: str = Query("en"),
+    service: BlogPostService = Depends(get_post_service)
+):
+    """Get the published posts with the most recent views, best first
+    
+    `window` is 24h or 7d. Views count less the older they are; the rankings
+    are precomputed every TRENDING_REFRESH_INTERVAL seconds.
+    """
+    if window not in WINDOWS:
+        raise HTTPException(status_code=400, detail=f"window must be one of {', '.join(WINDOWS)}")
+    
+    return await response_cache.respond(
+        request, [POSTS_SCOPE, TRENDING_SCOPE], lambda: service.get_trending_posts(window, limit, lang)
+    )
 
 
 @router.get("/posts/top", response_model=List[BlogPostResponse])
 async def get_top_posts(
+    request: Request,
     limit: int = Query(10, ge=1, le=50),
-    db: Session = Depends(get_db)
+    service: BlogPostService = Depends(get_post_service)
 ):
     """Get top posts by view count"""
-    service = BlogPostService(db)
-    return await service.get_top_posts(limit)
+    async def load_top_posts():
+        return [BlogPostResponse.model_validate(post) for post in await service.get_top_posts(limit)]
+    
+    return await response_cache.respond(request, [POSTS_SCOPE], load_top_posts)
 
 
 @router.get("/posts/stats")
-async def get_stats(db: Session = Depends(get_db)):
+async def get_stats(request: Request, service: BlogPostService = Depends(get_post_service)):
     """Get blog statistics"""
-    service = BlogPostService(db)
-    return await service.get_statistics()
+    return await response_cache.respond(request, [POSTS_SCOPE], service.get_statistics)
 
 
-@router.post("/posts/generate", response_model=BlogPostResponse, status_code=201)
-async def generate_ai_post(
-    request: AIGenerateRequest,
-    db: Session = Depends(get_db)
-):
-    """Generate a blog post using AI"""
-    ai_service = AIService()
-    blog_service = BlogPostService(db)
-    
-    # Generate content using AI
-    generated_content = await ai_service.generate_blog_post(request.prompt)
-    
-    # Create post data
-    post_data = BlogPostCreate(
-        title=generated_content["title"],
-        content=generated_content["content"],
-        excerpt=generated_content["excerpt"],
-        author=request.author,
-        tags=generated_content.get("tags", []),
-        published=False
+@router.get("/posts/stats/tags")
+async def get_tag_stats(
+    request: Request,
+    limit: int = Query(50, ge=1, le=500),
+    service: BlogPostService = Depends(get_post_service)
+):
+    """Get post and view counts per tag"""
+    return await response_cache.respond(
+        request, [POSTS_SCOPE], lambda: service.get_statistics_breakdown("tag", limit)
+    )
+
+
+@router.get("/posts/stats/authors")
+async def get_author_stats(
+    request: Request,
+    limit: int = Query(50, ge=1, le=500),
+    service: BlogPostService = Depends(get_post_service)
+):
+    """Get post and view counts per author"""
+    return await response_cache.respond(
+        request, [POSTS_SCOPE], lambda: service.get_statistics_breakdown("author", limit)
     )
+
+
+@router.post("/posts/stats/reconcile")
+async def reconcile_stats(service: BlogPostService = Depends(get_post_service)):
+    """Recompute the statistics counters from the posts table"""
+    return await service.reconcile_statistics()
+
+
+@router.get("/posts/stats/views")
+async def get_view_counter_stats():
+    """Get pending and flushed counts of the buffered view counter"""
+    return view_counter.stats()
+
+
+@router.get("/posts/stats/trending")
+async def get_trending_posts_stats():
+    """Get the size and refresh counts of the trending posts rankings"""
+    return trending_posts.stats()
+
+
+@router.get("/posts/stats/related")
+async def get_related_posts_stats():
+    """Get the size and update counts of the related posts index"""
+    return related_posts.stats()
+
+
+@router.get("/posts/stats/generation")
+async def get_generation_job_stats():
+    """Get counts of the AI generation job queue"""
+    return generation_jobs.stats()
+
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/posts/generate", status_code=202)
+async def generate_ai_post(request: AIGenerateRequest, http_request: Request, response: Response):
+    """Start generating a blog post using AI
+    
+    Returns a job right away; poll GET /posts/generate/{job_id} until its
+    status is `succeeded` (the draft post is in `post`) or `failed`.
+    """
+    try:
+        job = generation_jobs.submit(request.prompt, request.author)
+    except QueueFullError:
+        raise HTTPException(status_code=503, detail="Too many generations queued, try again later")
+    
+    response.headers["Location"] = str(http_request.url_for("get_generation_job", job_id=job.id))
+    return job.to_dict()
+
+
+@router.get("/posts/generate/{job_id}")
+async def get_generation_job(job_id: str):
+    """Get the status and result of an AI generation job"""
+    job = generation_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+
+@router.post("/posts/generate/stream")
+async def generate_ai_post_stream(
+    request: AIGenerateRequest,
+    service: BlogPostService = Depends(get_post_service)
+):
+    """Generate a blog post using AI, streamed as server-sent events
     
-    # Create post
-    post = await blog_service.create_post(post_data)
+    Sends `token` events with the text as the model writes it, then a `done`
+    event with the saved draft post, or an `error` event when the model or
+    saving the post fails.
+    """
+    async def events():
+        # Flush the headers and a first byte before the upstream call starts
+        yield ": generating\n\n"
+        parts = []
+        try:
+            async for text in ai_service.stream_blog_post(request.prompt):
+                parts.append(text)
+                yield sse_event("token", {"text": text})
+            
+            generated_content = ai_service.parse_generated("".join(parts))
+            post_data = generated_post_data(generated_content, request.author)
+            post = await service.create_post(post_data, ai_prompt=request.prompt)
+            yield sse_event("done", BlogPostResponse.model_validate(post).model_dump(mode="json"))
+        except SQLAlchemyError as e:
+            yield sse_event("error", {"detail": f"Could not save the generated post: {getattr(e, 'orig', None) or e}"})
+        except httpx.HTTPError:
+            yield sse_event("error", {"detail": "AI service unavailable"})
+        except ValueError as e:
+            yield sse_event("error", {"detail": f"Generated post is invalid: {e}"})
     
-    # Mark as AI generated
-    post.is_ai_generated = True
-    post.ai_prompt = request.prompt
-    db.commit()
-    db.refresh(post)
+    return StreamingResponse(events(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+
+@router.get("/posts/export")
+def export_posts_archive(batch_size: int = Query(1000, ge=1, le=10000)):
+    """Export every post, with tags and images, as NDJSON (one post per line)
+    
+    Read through a server-side cursor, so memory use doesn't grow with the
+    number of posts.
+    """
+    return StreamingResponse(export_posts(SessionLocal, batch_size), media_type="application/x-ndjson", headers={
+        "Content-Disposition": 'attachment; filename="posts.ndjson"'
+    })
+
+
+@router.post("/posts/import")
+async def import_posts_archive(request: Request, batch_size: int = Query(1000, ge=1, le=10000)):
+    """Import posts from an NDJSON body in the export format
     
-    return post
+    Posts are written `batch_size` at a time, one transaction per batch.
+    Returns counts, skipped lines and rows per second. An import the database
+    stopped part way is answered with 409 and `"aborted": true`; the batches
+    before it are committed.
+    """
+    report = await import_posts(request.stream(), SessionLocal, batch_size)
+    if report["aborted"]:
+        return JSONResponse(report, status_code=409)
+    return report
 
 
 @router.post("/posts/{post_id}/images")
 async def add_image_to_post(
     post_id: int,
     image_url: str,
-    db: Session = Depends(get_db)
+    service: BlogPostService = Depends(get_post_service)
 ):
     """Add image URL to a post"""
-    service = BlogPostService(db)
     success = await service.add_image(post_id, image_url)
     if not success:
         raise HTTPException(status_code=404, detail="Post not found")
@@ -189,10 +488,9 @@ async def add_image_to_post(
 async def set_featured_image(
     post_id: int,
     image_url: str,
-    db: Session = Depends(get_db)
+    service: BlogPostService = Depends(get_post_service)
 ):
     """Set featured image for a post"""
-    service = BlogPostService(db)
     success = await service.set_featured_image(post_id, image_url)
     if not success:
         raise HTTPException(status_code=404, detail="Post not found")
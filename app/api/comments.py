@@ -0,0 +1,75 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.orm import Session
+from app.core.cache import comments_scope, response_cache
+from app.core.database import engine, get_db
+from app.schemas.comment import CommentCreate
+from app.services.comment_service import CommentService, migrate_comments
+
+router = APIRouter()
+router.add_event_handler("startup", lambda: migrate_comments(engine))
+
+def get_comment_service(db: Session = Depends(get_db)):
+    return CommentService(db)
+
+
+@router.get("/posts/{post_id:int}/comments")
+async def get_comments(
+    request: Request,
+    post_id: int,
+    page: int = Query(0, ge=0),
+    size: int = Query(10, ge=1, le=50),
+    service: CommentService = Depends(get_comment_service)
+):
+    """Get a page of approved top-level comments, newest first, each with its replies"""
+    return await response_cache.respond(
+        request, [comments_scope(post_id)], lambda: service.get_comments(post_id, page, size)
+    )
+
+
+@router.get("/posts/{post_id:int}/comments/count")
+async def get_comment_count(post_id: int, service: CommentService = Depends(get_comment_service)):
+    """Get the number of approved comments on a post, replies included"""
+    count = await service.get_comment_count(post_id)
+    if count is None:
+        raise HTTPException(status_code=404, detail="Post not found")
+    return {"post_id": post_id, "count": count}
+
+
+@router.post("/posts/comments", status_code=201)
+async def create_comment(comment_data: CommentCreate, service: CommentService = Depends(get_comment_service)):
+    """Add a comment or a reply; it is shown once approved"""
+    try:
+        comment = await service.create_comment(comment_data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if comment is None:
+        raise HTTPException(status_code=404, detail="Post not found")
+    return comment
+
+
+@router.post("/posts/comments/{comment_id}/upvote")
+async def upvote_comment(comment_id: int, service: CommentService = Depends(get_comment_service)):
+    """Upvote an approved comment"""
+    result = await service.upvote_comment(comment_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Comment not found")
+    return result
+
+
+@router.patch("/posts/comments/{comment_id}/approve")
+async def approve_comment(comment_id: int, service: CommentService = Depends(get_comment_service)):
+    """Approve a comment; a reply only once the comments above it are approved"""
+    try:
+        result = await service.approve_comment(comment_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=404, detail="Comment not found")
+    return result
+
+
+@router.delete("/posts/comments/{comment_id}", status_code=204)
+async def delete_comment(comment_id: int, service: CommentService = Depends(get_comment_service)):
+    """Delete a comment with its replies"""
+    if not await service.delete_comment(comment_id):
+        raise HTTPException(status_code=404, detail="Comment not found")
@@ -1,73 +1,231 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from fastapi.responses import FileResponse
+from multipart.multipart import MultipartParser, parse_options_header
+from PIL import UnidentifiedImageError
+from sqlalchemy.orm import Session
 import aiofiles
 import os
 from pathlib import Path
+from typing import Optional, Tuple
 from app.core.config import settings
+from app.core.database import engine, get_db
+from app.services.image_service import VARIANT_WIDTHS, available_formats, image_service
+from app.services.upload_service import UploadService, migrate_uploads
+import hashlib
 import uuid
 
 router = APIRouter()
+router.add_event_handler("startup", lambda: migrate_uploads(engine))
+router.add_event_handler("shutdown", image_service.shutdown)
 
 # Ensure upload directory exists
 Path(settings.UPLOAD_DIR).mkdir(parents=True, exist_ok=True)
 
 ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
 
+# Uploads are copied to disk in chunks of this size
+CHUNK_SIZE = 64 * 1024
+
+# Room for the multipart boundaries and part headers around the file
+MULTIPART_OVERHEAD = 16 * 1024
+
 def is_allowed_file(filename: str) -> bool:
     """Check if file extension is allowed"""
     return Path(filename).suffix.lower() in ALLOWED_EXTENSIONS
 
-@router.post("/upload/image")
-async def upload_image(file: UploadFile = File(...)):
-    """Upload an image file"""
+def file_too_large() -> HTTPException:
+    return HTTPException(
+        status_code=400,
+        detail=f"File too large. Maximum size: {settings.MAX_FILE_SIZE / 1024 / 1024}MB"
+    )
+
+async def receive_image(request: Request, path: Path) -> Tuple[str, int, str]:
+    """Write the `file` field of a multipart request body to `path`
     
-    # Check file extension
-    if not is_allowed_file(file.filename):
-        raise HTTPException(
-            status_code=400,
-            detail=f"File type not allowed. Allowed types: {', '.join(ALLOWED_EXTENSIONS)}"
-        )
+    The body is parsed as it arrives rather than spooled first, so a file
+    over MAX_FILE_SIZE is rejected as soon as that much of it came in and
+    only one chunk is held in memory. Returns the file's name, its size and
+    the sha256 hex digest of its content.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or not params.get(b"boundary"):
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data body")
     
-    # Check file size
-    content = await file.read()
-    if len(content) > settings.MAX_FILE_SIZE:
-        raise HTTPException(
-            status_code=400,
-            detail=f"File too large. Maximum size: {settings.MAX_FILE_SIZE / 1024 / 1024}MB"
-        )
+    state = {"header": b"", "value": b"", "headers": {}, "filename": None, "in_file": False}
+    chunks = []
+    
+    def on_part_begin():
+        state["headers"] = {}
+        state["in_file"] = False
+    
+    def on_header_field(data, start, end):
+        state["header"] += data[start:end]
+    
+    def on_header_value(data, start, end):
+        state["value"] += data[start:end]
+    
+    def on_header_end():
+        state["headers"][state["header"].lower()] = state["value"]
+        state["header"] = state["value"] = b""
+    
+    def on_headers_finished():
+        _, options = parse_options_header(state["headers"].get(b"content-disposition", b""))
+        if options.get(b"name") == b"file" and b"filename" in options and state["filename"] is None:
+            state["filename"] = options[b"filename"].decode("utf-8", "replace")
+            state["in_file"] = True
+    
+    def on_part_data(data, start, end):
+        if state["in_file"]:
+            chunks.append(data[start:end])
+    
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data
+    })
+    digest = hashlib.sha256()
+    size = 0
+    async with aiofiles.open(path, 'wb') as f:
+        async for body in request.stream():
+            parser.write(body)
+            # Check the extension before reading any of the file
+            if state["filename"] is not None and not is_allowed_file(state["filename"]):
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"File type not allowed. Allowed types: {', '.join(ALLOWED_EXTENSIONS)}"
+                )
+            for chunk in chunks:
+                size += len(chunk)
+                if size > settings.MAX_FILE_SIZE:
+                    raise file_too_large()
+                digest.update(chunk)
+                await f.write(chunk)
+            chunks.clear()
+    parser.finalize()
+    
+    if state["filename"] is None:
+        raise HTTPException(status_code=400, detail="No file uploaded in the `file` field")
+    return state["filename"], size, digest.hexdigest()
+
+@router.post("/upload/image", openapi_extra={
+    "requestBody": {
+        "required": True,
+        "content": {"multipart/form-data": {"schema": {
+            "type": "object",
+            "properties": {"file": {"type": "string", "format": "binary"}},
+            "required": ["file"]
+        }}}
+    }
+})
+async def upload_image(request: Request, db: Session = Depends(get_db)):
+    """Upload an image file, sent as the `file` field of a multipart form"""
+    
+    # A body announced as too large is refused before any of it is read
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > settings.MAX_FILE_SIZE + MULTIPART_OVERHEAD:
+        raise file_too_large()
     
-    # Generate unique filename
-    file_ext = Path(file.filename).suffix
-    unique_filename = f"{uuid.uuid4()}{file_ext}"
-    file_path = Path(settings.UPLOAD_DIR) / unique_filename
+    upload_dir = Path(settings.UPLOAD_DIR)
+    temp_path = upload_dir / f".{uuid.uuid4()}.part"
+    try:
+        filename, size, digest = await receive_image(request, temp_path)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
     
-    # Save file
-    async with aiofiles.open(file_path, 'wb') as f:
-        await f.write(content)
+    # Name the file after its content, so identical uploads are stored once
+    file_ext = Path(filename).suffix.lower()
+    unique_filename = f"{digest}{file_ext}"
+    file_path = upload_dir / unique_filename
+    
+    await UploadService(db).add(unique_filename)
+    duplicate = file_path.exists()
+    if duplicate:
+        temp_path.unlink()
+    else:
+        os.replace(temp_path, file_path)
+        image_service.pregenerate(unique_filename)
     
     return {
         "message": "File uploaded successfully",
         "filename": unique_filename,
-        "url": f"/uploads/{unique_filename}"
+        "url": f"/uploads/{unique_filename}",
+        "size": size,
+        "duplicate": duplicate
     }
 
+def negotiate_format(request: Request, filename: str) -> str:
+    """Pick the best output format the client accepts"""
+    accept = request.headers.get("accept", "")
+    formats = available_formats()
+    for fmt in ("avif", "webp"):
+        if f"image/{fmt}" in accept and fmt in formats:
+            return fmt
+    return "png" if Path(filename).suffix.lower() == ".png" else "jpeg"
+
 @router.get("/upload/images/{filename}")
-async def get_image(filename: str):
-    """Get uploaded image"""
+async def get_image(
+    request: Request,
+    filename: str,
+    w: Optional[int] = Query(None),
+    format: Optional[str] = Query(None)
+):
+    """Get uploaded image
+    
+    Pass `w` (one of VARIANT_WIDTHS) and/or `format` (jpeg, png, webp, avif
+    or auto to negotiate from the Accept header) to get a resized copy.
+    """
     file_path = Path(settings.UPLOAD_DIR) / filename
     
     if not file_path.exists():
         raise HTTPException(status_code=404, detail="File not found")
     
-    return FileResponse(file_path)
+    # Animated GIFs would lose their animation, serve them as they are
+    if (w is None and format is None) or file_path.suffix.lower() == ".gif":
+        return FileResponse(file_path)
+    
+    if w is not None and w not in VARIANT_WIDTHS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Width not allowed. Allowed widths: {', '.join(map(str, VARIANT_WIDTHS))}"
+        )
+    
+    fmt = format or "auto"
+    if fmt == "auto":
+        fmt = negotiate_format(request, filename)
+    elif fmt not in available_formats():
+        raise HTTPException(
+            status_code=400,
+            detail=f"Format not available. Available formats: {', '.join(sorted(available_formats()))}"
+        )
+    
+    try:
+        variant = await image_service.get_variant(filename, w or VARIANT_WIDTHS[-1], fmt)
+    except (UnidentifiedImageError, OSError):
+        raise HTTPException(status_code=400, detail="File is not a readable image")
+    
+    # Upload names are content hashes, so a derivative never changes
+    return FileResponse(variant, headers={
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "Vary": "Accept"
+    })
 
 @router.delete("/upload/images/{filename}")
-async def delete_image(filename: str):
-    """Delete uploaded image"""
+async def delete_image(filename: str, db: Session = Depends(get_db)):
+    """Delete uploaded image
+    
+    Identical uploads share one file, which is only removed with the last of them.
+    """
     file_path = Path(settings.UPLOAD_DIR) / filename
     
     if not file_path.exists():
         raise HTTPException(status_code=404, detail="File not found")
     
-    os.remove(file_path)
+    if await UploadService(db).release(filename):
+        file_path.unlink(missing_ok=True)
+        image_service.delete_variants(filename)
+    db.commit()
     return {"message": "File deleted successfully"}
@@ -0,0 +1,9 @@
+from fastapi import APIRouter, Response
+from app.core.metrics import CONTENT_TYPE, metrics
+
+router = APIRouter()
+
+@router.get("/metrics", include_in_schema=False)
+async def read_metrics():
+    """Request, database and AI call metrics in Prometheus text format"""
+    return Response(metrics.render(), media_type=CONTENT_TYPE)
@@ -0,0 +1,102 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import HTMLResponse
+from sqlalchemy.orm import Session
+from app.core.database import engine, get_db
+from app.schemas.newsletter import NewsletterIssueCreate, NewsletterSubscribe
+from app.services.newsletter_service import (
+    NewsletterService, SendInProgressError, migrate_newsletter, newsletter_sender, valid_unsubscribe_token
+)
+import html
+
+router = APIRouter()
+router.add_event_handler("startup", lambda: migrate_newsletter(engine))
+router.add_event_handler("shutdown", newsletter_sender.stop)
+
+def get_newsletter_service(db: Session = Depends(get_db)):
+    return NewsletterService(db)
+
+
+@router.post("/newsletter/subscribe", status_code=201)
+async def subscribe(data: NewsletterSubscribe, service: NewsletterService = Depends(get_newsletter_service)):
+    """Subscribe to the newsletter, in one of the post languages"""
+    return await service.subscribe(data)
+
+
+UNSUBSCRIBE_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><meta name="robots" content="noindex"><title>Unsubscribe</title></head>
+<body><form method="post" action="{action}">
+<p>Stop sending the newsletter to {email}?</p>
+<button type="submit">Unsubscribe</button>
+</form></body></html>
+"""
+
+UNSUBSCRIBED_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><meta name="robots" content="noindex"><title>Unsubscribed</title></head>
+<body><p>{email} will not get the newsletter any more.</p></body></html>
+"""
+
+
+@router.get("/newsletter/unsubscribe", response_class=HTMLResponse)
+async def unsubscribe_page(request: Request, email: str = Query(...), token: str = Query(...)):
+    """Confirmation page for the link in a newsletter, which POSTs to unsubscribe
+    
+    Mail scanners and link previews open every link in a mail, so opening
+    this one changes nothing.
+    """
+    if not valid_unsubscribe_token(email.lower(), token):
+        raise HTTPException(status_code=403, detail="Invalid unsubscribe link")
+    return UNSUBSCRIBE_PAGE.format(action=html.escape(f"?{request.url.query}"), email=html.escape(email.lower()))
+
+
+@router.post("/newsletter/unsubscribe")
+async def unsubscribe(
+    request: Request,
+    email: str = Query(...),
+    token: str = Query(...),
+    service: NewsletterService = Depends(get_newsletter_service)
+):
+    """Unsubscribe, from the confirmation page or as RFC 8058 one-click unsubscribe"""
+    found = await service.unsubscribe(email, token)
+    if found is None:
+        raise HTTPException(status_code=403, detail="Invalid unsubscribe link")
+    if not found:
+        raise HTTPException(status_code=404, detail="Subscription not found")
+    if "text/html" in request.headers.get("accept", ""):
+        return HTMLResponse(UNSUBSCRIBED_PAGE.format(email=html.escape(email.lower())))
+    return {"email": email.lower(), "active": False}
+
+
+@router.post("/newsletter/issues", status_code=201)
+async def create_issue(issue_data: NewsletterIssueCreate, service: NewsletterService = Depends(get_newsletter_service)):
+    """Create a draft newsletter issue presenting some posts"""
+    try:
+        return await service.create_issue(issue_data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/newsletter/issues/stats/sends")
+async def get_send_stats():
+    """Get the sends running in this process and their last runs' throughput"""
+    return newsletter_sender.stats()
+
+
+@router.get("/newsletter/issues/{issue_id}")
+async def get_issue(issue_id: int, service: NewsletterService = Depends(get_newsletter_service)):
+    """Get an issue with its send progress"""
+    issue = await service.get_issue(issue_id)
+    if issue is None:
+        raise HTTPException(status_code=404, detail="Issue not found")
+    return issue
+
+
+@router.post("/newsletter/issues/{issue_id}/send", status_code=202)
+async def send_issue(issue_id: int, service: NewsletterService = Depends(get_newsletter_service)):
+    """Start sending an issue in the background, or resume a paused or crashed send"""
+    try:
+        started = await newsletter_sender.start(issue_id)
+    except (SendInProgressError, ValueError) as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if started is None:
+        raise HTTPException(status_code=404, detail="Issue not found")
+    return await service.get_issue(issue_id)
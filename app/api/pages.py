@@ -0,0 +1,72 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.orm import Session
+from app.core.cache import PAGES_SCOPE, response_cache
+from app.core.database import engine, get_db
+from app.schemas.page import PageCreate, PageUpdate
+from app.services.blog_post_service import parse_lang
+from app.services.page_service import PageService, load_page, migrate_pages, page_cache
+
+router = APIRouter()
+router.add_event_handler("startup", lambda: migrate_pages(engine))
+router.add_event_handler("startup", page_cache.warm)
+
+def get_page_service(db: Session = Depends(get_db)):
+    return PageService(db)
+
+
+@router.get("/pages")
+async def get_pages(request: Request, service: PageService = Depends(get_page_service)):
+    """Get the slug and title of every published page"""
+    return await response_cache.respond(request, [PAGES_SCOPE], service.get_pages)
+
+
+@router.get("/pages/stats/cache")
+async def get_page_cache_stats():
+    """Get counters of the rendered page cache"""
+    return page_cache.stats()
+
+
+@router.get("/pages/{slug}")
+async def get_page(
+    request: Request,
+    slug: str,
+    lang: str = Query("en", description="Language to show the page in: en, bn or hi")
+):
+    """Get a published page, served pre-rendered and compressed from memory
+    
+    No database session is opened unless the page has to be rendered.
+    """
+    lang = parse_lang(lang)
+    response = await page_cache.respond(request, slug, lang, lambda: load_page(slug, lang))
+    if response is None:
+        raise HTTPException(status_code=404, detail="Page not found")
+    return response
+
+
+@router.post("/pages", status_code=201)
+async def create_page(page_data: PageCreate, service: PageService = Depends(get_page_service)):
+    """Create a page"""
+    try:
+        return await service.create_page(page_data)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.put("/pages/{slug}")
+async def update_page(slug: str, page_data: PageUpdate, service: PageService = Depends(get_page_service)):
+    """Update a page"""
+    try:
+        page = await service.update_page(slug, page_data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if page is None:
+        raise HTTPException(status_code=404, detail="Page not found")
+    return page
+
+
+@router.delete("/pages/{slug}")
+async def delete_page(slug: str, service: PageService = Depends(get_page_service)):
+    """Delete a page"""
+    if not await service.delete_page(slug):
+        raise HTTPException(status_code=404, detail="Page not found")
+    return {"message": "Page deleted successfully"}
@@ -0,0 +1,75 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.orm import Session
+from app.core.cache import POLLS_SCOPE, poll_scope, response_cache
+from app.core.database import engine, get_db
+from app.schemas.poll import PollCreate, PollVoteCreate
+from app.services.poll_service import (
+    CLOSED, DUPLICATE, NOT_FOUND, PollService, migrate_poll_votes, poll_votes
+)
+
+router = APIRouter()
+router.add_event_handler("startup", lambda: migrate_poll_votes(engine))
+router.add_event_handler("startup", poll_votes.start)
+router.add_event_handler("shutdown", poll_votes.stop)
+
+def get_poll_service(db: Session = Depends(get_db)):
+    return PollService(db)
+
+
+@router.post("/polls", status_code=201)
+async def create_poll(poll_data: PollCreate, service: PollService = Depends(get_poll_service)):
+    """Create a poll with its options"""
+    try:
+        return await service.create_poll(poll_data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/polls")
+async def get_polls(
+    request: Request,
+    limit: int = Query(10, ge=1, le=50),
+    service: PollService = Depends(get_poll_service)
+):
+    """Get the newest polls still taking votes, without their counts"""
+    return await response_cache.respond(request, [POLLS_SCOPE], lambda: service.get_open_polls(limit))
+
+
+@router.get("/polls/stats/votes")
+async def get_poll_vote_stats():
+    """Get counts of the batched vote writer"""
+    return poll_votes.stats()
+
+
+@router.get("/polls/{poll_id}/results")
+async def get_poll_results(request: Request, poll_id: int, service: PollService = Depends(get_poll_service)):
+    """Get a poll with the votes per option"""
+    async def load_results():
+        results = await service.get_results(poll_id)
+        if results is None:
+            raise HTTPException(status_code=404, detail="Poll not found")
+        return results
+    
+    return await response_cache.respond(request, [poll_scope(poll_id)], load_results)
+
+
+@router.post("/polls/{poll_id}/vote", status_code=201)
+async def vote(request: Request, poll_id: int, vote_data: PollVoteCreate):
+    """Vote for an option, once per IP address and poll
+    
+    Behind a proxy, run uvicorn with --proxy-headers so the client's address
+    is the one recorded.
+    """
+    user_ip = request.client.host if request.client else "unknown"
+    try:
+        outcome = await poll_votes.submit(poll_id, vote_data.option_id, user_ip)
+    except Exception:
+        raise HTTPException(status_code=503, detail="Vote could not be recorded, please retry")
+    
+    if outcome == NOT_FOUND:
+        raise HTTPException(status_code=404, detail="Poll option not found")
+    if outcome == CLOSED:
+        raise HTTPException(status_code=409, detail="Poll is closed")
+    if outcome == DUPLICATE:
+        raise HTTPException(status_code=409, detail="Already voted in this poll")
+    return {"poll_id": poll_id, "option_id": vote_data.option_id, "status": outcome}
@@ -0,0 +1,229 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from email.utils import formatdate
+from typing import Any, Awaitable, Callable, Iterable, List, Optional
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+from app.core.config import settings
+
+
+def render_json(content: Any) -> str:
+    """Serialize a response body like JSONResponse: UTF-8 text, no spaces
+    
+    Escaping non-ASCII would double the size of Bengali and Hindi posts.
+    """
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False, separators=(",", ":"))
+
+
+class MemoryCacheBackend:
+    """In-process LRU cache with a TTL per entry
+
+    At most `max_counters` counters are kept; the least recently incremented
+    ones are dropped. A dropped counter reads as the highest value dropped so
+    far rather than 0, so a counter never goes back to a value it had before
+    and entries keyed with an old value stay unreachable.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_counters: int = 10000):
+        self.max_entries = max_entries
+        self.max_counters = max_counters
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._counters: "OrderedDict[str, int]" = OrderedDict()
+        self._dropped_counter = 0
+        self._lock = threading.Lock()
+
+    async def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    async def set(self, key: str, value: str, ttl: int):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def get_counters(self, names: List[str]) -> List[int]:
+        with self._lock:
+            return [self._counters.get(name, self._dropped_counter) for name in names]
+
+    async def incr(self, name: str):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, self._dropped_counter) + 1
+            self._counters.move_to_end(name)
+            while len(self._counters) > self.max_counters:
+                _, value = self._counters.popitem(last=False)
+                self._dropped_counter = max(self._dropped_counter, value)
+
+    async def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._counters.clear()
+            self._dropped_counter = 0
+
+
+class RedisCacheBackend:
+    """Cache shared by all workers, stored in Redis
+
+    Needs the optional `redis` package. Any object with the same async
+    get/set/mget/incr methods (e.g. fakeredis) can stand in for the client.
+    """
+
+    def __init__(self, url: str = None, client=None, prefix: str = "blog:cache:"):
+        if client is None:
+            try:
+                import redis.asyncio as redis
+            except ImportError:
+                raise RuntimeError("CACHE_BACKEND=redis needs the redis package: pip install redis")
+            client = redis.from_url(url, decode_responses=True)
+        self.client = client
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self.client.get(self.prefix + key)
+
+    async def set(self, key: str, value: str, ttl: int):
+        await self.client.set(self.prefix + key, value, ex=ttl)
+
+    async def get_counters(self, names: List[str]) -> List[int]:
+        values = await self.client.mget([self.prefix + "v:" + name for name in names])
+        return [int(value or 0) for value in values]
+
+    async def incr(self, name: str):
+        await self.client.incr(self.prefix + "v:" + name)
+
+    async def clear(self):
+        keys = [key async for key in self.client.scan_iter(self.prefix + "*")]
+        if keys:
+            await self.client.delete(*keys)
+
+
+class ResponseCache:
+    """Caches JSON responses of read endpoints
+
+    Entries are keyed by route and query string and belong to one or more
+    scopes. Invalidating a scope bumps its version, which is part of the key,
+    so every entry of that scope is skipped from then on without having to
+    find and delete it. Responses carry an ETag and Last-Modified, and
+    requests with a matching If-None-Match are answered with 304.
+    If-Modified-Since is not used: Last-Modified has whole seconds, so a
+    response cached in the same second as a changed one would look unchanged.
+    """
+
+    def __init__(self, backend=None, ttl: int = 60):
+        self.backend = backend
+        self.ttl = ttl
+
+    async def _key(self, request: Request, scopes: List[str]) -> str:
+        versions = await self.backend.get_counters(scopes)
+        query = "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+        scope_part = ",".join(f"{scope}@{version}" for scope, version in zip(scopes, versions))
+        return f"{request.url.path}?{query}|{scope_part}"
+
+    def _not_modified(self, request: Request, etag: str) -> bool:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is None:
+            return False
+        return etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+
+    def _response(self, request: Request, body: str, etag: str, last_modified: float, hit: bool) -> Response:
+        headers = {
+            "ETag": etag,
+            "Last-Modified": formatdate(last_modified, usegmt=True),
+            "Cache-Control": "no-cache",
+            "X-Cache": "HIT" if hit else "MISS"
+        }
+        if self._not_modified(request, etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    async def respond(self, request: Request, scopes: Iterable[str],
+                      produce: Callable[[], Awaitable[Any]]) -> Response:
+        """Serve a cached response, or produce, cache and serve a new one"""
+        if self.backend is None:
+            body = render_json(await produce())
+            return Response(content=body, media_type="application/json")
+
+        scopes = list(scopes)
+        key = await self._key(request, scopes)
+        cached = await self.backend.get(key)
+        if cached is not None:
+            entry = json.loads(cached)
+            return self._response(request, entry["body"], entry["etag"], entry["last_modified"], hit=True)
+
+        body = render_json(await produce())
+        etag = '"' + hashlib.sha1(body.encode()).hexdigest() + '"'
+        last_modified = time.time()
+        await self.backend.set(
+            key, json.dumps({"body": body, "etag": etag, "last_modified": last_modified}, ensure_ascii=False), self.ttl
+        )
+        return self._response(request, body, etag, last_modified, hit=False)
+
+    async def version(self, scope: str) -> int:
+        """How many times a scope was invalidated, as seen by every worker sharing the backend"""
+        if self.backend is None:
+            return 0
+        return (await self.backend.get_counters([scope]))[0]
+
+    async def invalidate(self, *scopes: str):
+        """Drop every cached response of the given scopes"""
+        if self.backend is None:
+            return
+        for scope in scopes:
+            await self.backend.incr(scope)
+
+
+# Scopes: every list/aggregate view of posts, and the detail view of one post
+POSTS_SCOPE = "posts"
+
+
+def post_scope(post_id: int) -> str:
+    return f"post:{post_id}"
+
+
+def comments_scope(post_id: int) -> str:
+    return f"comments:{post_id}"
+
+
+# Scope: related posts, changed by the related posts index as well as by post writes
+RELATED_SCOPE = "related"
+
+
+# Scope: trending posts, changed when the rankings are refreshed
+TRENDING_SCOPE = "trending"
+
+
+# Scopes: the list of polls, and the results of one poll
+POLLS_SCOPE = "polls"
+
+
+def poll_scope(poll_id: int) -> str:
+    return f"poll:{poll_id}"
+
+
+# Scope: every page, listed or rendered
+PAGES_SCOPE = "pages"
+
+
+def create_cache_backend():
+    """Build the backend selected by CACHE_BACKEND"""
+    if settings.CACHE_BACKEND == "redis":
+        return RedisCacheBackend(settings.CACHE_REDIS_URL)
+    if settings.CACHE_BACKEND == "memory":
+        return MemoryCacheBackend(settings.CACHE_MAX_ENTRIES)
+    return None
+
+
+response_cache = ResponseCache(create_cache_backend(), settings.CACHE_TTL)
@@ -8,10 +8,23 @@ class Settings(BaseSettings):
     
     # Database
     DATABASE_URL: str
+    # Serve requests through the async engine (asyncpg / aiosqlite)
+    DB_ASYNC: bool = False
     
     # OpenRouter API
     OPENROUTER_API_KEY: str
     CHATBOT_API_KEY: str
+    OPENROUTER_BASE_URL: str = "https://openrouter.ai/api/v1"
+    AI_MODEL: str = "deepseek/deepseek-chat"
+    AI_TIMEOUT: float = 60.0
+    # Upstream calls running at once, and retries of a failed call
+    AI_MAX_CONCURRENCY: int = 8
+    AI_MAX_RETRIES: int = 2
+    # Background generation jobs: worker tasks, jobs allowed to wait, and how
+    # long (seconds) a finished job is kept and reused for the same prompt
+    AI_JOB_WORKERS: int = 4
+    AI_JOB_MAX_QUEUED: int = 100
+    AI_JOB_RESULT_TTL: int = 3600
     
     # JWT
     JWT_SECRET_KEY: str
@@ -25,6 +38,72 @@ class Settings(BaseSettings):
     # File Upload
     UPLOAD_DIR: str = "./uploads"
     MAX_FILE_SIZE: int = 10485760  # 10MB
+    IMAGE_WORKERS: int = 0  # processes rendering image derivatives, 0 = one per CPU
+    
+    # View counting: buffered views are written at least this often (seconds),
+    # or sooner once this many are pending
+    VIEW_COUNT_FLUSH_INTERVAL: float = 5.0
+    VIEW_COUNT_MAX_PENDING: int = 1000
+    # Trending posts: rankings are computed again from the hourly view
+    # buckets every REFRESH_INTERVAL seconds and keep this many posts each
+    TRENDING_REFRESH_INTERVAL: float = 60.0
+    TRENDING_MAX_POSTS: int = 100
+    
+    # New comments are shown right away, instead of after approval
+    COMMENTS_AUTO_APPROVE: bool = False
+    
+    # Poll votes are written in batches of up to this many
+    POLL_VOTE_MAX_BATCH: int = 500
+    
+    # Newsletter: the SMTP server, the From address, and the site's public URL
+    # for links in the mails
+    SMTP_HOST: str = "localhost"
+    SMTP_PORT: int = 25
+    SMTP_USERNAME: str = ""
+    SMTP_PASSWORD: str = ""
+    SMTP_STARTTLS: bool = False
+    SMTP_TIMEOUT: float = 30.0
+    NEWSLETTER_FROM: str = "newsletter@localhost"
+    PUBLIC_BASE_URL: str = "http://localhost:8000"
+    # Sending: subscribers claimed per batch, SMTP connections used at once,
+    # messages per connection before reconnecting, messages per second (0 = no
+    # limit), and seconds without progress after which a send counts as
+    # crashed and may be resumed
+    NEWSLETTER_BATCH_SIZE: int = 200
+    NEWSLETTER_SMTP_CONNECTIONS: int = 4
+    NEWSLETTER_MESSAGES_PER_CONNECTION: int = 1000
+    NEWSLETTER_RATE_PER_SECOND: float = 0
+    NEWSLETTER_LEASE_SECONDS: int = 120
+    
+    # Related posts: neighbours kept per post and the weight of shared tags
+    # against shared words (0-1). Changed posts are indexed again within
+    # UPDATE_INTERVAL seconds, posts changed by other worker processes within
+    # SYNC_INTERVAL, and the whole index is rebuilt every REBUILD_INTERVAL
+    # (0 = only at startup)
+    RELATED_POSTS_K: int = 10
+    RELATED_POSTS_TAG_WEIGHT: float = 0.3
+    RELATED_POSTS_UPDATE_INTERVAL: float = 1.0
+    RELATED_POSTS_SYNC_INTERVAL: float = 60.0
+    RELATED_POSTS_REBUILD_INTERVAL: float = 21600
+    
+    # Pages: rendered and compressed responses kept per page and language
+    PAGE_CACHE_MAX_ENTRIES: int = 256
+    
+    # Response cache: "memory" (per process), "redis" (shared, needs the
+    # redis package) or "none"
+    CACHE_BACKEND: str = "memory"
+    CACHE_REDIS_URL: str = "redis://localhost:6379/0"
+    CACHE_TTL: int = 60
+    CACHE_MAX_ENTRIES: int = 1024
+    
+    # Static files: the output of python -m app.core.static_build, served
+    # instead of STATIC_DIR once it exists
+    STATIC_DIR: str = "./static"
+    STATIC_BUILD_DIR: str = "./build/static"
+    
+    # Metrics: requests slower than this (milliseconds) are logged with their
+    # SQL to the "app.slow_requests" logger, 0 turns the log off
+    SLOW_REQUEST_MS: float = 0
     
     # CORS
     ALLOWED_ORIGINS: List[str] = ["*"]
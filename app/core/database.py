@@ -1,7 +1,12 @@
-from sqlalchemy import create_engine
+from sqlalchemy import BigInteger, create_engine, insert, tuple_
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.core.metrics import metrics
 
 # Create database engine
 engine = create_engine(
@@ -11,12 +16,79 @@ engine = create_engine(
     max_overflow=20
 )
 
+metrics.instrument_engine(engine, "sync")
+
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def async_database_url(url: str) -> str:
+    """Map a database URL onto its async driver"""
+    url = make_url(url)
+    if url.drivername in ("postgresql", "postgresql+psycopg2"):
+        url = url.set(drivername="postgresql+asyncpg")
+        # asyncpg takes `ssl` instead of libpq's `sslmode`
+        if "sslmode" in url.query:
+            url = url.update_query_dict({"ssl": url.query["sslmode"]}).difference_update_query(["sslmode"])
+    elif url.drivername in ("sqlite", "sqlite+pysqlite"):
+        url = url.set(drivername="sqlite+aiosqlite")
+    return url.render_as_string(hide_password=False)
+
+
+def create_async_db_engine(url: str = settings.DATABASE_URL):
+    """Create an async engine with the same pool settings as the sync one"""
+    url = async_database_url(url)
+    options = {"pool_pre_ping": True, "pool_size": 10, "max_overflow": 20}
+    # aiosqlite defaults to opening a connection per checkout
+    if url.startswith("sqlite"):
+        options["poolclass"] = AsyncAdaptedQueuePool
+    return create_async_engine(url, **options)
+
+
+# Async engine, only created when DB_ASYNC is enabled
+async_engine = create_async_db_engine() if settings.DB_ASYNC else None
+if async_engine is not None:
+    metrics.instrument_engine(async_engine.sync_engine, "async")
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+# SQLite only auto-increments (and only aliases the rowid, which the FTS5
+# search index relies on) for INTEGER PRIMARY KEY columns
+@compiles(BigInteger, "sqlite")
+def compile_big_integer_sqlite(type_, compiler, **kw):
+    return "INTEGER"
+
 # Create Base class
 Base = declarative_base()
 
+
+def insert_missing(db, model, rows, keys):
+    """Insert rows, skipping those whose unique `keys` already exist
+    
+    Uses INSERT ... ON CONFLICT DO NOTHING where the dialect has it, so
+    concurrent writers can't both insert the same row.
+    """
+    if not rows:
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as upsert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as upsert
+    else:
+        upsert = None
+    
+    if upsert is not None:
+        db.execute(upsert(model).on_conflict_do_nothing(index_elements=keys), rows)
+        return
+    
+    columns = [getattr(model, key) for key in keys]
+    existing = set(db.query(*columns).filter(
+        tuple_(*columns).in_([tuple(row[key] for key in keys) for row in rows])
+    ))
+    missing = [row for row in rows if tuple(row[key] for key in keys) not in existing]
+    if missing:
+        db.execute(insert(model), missing)
+
 # Dependency to get DB session
 def get_db():
     db = SessionLocal()
@@ -24,3 +96,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Dependency to get async DB session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,134 @@
+"""Outgoing mail: pooled SMTP connections and a send rate limit
+
+Opening an SMTP connection costs a TCP (and TLS) handshake, the greeting,
+EHLO and usually a login, several round trips before the first message.
+SmtpPool keeps connections open and hands them to one sending thread at a
+time, so a newsletter pays that once per connection instead of once per
+subscriber.
+"""
+import smtplib
+import threading
+import time
+from email.message import EmailMessage
+from queue import Empty, LifoQueue
+from typing import Optional
+
+# An idle connection the server may have dropped is checked with NOOP first
+IDLE_CHECK_SECONDS = 30.0
+
+
+class PooledConnection:
+    __slots__ = ("smtp", "messages", "last_used")
+
+    def __init__(self, smtp: smtplib.SMTP):
+        self.smtp = smtp
+        self.messages = 0
+        self.last_used = time.monotonic()
+
+
+class SmtpPool:
+    """Up to `size` SMTP connections, reused across messages
+
+    A connection is replaced after `max_messages` messages, since servers
+    limit how many they take per session, and closed when a send fails so
+    the next message starts on a fresh one. Thread safe.
+    """
+
+    def __init__(self, host: str, port: int, username: str = "", password: str = "",
+                 starttls: bool = False, timeout: float = 30.0, size: int = 4, max_messages: int = 1000):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.size = size
+        self.max_messages = max(1, max_messages)
+        self._idle: LifoQueue = LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+        # Counters
+        self.connections_opened = 0
+        self.messages_sent = 0
+
+    def _connect(self) -> PooledConnection:
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            smtp.ehlo()
+            if self.starttls:
+                smtp.starttls()
+                smtp.ehlo()
+            if self.username:
+                smtp.login(self.username, self.password)
+        except Exception:
+            smtp.close()
+            raise
+        self.connections_opened += 1
+        return PooledConnection(smtp)
+
+    @staticmethod
+    def _close(connection: PooledConnection):
+        try:
+            connection.smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            connection.smtp.close()
+
+    def _checkout(self) -> PooledConnection:
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except Empty:
+                return self._connect()
+            if time.monotonic() - connection.last_used < IDLE_CHECK_SECONDS:
+                return connection
+            try:
+                if connection.smtp.noop()[0] == 250:
+                    return connection
+            except (smtplib.SMTPException, OSError):
+                pass
+            connection.smtp.close()
+
+    def send(self, message: EmailMessage):
+        """Send one message, raises smtplib.SMTPException or OSError if it wasn't accepted"""
+        with self._slots:
+            connection = self._checkout()
+            try:
+                connection.smtp.send_message(message)
+            except Exception:
+                connection.smtp.close()
+                raise
+            connection.messages += 1
+            connection.last_used = time.monotonic()
+            self.messages_sent += 1
+            if connection.messages >= self.max_messages:
+                self._close(connection)
+            else:
+                self._idle.put(connection)
+
+    def close(self):
+        """Close the idle connections"""
+        while True:
+            try:
+                self._close(self._idle.get_nowait())
+            except Empty:
+                return
+
+
+class RateLimiter:
+    """Spaces calls to at most `rate` per second across threads, 0 for no limit"""
+
+    def __init__(self, rate: float = 0):
+        self.rate = rate
+        self._next: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Block until the next call may go"""
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = now if self._next is None else max(now, self._next)
+            self._next = slot + 1.0 / self.rate
+        if slot > now:
+            time.sleep(slot - now)
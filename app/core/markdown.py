@@ -0,0 +1,100 @@
+"""Markdown rendering for post bodies
+
+Posts (the AI generated ones in particular) are written in markdown. They are
+rendered once, when a post is written, into HTML that is safe to insert into
+a page as it is: raw HTML in the source is escaped rather than passed
+through, and links and images may only point to http(s), mailto or relative
+URLs. The plain text of the same parse gives the excerpt and word count.
+"""
+import math
+import re
+import unicodedata
+from typing import NamedTuple
+from markdown_it import MarkdownIt
+
+# Bump when the output changes, rows rendered by an older version are
+# rendered again by `python -m app.services.post_render_service`
+RENDER_VERSION = 1
+
+WORDS_PER_MINUTE = 200
+EXCERPT_LENGTH = 200
+
+SAFE_SCHEMES = {"http", "https", "mailto"}
+_SCHEME = re.compile(r"^([a-z][a-z0-9+.\-]*):")
+# Stripped before looking at the scheme, browsers ignore them too ("java\tscript:")
+_IGNORED_IN_URL = re.compile(r"[\x00-\x20\x7f]+")
+
+
+def is_safe_url(url: str) -> bool:
+    """Whether a link or image URL may go into the rendered HTML"""
+    scheme = _SCHEME.match(_IGNORED_IN_URL.sub("", url).lower())
+    return scheme is None or scheme.group(1) in SAFE_SCHEMES
+
+
+_markdown = MarkdownIt("commonmark", {"html": False}).enable(["table", "strikethrough"])
+_markdown.validateLink = is_safe_url
+
+
+class RenderedMarkdown(NamedTuple):
+    html: str
+    text: str
+    word_count: int
+    reading_minutes: int
+
+
+def _plain_text(tokens) -> str:
+    """Text of parsed markdown, blocks separated by a space"""
+    parts = []
+    for token in tokens:
+        if token.type == "inline":
+            for child in token.children or ():
+                if child.type in ("text", "code_inline"):
+                    parts.append(child.content)
+                elif child.type in ("softbreak", "hardbreak"):
+                    parts.append(" ")
+                elif child.type == "image":
+                    # The alt text is the image's children
+                    parts.append(" ".join(grandchild.content for grandchild in child.children or ()))
+            parts.append(" ")
+        elif token.type in ("code_block", "fence"):
+            parts.append(token.content)
+            parts.append(" ")
+    return " ".join("".join(parts).split())
+
+
+def reading_minutes(word_count: int) -> int:
+    return math.ceil(word_count / WORDS_PER_MINUTE) if word_count else 0
+
+
+def render_markdown(source: str) -> RenderedMarkdown:
+    """HTML, plain text, word count and reading time of a markdown text, from one parse"""
+    tokens = _markdown.parse(source or "")
+    html = _markdown.renderer.render(tokens, _markdown.options, {})
+    text = _plain_text(tokens)
+    word_count = len(text.split())
+    return RenderedMarkdown(html, text, word_count, reading_minutes(word_count))
+
+
+def plain_text(source: str) -> str:
+    """Text of a markdown source without its markup"""
+    return _plain_text(_markdown.parse(source or ""))
+
+
+def excerpt(text: str, length: int = EXCERPT_LENGTH) -> str:
+    """Shorten plain text to at most `length` characters, between words
+
+    Never ends inside a word, so Bengali and Hindi vowel signs stay with
+    their letters. A single word longer than `length` is cut before a
+    combining mark, not after its base.
+    """
+    if len(text) <= length:
+        return text
+    cut = text[:length - 3]
+    space = cut.rfind(" ")
+    if space > 0:
+        cut = cut[:space]
+    else:
+        # Don't separate a base letter from the marks that follow it
+        while cut and unicodedata.category(text[len(cut)]).startswith("M"):
+            cut = cut[:-1]
+    return cut.rstrip(" ,.;:-") + "..."
@@ -0,0 +1,290 @@
+"""Request, database and AI call metrics, served in Prometheus text format
+
+MetricsMiddleware times every request under its route template (so
+/api/posts/{post_id} is one series, not one per post) and, through the
+SQLAlchemy hooks installed by instrument_engine, counts the statements the
+request ran and the time they took. Connection pool checkouts are timed and
+the pool's size and use are read at scrape time. AIService reports each
+upstream call. Everything lives in this process; with several workers each
+one serves its own numbers.
+
+Requests slower than SLOW_REQUEST_MS are logged to "app.slow_requests" with
+the SQL they ran (statements only, parameters are left out).
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import event
+from app.core.config import settings
+
+slow_request_logger = logging.getLogger("app.slow_requests")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+CHECKOUT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+AI_BUCKETS = (0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+# Statements kept per request for the slow request log, and characters per statement
+SLOW_REQUEST_MAX_STATEMENTS = 50
+SLOW_REQUEST_MAX_SQL = 500
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """A monotonically increasing count per label set"""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *values: str, amount: float = 1):
+        with self._lock:
+            self._values[values] = self._values.get(values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for values, count in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labels, values)} {_number(count)}")
+        return lines
+
+
+class Histogram:
+    """Observations counted into cumulative buckets per label set"""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: a count per bucket (plus +Inf), the sum and the count
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *values: str):
+        with self._lock:
+            series = self._series.get(values)
+            if series is None:
+                series = self._series[values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for values, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += bucket
+                    le = 'le="%s"' % ("+Inf" if bound == float("inf") else _number(bound))
+                    lines.append(f"{self.name}_bucket{_labels(self.labels, values, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.labels, values)} {repr(total)}")
+                lines.append(f"{self.name}_count{_labels(self.labels, values)} {count}")
+        return lines
+
+
+class RequestStats:
+    """What one request did, gathered while it runs"""
+    __slots__ = ("statements", "db_seconds", "queries")
+
+    def __init__(self, keep_queries: bool = False):
+        self.statements = 0
+        self.db_seconds = 0.0
+        # (seconds, SQL) of the first statements, when the slow request log is on
+        self.queries: Optional[List[Tuple[float, str]]] = [] if keep_queries else None
+
+
+# The request being served; copied into the threadpool for sync endpoints
+_current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+class Metrics:
+    """Every metric the app exports"""
+
+    def __init__(self):
+        self.requests = Counter(
+            "http_requests_total", "Requests served, by route and status", ("method", "route", "status")
+        )
+        self.request_seconds = Histogram(
+            "http_request_duration_seconds", "Time to serve a request, body included", ("method", "route")
+        )
+        self.request_statements = Histogram(
+            "http_request_db_statements", "SQL statements run per request", ("method", "route"),
+            buckets=STATEMENT_BUCKETS
+        )
+        self.request_db_seconds = Histogram(
+            "http_request_db_duration_seconds", "Time spent running SQL per request", ("method", "route")
+        )
+        self.statements = Counter(
+            "db_statements_total", "SQL statements run, background work included", ("engine",)
+        )
+        self.statement_seconds = Histogram(
+            "db_statement_duration_seconds", "Time to run one SQL statement", ("engine",)
+        )
+        self.checkout_seconds = Histogram(
+            "db_pool_checkout_duration_seconds", "Time to get a connection from the pool, waiting included",
+            ("engine",), buckets=CHECKOUT_BUCKETS
+        )
+        self.ai_seconds = Histogram(
+            "ai_upstream_request_duration_seconds",
+            "Time OpenRouter took to answer one attempt (to the first byte when streaming)",
+            ("operation", "status"), buckets=AI_BUCKETS
+        )
+        self._engines: Dict[str, object] = {}
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, stats: RequestStats):
+        self.requests.inc(method, route, str(status))
+        self.request_seconds.observe(seconds, method, route)
+        self.request_statements.observe(stats.statements, method, route)
+        self.request_db_seconds.observe(stats.db_seconds, method, route)
+
+    def observe_ai_call(self, operation: str, status: str, seconds: float):
+        self.ai_seconds.observe(seconds, operation, status)
+
+    def _pool_gauges(self) -> List[str]:
+        gauges = (
+            ("db_pool_size", "Connections the pool keeps open", "size"),
+            ("db_pool_checked_out", "Connections in use", "checkedout"),
+            ("db_pool_overflow", "Connections open beyond the pool size (negative while below it)", "overflow"),
+        )
+        lines = []
+        for name, help, method in gauges:
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge"]
+            for engine_name, engine in sorted(self._engines.items()):
+                # Only queue pools have these, not NullPool or StaticPool
+                read = getattr(engine.pool, method, None)
+                if read is not None:
+                    lines.append(f"{name}{_labels(('engine',), (engine_name,))} {read()}")
+        return lines
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in (
+            self.requests, self.request_seconds, self.request_statements, self.request_db_seconds,
+            self.statements, self.statement_seconds, self.checkout_seconds, self.ai_seconds
+        ):
+            lines += metric.render()
+        lines += self._pool_gauges()
+        return "\n".join(lines) + "\n"
+
+    def instrument_engine(self, engine, name: str):
+        """Count and time the statements and pool checkouts of a (sync) engine
+
+        For an async engine pass its sync_engine.
+        """
+        self._engines[name] = engine
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info["metrics_started"] = time.perf_counter()
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            seconds = time.perf_counter() - conn.info.pop("metrics_started", time.perf_counter())
+            self.statements.inc(name)
+            self.statement_seconds.observe(seconds, name)
+            stats = _current_request.get()
+            if stats is not None:
+                stats.statements += 1
+                stats.db_seconds += seconds
+                if stats.queries is not None and len(stats.queries) < SLOW_REQUEST_MAX_STATEMENTS:
+                    stats.queries.append((seconds, statement[:SLOW_REQUEST_MAX_SQL]))
+
+        # The pool has no event for the wait before a checkout, so time the call itself
+        pool = engine.pool
+        connect = pool.connect
+
+        def timed_connect(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return connect(*args, **kwargs)
+            finally:
+                self.checkout_seconds.observe(time.perf_counter() - started, name)
+
+        pool.connect = timed_connect
+
+
+metrics = Metrics()
+
+
+def route_label(scope: dict) -> str:
+    """The route template a request matched, so ids don't make new series"""
+    route = scope.get("route")
+    if route is not None and getattr(route, "path", None):
+        return route.path
+    if scope.get("endpoint") is not None:
+        # A mounted app, such as the static files
+        return scope.get("root_path", "") + "/*"
+    return "unmatched"
+
+
+def _log_slow_request(scope: dict, route: str, status: int, seconds: float, stats: RequestStats):
+    lines = [
+        f"Slow request: {scope['method']} {scope['path']} ({route}) {status} in {seconds * 1000:.1f} ms, "
+        f"{stats.statements} statements in {stats.db_seconds * 1000:.1f} ms"
+    ]
+    lines += [f"  {query_seconds * 1000:8.2f} ms  {sql}" for query_seconds, sql in stats.queries or ()]
+    if stats.statements > len(stats.queries or ()):
+        lines.append(f"  ... {stats.statements - len(stats.queries or ())} more")
+    slow_request_logger.warning("\n".join(lines))
+
+
+class MetricsMiddleware:
+    """Record every HTTP request in `metrics`, and log the slow ones
+
+    Add it in main.py with app.add_middleware(MetricsMiddleware).
+    """
+
+    def __init__(self, app, slow_request_ms: float = None):
+        self.app = app
+        self.slow_request_ms = settings.SLOW_REQUEST_MS if slow_request_ms is None else slow_request_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(keep_queries=self.slow_request_ms > 0)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        token = _current_request.set(stats)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            seconds = time.perf_counter() - started
+            _current_request.reset(token)
+            route = route_label(scope)
+            metrics.observe_request(scope["method"], route, status, seconds, stats)
+            if 0 < self.slow_request_ms <= seconds * 1000:
+                _log_slow_request(scope, route, status, seconds, stats)
@@ -0,0 +1,241 @@
+"""Build the static/ tree for production
+
+    python -m app.core.static_build --source static --out build/static
+
+Assets (CSS, JS, images) are copied under content-hashed names such as
+css/style.3f2a9c1b7e.css. References to them in pages, stylesheets and
+scripts are rewritten to the hashed names, so the files can be cached
+forever and a change ships under a new URL. Pages, sw.js and other files
+with well known URLs keep their names. Text files get .gz siblings, and .br
+siblings too when the brotli package is installed. The service worker's
+precache list is written to precache-manifest.js from the assets of
+PRECACHE_PAGES, and its cache version follows the list's content.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import posixpath
+import re
+import shutil
+from typing import Dict, List, Optional, Set
+
+# Keep their names: pages, and files whose URL others know
+ENTRY_SUFFIXES = (".html",)
+ENTRY_FILES = {"sw.js", "robots.txt", "sitemap.xml", "precache-manifest.js"}
+
+# Files whose references to other assets are rewritten to the hashed names
+TEXT_SUFFIXES = (".html", ".css", ".js", ".json", ".webmanifest")
+
+# Worth compressing; other images and fonts are compressed already
+COMPRESSIBLE_SUFFIXES = (".html", ".css", ".js", ".json", ".webmanifest", ".svg", ".txt", ".xml", ".ico")
+
+# Pages whose assets the service worker precaches
+PRECACHE_PAGES = ("index.html", "post-detail.html")
+PRECACHE_MANIFEST = "precache-manifest.js"
+
+HASH_LENGTH = 10
+
+# A URL ending in a file extension, in quotes or url(...)
+REFERENCE = re.compile(r"""(?P<quote>["'(])(?P<url>[^"'()\s<>]+?\.[A-Za-z0-9]+)(?=[?#"')])""")
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+
+def hashed_name(path: str, digest: str) -> str:
+    """css/style.css -> css/style.<digest>.css"""
+    stem, suffix = posixpath.splitext(path)
+    return f"{stem}.{digest}{suffix}"
+
+
+def resolve_reference(url: str, referrer: str) -> Optional[str]:
+    """Path under the static root that `url`, found in `referrer`, points to"""
+    if "://" in url or url.startswith(("//", "data:")):
+        return None
+    if url.startswith("/"):
+        path = url[1:]
+    else:
+        path = posixpath.join(posixpath.dirname(referrer), url)
+    path = posixpath.normpath(path)
+    return None if path.startswith("..") else path
+
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+class StaticBuild:
+    """One build of a static tree into an output directory"""
+
+    def __init__(self, source: str, out: str):
+        self.source = os.path.abspath(source)
+        self.out = os.path.abspath(out)
+        self.files: List[str] = []
+        self._sources: Set[str] = set()
+        self.hashed: Dict[str, str] = {}
+        self.references: Dict[str, Set[str]] = {}
+        self.written: List[str] = []
+        self._copies: Set[str] = set()
+        self._visiting: Set[str] = set()
+
+    def _is_entry(self, path: str) -> bool:
+        return path.endswith(ENTRY_SUFFIXES) or path in ENTRY_FILES
+
+    def _read(self, path: str) -> bytes:
+        with open(os.path.join(self.source, path), "rb") as source:
+            return source.read()
+
+    def _write(self, path: str, data: bytes):
+        target = os.path.join(self.out, path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "wb") as out:
+            out.write(data)
+        self.written.append(path)
+
+    def _rewrite(self, path: str, data: bytes) -> bytes:
+        """Point the references in a text file at the hashed names"""
+        referenced = self.references.setdefault(path, set())
+
+        def replace(match):
+            url = match.group("url")
+            target = resolve_reference(url, path)
+            if target is None or target == path or (target not in self.hashed and not self._hashable(target)):
+                return match.group(0)
+            referenced.add(target)
+            name = self.hashed.get(target) or self._hash(target)
+            # Only the file name changes, the URL keeps its form
+            return match.group("quote") + posixpath.join(posixpath.dirname(url), posixpath.basename(name))
+
+        return REFERENCE.sub(replace, data.decode("utf-8")).encode("utf-8")
+
+    def _hashable(self, path: str) -> bool:
+        return path in self._sources and not self._is_entry(path)
+
+    def _hash(self, path: str) -> str:
+        """Write an asset under its hashed name, after the assets it references"""
+        if path in self.hashed:
+            return self.hashed[path]
+        if path in self._visiting:
+            # Assets referencing each other: this reference keeps the plain name
+            return path
+        self._visiting.add(path)
+        data = self._read(path)
+        if path.endswith(TEXT_SUFFIXES):
+            data = self._rewrite(path, data)
+        self._visiting.discard(path)
+
+        name = hashed_name(path, content_hash(data))
+        self.hashed[path] = name
+        self._write(name, data)
+        # The plain name stays available for URLs the build can't see
+        self._write(path, data)
+        self._copies.add(path)
+        return name
+
+    def _precached(self) -> List[str]:
+        """Hashed URLs of the assets the precache pages need, and what those need"""
+        seen, pending = set(), [page for page in PRECACHE_PAGES if page in self._sources]
+        while pending:
+            path = pending.pop()
+            for target in self.references.get(path, ()):
+                if target not in seen:
+                    seen.add(target)
+                    pending.append(target)
+        return sorted("/" + self.hashed[path] for path in seen if path in self.hashed)
+
+    def _write_precache_manifest(self, assets: List[str]):
+        manifest = {"version": content_hash(json.dumps(assets).encode()), "pages": ["/"], "assets": assets}
+        data = (
+            "// Written by app.core.static_build, do not edit\n"
+            f"self.PRECACHE_MANIFEST = {json.dumps(manifest, indent=4)};\n"
+        ).encode()
+        name = hashed_name(PRECACHE_MANIFEST, content_hash(data))
+        self.hashed[PRECACHE_MANIFEST] = name
+        self._write(name, data)
+        self._write(PRECACHE_MANIFEST, data)
+        self._copies.add(PRECACHE_MANIFEST)
+
+    def _compress(self, path: str) -> Dict[str, int]:
+        """Write .gz and .br siblings of a file, where they are smaller"""
+        target = os.path.join(self.out, path)
+        with open(target, "rb") as source:
+            data = source.read()
+        sizes = {"raw": len(data)}
+        encoded = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+        brotli = _brotli()
+        if brotli is not None:
+            encoded[".br"] = brotli.compress(data, quality=11)
+        for suffix, body in encoded.items():
+            if len(body) < len(data):
+                with open(target + suffix, "wb") as out:
+                    out.write(body)
+                sizes[suffix] = len(body)
+        return sizes
+
+    def run(self) -> dict:
+        """Build the tree; returns the sizes served, raw and compressed
+
+        Plain-name copies of hashed assets are compressed too but not counted.
+        """
+        if os.path.commonpath([self.out, self.source]) in (self.out, self.source):
+            raise ValueError("The source and output directories must not contain each other")
+        if os.path.isdir(self.out):
+            shutil.rmtree(self.out)
+
+        for root, directories, files in os.walk(self.source):
+            directories[:] = [name for name in directories if not name.startswith(".")]
+            for name in files:
+                if not name.startswith(".") and not name.endswith((".gz", ".br")):
+                    self.files.append(os.path.relpath(os.path.join(root, name), self.source).replace(os.sep, "/"))
+        self.files.sort()
+        self._sources = set(self.files)
+
+        for path in self.files:
+            if not self._is_entry(path):
+                self._hash(path)
+        for path in self.files:
+            if path.endswith(ENTRY_SUFFIXES):
+                # Record the pages' references before listing what to precache
+                self._rewrite(path, self._read(path))
+        self._write_precache_manifest(self._precached())
+        for path in self.files:
+            if self._is_entry(path) and path != PRECACHE_MANIFEST:
+                data = self._read(path)
+                self._write(path, self._rewrite(path, data) if path.endswith(TEXT_SUFFIXES) else data)
+
+        self._write("asset-manifest.json", json.dumps(self.hashed, indent=2, sort_keys=True).encode())
+
+        totals = {"files": len(self.written), "raw": 0, ".gz": 0, ".br": 0}
+        for path in self.written:
+            if path.endswith(COMPRESSIBLE_SUFFIXES):
+                sizes = self._compress(path)
+                if path not in self._copies:
+                    for key in ("raw", ".gz", ".br"):
+                        totals[key] += sizes.get(key, sizes["raw"])
+        return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", default="static")
+    parser.add_argument("--out", default="build/static")
+    args = parser.parse_args()
+
+    totals = StaticBuild(args.source, args.out).run()
+    print(f"{totals['files']} files written to {args.out}")
+    print(f"compressible text: {totals['raw']} B raw, {totals['.gz']} B gzip", end="")
+    if _brotli() is None:
+        print(", no brotli (pip install brotli for .br files)")
+    else:
+        print(f", {totals['.br']} B brotli")
+
+
+if __name__ == "__main__":
+    main()
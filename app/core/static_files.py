@@ -0,0 +1,89 @@
+import os
+import re
+from mimetypes import guess_type
+from typing import Dict, Set, Tuple
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from app.core.config import settings
+from app.core.static_build import HASH_LENGTH
+
+# Names written by the static build carry a content hash, e.g. style.3f2a9c1b7e.css
+HASHED_NAME = re.compile(r"\.[0-9a-f]{%d}\.[A-Za-z0-9]+$" % HASH_LENGTH)
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+# Precompressed siblings, preferred first
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def accepted_encodings(accept_encoding: str) -> Set[str]:
+    """Content codings an Accept-Encoding header allows, leaving out q=0"""
+    accepted = set()
+    for item in accept_encoding.split(","):
+        name, _, params = item.partition(";")
+        params = params.replace(" ", "").lower()
+        try:
+            quality = float(params[2:]) if params.startswith("q=") else 1.0
+        except ValueError:
+            quality = 1.0
+        if name.strip() and quality > 0:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles for the output of app.core.static_build
+
+    Serves the .br or .gz sibling of a file when the client accepts it, so
+    nothing is compressed per request. Hashed names are cached for a year as
+    immutable; everything else (pages, sw.js) is revalidated on every use.
+    Siblings are looked up once per file, the directory is expected not to
+    change while it is served.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._siblings: Dict[str, Dict[str, Tuple[str, os.stat_result]]] = {}
+
+    def _precompressed(self, full_path: str) -> Dict[str, Tuple[str, os.stat_result]]:
+        siblings = self._siblings.get(full_path)
+        if siblings is None:
+            siblings = {}
+            for encoding, suffix in ENCODINGS:
+                try:
+                    siblings[encoding] = (full_path + suffix, os.stat(full_path + suffix))
+                except OSError:
+                    pass
+            self._siblings[full_path] = siblings
+        return siblings
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope, status_code: int = 200) -> Response:
+        full_path = str(full_path)
+        request_headers = Headers(scope=scope)
+        headers = {"Cache-Control": IMMUTABLE if HASHED_NAME.search(full_path) else "no-cache"}
+        media_type = guess_type(full_path)[0] or "text/plain"
+
+        siblings = self._precompressed(full_path)
+        if siblings:
+            headers["Vary"] = "Accept-Encoding"
+        accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+        for encoding, _ in ENCODINGS:
+            if encoding in accepted and encoding in siblings:
+                full_path, stat_result = siblings[encoding]
+                headers["Content-Encoding"] = encoding
+                break
+
+        response = FileResponse(
+            full_path, status_code=status_code, headers=headers, media_type=media_type,
+            stat_result=stat_result, method=scope["method"]
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+def static_files() -> StaticFiles:
+    """The built static tree when there is one, static/ as it is otherwise"""
+    if os.path.isdir(settings.STATIC_BUILD_DIR):
+        return PrecompressedStaticFiles(directory=settings.STATIC_BUILD_DIR, html=True)
+    return StaticFiles(directory=settings.STATIC_DIR, html=True)
@@ -2,8 +2,11 @@ from app.models.blog_post import BlogPost, BlogPostTag, BlogPostImage
 from app.models.user import User
 from app.models.comment import BlogComment
 from app.models.poll import BlogPoll, PollOption, PollVote
-from app.models.newsletter import NewsletterSubscription
+from app.models.newsletter import NewsletterSubscription, NewsletterIssue, NewsletterDelivery
 from app.models.page import Page
+from app.models.blog_stat import BlogStat, PostViewBucket
+from app.models.tag import Tag
+from app.models.upload import UploadedFile
 
 __all__ = [
     "BlogPost",
@@ -15,5 +18,11 @@ __all__ = [
     "PollOption",
     "PollVote",
     "NewsletterSubscription",
-    "Page"
+    "NewsletterIssue",
+    "NewsletterDelivery",
+    "Page",
+    "BlogStat",
+    "PostViewBucket",
+    "Tag",
+    "UploadedFile"
 ]
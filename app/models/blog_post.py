@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, BigInteger, DateTime, ForeignKey, Table
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Text, Boolean, BigInteger, DateTime, ForeignKey, Table, Index, UniqueConstraint
+from sqlalchemy.orm import query_expression, relationship
 from sqlalchemy.sql import func
+from app.core import markdown
 from app.core.database import Base
 from datetime import datetime
 
@@ -20,10 +21,28 @@ class BlogPost(Base):
     content_hi = Column(Text)
     excerpt_hi = Column(String(500))
     
+    # Rendered from the markdown content of each language when the post is written
+    content_html = Column(Text)
+    content_html_bn = Column(Text)
+    content_html_hi = Column(Text)
+    word_count = Column(Integer)
+    word_count_bn = Column(Integer)
+    word_count_hi = Column(Integer)
+    reading_minutes = Column(Integer)
+    reading_minutes_bn = Column(Integer)
+    reading_minutes_hi = Column(Integer)
+    # markdown.RENDER_VERSION the columns above were rendered with, NULL if never
+    render_version = Column(Integer)
+    # The start of the content, loaded by list queries that leave the content
+    # out, to make an excerpt for posts stored without one
+    content_head = query_expression()
+    
     author = Column(String(100))
     featured_image = Column(String(500))
     published = Column(Boolean, default=False, nullable=False)
     view_count = Column(BigInteger, default=0)
+    # Approved comments, kept up to date by CommentService
+    comment_count = Column(BigInteger, default=0, nullable=False, server_default="0")
     is_ai_generated = Column(Boolean, default=False)
     ai_prompt = Column(Text)
     
@@ -37,24 +56,40 @@ class BlogPost(Base):
     images = relationship("BlogPostImage", back_populates="post", cascade="all, delete-orphan")
     comments = relationship("BlogComment", back_populates="post", cascade="all, delete-orphan")
     
+    __table_args__ = (
+        # Keyset pagination over the published feed seeks on (created_at, id)
+        Index("ix_blog_posts_published_created_at", "published", "created_at", "id"),
+        # Top posts walk the published posts by view count instead of sorting them all
+        Index("ix_blog_posts_published_view_count", "published", "view_count", "id"),
+    )
+    
     def generate_excerpt(self):
         """Generate excerpt from content if not provided"""
         if not self.excerpt and self.content:
-            if len(self.content) > 200:
-                return self.content[:197] + "..."
-            return self.content
+            return markdown.excerpt(markdown.plain_text(self.content))
         return self.excerpt
 
 
 class BlogPostTag(Base):
+    """Links a post to a tag"""
     __tablename__ = "blog_post_tags"
     
     id = Column(BigInteger, primary_key=True, index=True)
-    post_id = Column(BigInteger, ForeignKey("blog_posts.id", ondelete="CASCADE"), nullable=False)
-    tag = Column(String(100), nullable=False)
+    post_id = Column(BigInteger, ForeignKey("blog_posts.id", ondelete="CASCADE"), nullable=False, index=True)
+    tag_id = Column(BigInteger, ForeignKey("tags.id", ondelete="CASCADE"), nullable=False)
     
-    # Relationship
+    # Relationships, the tag name is always needed with the link
     post = relationship("BlogPost", back_populates="tags")
+    tag_ref = relationship("Tag", lazy="joined", innerjoin=True)
+    
+    __table_args__ = (
+        # A tag once per post; the index also serves tag -> posts lookups
+        UniqueConstraint("tag_id", "post_id", name="uq_blog_post_tags_tag_post"),
+    )
+    
+    @property
+    def tag(self) -> str:
+        return self.tag_ref.name
 
 
 class BlogPostImage(Base):
@@ -0,0 +1,44 @@
+from sqlalchemy import Column, String, Integer, BigInteger, Index, UniqueConstraint
+from app.core.database import Base
+
+class BlogStat(Base):
+    """Running post and view counters
+    
+    One row for the whole blog (scope "all") and one per author and per tag,
+    kept up to date by the write paths so statistics never need a full scan.
+    """
+    __tablename__ = "blog_stats"
+    
+    id = Column(BigInteger, primary_key=True, index=True)
+    scope = Column(String(20), nullable=False)
+    name = Column(String(100), nullable=False, default="")
+    total_posts = Column(BigInteger, nullable=False, default=0)
+    published_posts = Column(BigInteger, nullable=False, default=0)
+    total_views = Column(BigInteger, nullable=False, default=0)
+    
+    __table_args__ = (
+        UniqueConstraint("scope", "name", name="uq_blog_stats_scope_name"),
+    )
+
+
+class PostViewBucket(Base):
+    """Views of a post in one hour
+    
+    Written by the view counter along with view_count, read by the trending
+    ranking. There is no foreign key, so a flush never fails on a post
+    deleted meanwhile; the ranking joins on published posts and buckets
+    older than the longest trending window are deleted.
+    """
+    __tablename__ = "post_view_buckets"
+    
+    id = Column(BigInteger, primary_key=True, index=True)
+    post_id = Column(BigInteger, nullable=False)
+    # Hours since the epoch
+    hour = Column(Integer, nullable=False)
+    views = Column(BigInteger, nullable=False, default=0)
+    
+    __table_args__ = (
+        UniqueConstraint("post_id", "hour", name="uq_post_view_buckets_post_hour"),
+        # Ranking a window reads (hour, post_id, views) from the index alone
+        Index("ix_post_view_buckets_hour_post", "hour", "post_id", "views"),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, BigInteger, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, Boolean, BigInteger, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -15,9 +15,17 @@ class BlogComment(Base):
     author_name = Column(String(100))
     author_email = Column(String(100))
     approved = Column(Boolean, default=False)
+    upvotes = Column(BigInteger, default=0, nullable=False, server_default="0")
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
     post = relationship("BlogPost", back_populates="comments")
     replies = relationship("BlogComment", remote_side=[id])
+    
+    __table_args__ = (
+        # A page of a post's top-level comments, newest first
+        Index("ix_blog_comments_post_parent_created", "post_id", "parent_id", "created_at", "id"),
+        # The replies of a comment, for the thread query
+        Index("ix_blog_comments_parent_id", "parent_id"),
+    )
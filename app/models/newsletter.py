@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, BigInteger, DateTime
+from sqlalchemy import Column, Integer, String, Text, Boolean, BigInteger, DateTime, Float, ForeignKey, Index, JSON
 from sqlalchemy.sql import func
 from app.core.database import Base
 
@@ -8,6 +8,48 @@ class NewsletterSubscription(Base):
     id = Column(BigInteger, primary_key=True, index=True)
     email = Column(String(100), unique=True, nullable=False, index=True)
     name = Column(String(100))
+    language = Column(String(5), default="en", nullable=False, server_default="en")
     active = Column(Boolean, default=True)
     subscribed_at = Column(DateTime(timezone=True), server_default=func.now())
     unsubscribed_at = Column(DateTime(timezone=True))
+
+
+class NewsletterIssue(Base):
+    __tablename__ = "newsletter_issues"
+    
+    id = Column(BigInteger, primary_key=True, index=True)
+    subject = Column(String(200), nullable=False)
+    intro = Column(Text)
+    post_ids = Column(JSON, nullable=False)
+    # draft, sending, paused or sent
+    status = Column(String(20), default="draft", nullable=False)
+    
+    # Send progress: subscribers up to this id have been claimed
+    last_subscriber_id = Column(BigInteger, default=0, nullable=False)
+    sent_count = Column(BigInteger, default=0, nullable=False)
+    failed_count = Column(BigInteger, default=0, nullable=False)
+    unknown_count = Column(BigInteger, default=0, nullable=False)
+    send_seconds = Column(Float, default=0.0, nullable=False)
+    # Refreshed by the sending process; a send without one for a while has crashed
+    heartbeat_at = Column(DateTime(timezone=True))
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+
+
+class NewsletterDelivery(Base):
+    __tablename__ = "newsletter_deliveries"
+    
+    id = Column(BigInteger, primary_key=True, index=True)
+    issue_id = Column(BigInteger, ForeignKey("newsletter_issues.id", ondelete="CASCADE"), nullable=False)
+    subscriber_id = Column(BigInteger, ForeignKey("newsletter_subscriptions.id", ondelete="CASCADE"), nullable=False)
+    # pending (claimed, being sent), sent, failed, or unknown (claimed by a send that crashed)
+    status = Column(String(10), default="pending", nullable=False)
+    error = Column(String(500))
+    sent_at = Column(DateTime(timezone=True))
+    
+    __table_args__ = (
+        # A subscriber is claimed once per issue, so no send can mail them twice
+        Index("uq_newsletter_deliveries_issue_subscriber", "issue_id", "subscriber_id", unique=True),
+    )
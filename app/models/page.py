@@ -9,6 +9,13 @@ class Page(Base):
     title = Column(String(200), nullable=False)
     slug = Column(String(200), unique=True, nullable=False, index=True)
     content = Column(Text, nullable=False)
+    
+    # Translations, English is shown where they are missing
+    title_bn = Column(String(200))
+    content_bn = Column(Text)
+    title_hi = Column(String(200))
+    content_hi = Column(Text)
+    
     published = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
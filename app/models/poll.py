@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, BigInteger, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, BigInteger, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -26,6 +26,10 @@ class PollOption(Base):
     
     # Relationships
     poll = relationship("BlogPoll", back_populates="options")
+    
+    __table_args__ = (
+        Index("ix_poll_options_poll_id", "poll_id"),
+    )
     votes = relationship("PollVote", back_populates="option", cascade="all, delete-orphan")
 
 
@@ -40,3 +44,9 @@ class PollVote(Base):
     
     # Relationships
     option = relationship("PollOption", back_populates="votes")
+    
+    __table_args__ = (
+        # One vote per IP and poll, checked by the database so concurrent votes can't slip through
+        Index("uq_poll_votes_poll_ip", "poll_id", "user_ip", unique=True),
+        Index("ix_poll_votes_option_id", "option_id"),
+    )
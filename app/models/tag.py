@@ -0,0 +1,14 @@
+from sqlalchemy import Column, String, BigInteger, DateTime
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+class Tag(Base):
+    """A tag name, stored once and referenced by blog_post_tags
+    
+    Per-tag post counts are kept in blog_stats (scope "tag").
+    """
+    __tablename__ = "tags"
+    
+    id = Column(BigInteger, primary_key=True, index=True)
+    name = Column(String(100), unique=True, nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+class UploadedFile(Base):
+    """An uploaded file, stored under its content hash
+    
+    Identical uploads share the file; `references` counts them, so deleting
+    one upload only removes the file once no other upload uses it.
+    """
+    __tablename__ = "uploaded_files"
+    
+    id = Column(BigInteger, primary_key=True, index=True)
+    filename = Column(String(100), unique=True, nullable=False)
+    references = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
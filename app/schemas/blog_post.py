@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional, List
 from datetime import datetime
 
@@ -23,13 +23,55 @@ class BlogPostUpdate(BaseModel):
     featured_image: Optional[str] = None
     published: Optional[bool] = None
 
+class BlogPostBatchUpdate(BlogPostUpdate):
+    id: int
+
+class BlogPostBatchCreateRequest(BaseModel):
+    posts: List[BlogPostCreate] = Field(..., min_length=1, max_length=1000)
+
+class BlogPostBatchUpdateRequest(BaseModel):
+    posts: List[BlogPostBatchUpdate] = Field(..., min_length=1, max_length=1000)
+
+class BlogPostArchive(BlogPostBase):
+    """A post read from an archive line: the fields of a new post plus what an export keeps"""
+    excerpt: Optional[str] = Field(None, max_length=500)
+    title_bn: Optional[str] = Field(None, max_length=200)
+    content_bn: Optional[str] = None
+    excerpt_bn: Optional[str] = Field(None, max_length=500)
+    title_hi: Optional[str] = Field(None, max_length=200)
+    content_hi: Optional[str] = None
+    excerpt_hi: Optional[str] = Field(None, max_length=500)
+    author: Optional[str] = Field(None, max_length=100)
+    tags: Optional[List[str]] = None
+    images: Optional[List[str]] = None
+    featured_image: Optional[str] = Field(None, max_length=500)
+    view_count: Optional[int] = Field(None, ge=0)
+    is_ai_generated: Optional[bool] = None
+    ai_prompt: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    published_at: Optional[datetime] = None
+
 class BlogPostResponse(BlogPostBase):
+    # What is stored is served as it is; the input limits don't hold for
+    # translations, which may be shorter
+    title: str
+    content: str
     id: int
     view_count: int = 0
     is_ai_generated: bool = False
     created_at: datetime
     updated_at: Optional[datetime] = None
     published_at: Optional[datetime] = None
+    content_html: Optional[str] = None
+    word_count: Optional[int] = None
+    reading_minutes: Optional[int] = None
+    
+    @field_validator("tags", mode="before")
+    @classmethod
+    def tag_names(cls, value):
+        """Accept BlogPostTag rows as well as plain tag names"""
+        return [getattr(tag, "tag", tag) for tag in value or []]
     
     class Config:
         from_attributes = True
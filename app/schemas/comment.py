@@ -0,0 +1,9 @@
+from pydantic import BaseModel, EmailStr, Field
+from typing import Optional
+
+class CommentCreate(BaseModel):
+    post_id: int
+    parent_id: Optional[int] = None
+    author_name: str = Field(..., min_length=1, max_length=100)
+    author_email: EmailStr
+    content: str = Field(..., min_length=10, max_length=2000)
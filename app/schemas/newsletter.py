@@ -0,0 +1,12 @@
+from pydantic import BaseModel, EmailStr, Field
+from typing import Optional, List
+
+class NewsletterSubscribe(BaseModel):
+    email: EmailStr
+    name: Optional[str] = Field(None, max_length=100)
+    language: str = "en"
+
+class NewsletterIssueCreate(BaseModel):
+    subject: str = Field(..., min_length=3, max_length=200)
+    intro: Optional[str] = Field(None, max_length=5000)
+    post_ids: List[int] = Field(..., min_length=1, max_length=20)
@@ -0,0 +1,31 @@
+from pydantic import BaseModel, Field, field_validator
+from typing import Optional
+
+SLUG_PATTERN = r"^[a-z0-9]+(?:-[a-z0-9]+)*$"
+
+class PageCreate(BaseModel):
+    slug: str = Field(..., max_length=200, pattern=SLUG_PATTERN)
+    title: str = Field(..., min_length=1, max_length=200)
+    content: str = Field(..., min_length=1)
+    title_bn: Optional[str] = Field(None, max_length=200)
+    content_bn: Optional[str] = None
+    title_hi: Optional[str] = Field(None, max_length=200)
+    content_hi: Optional[str] = None
+    published: bool = True
+
+class PageUpdate(BaseModel):
+    title: Optional[str] = Field(None, min_length=1, max_length=200)
+    content: Optional[str] = Field(None, min_length=1)
+    title_bn: Optional[str] = Field(None, max_length=200)
+    content_bn: Optional[str] = None
+    title_hi: Optional[str] = Field(None, max_length=200)
+    content_hi: Optional[str] = None
+    published: Optional[bool] = None
+    
+    @field_validator("title", "content", "published")
+    @classmethod
+    def not_null(cls, value):
+        """These may be left out, but not cleared: the columns are required"""
+        if value is None:
+            raise ValueError("may not be null")
+        return value
@@ -0,0 +1,11 @@
+from pydantic import BaseModel, Field
+from typing import Optional, List
+from datetime import datetime
+
+class PollCreate(BaseModel):
+    question: str = Field(..., min_length=3, max_length=500)
+    options: List[str] = Field(..., min_length=2, max_length=20)
+    expires_at: Optional[datetime] = None
+
+class PollVoteCreate(BaseModel):
+    option_id: int
@@ -1,16 +1,19 @@
+import asyncio
 import httpx
+import logging
+import random
+import time
 from app.core.config import settings
+from app.core.metrics import metrics
+from typing import AsyncIterator, Optional
 import json
 
-class AIService:
-    def __init__(self):
-        self.api_key = settings.OPENROUTER_API_KEY
-        self.base_url = "https://openrouter.ai/api/v1/chat/completions"
-    
-    async def generate_blog_post(self, prompt: str) -> dict:
-        """Generate blog post using OpenRouter AI"""
-        
-        system_prompt = """You are a professional blog writer. Generate a well-structured blog post based on the user's prompt.
+logger = logging.getLogger(__name__)
+
+# Upstream answers worth retrying: rate limited or a transient server error
+RETRY_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+SYSTEM_PROMPT = """You are a professional blog writer. Generate a well-structured blog post based on the user's prompt.
         Return ONLY a valid JSON object with the following structure:
         {
             "title": "Blog post title",
@@ -18,56 +21,185 @@ class AIService:
             "excerpt": "Brief summary (150-200 characters)",
             "tags": ["tag1", "tag2", "tag3"]
         }"""
-        
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        
+
+
+class AIService:
+    """Client for the OpenRouter chat completions API
+
+    All calls share one pooled httpx client, so connections (and their TLS
+    sessions) are kept alive between requests. At most AI_MAX_CONCURRENCY
+    calls run upstream at once, and failed calls are retried with jittered
+    exponential backoff.
+    """
+
+    def __init__(self, base_url: str = None, api_key: str = None,
+                 max_concurrency: int = None, max_retries: int = None):
+        self.api_key = api_key or settings.OPENROUTER_API_KEY
+        self.base_url = (base_url or settings.OPENROUTER_BASE_URL).rstrip("/") + "/chat/completions"
+        self.max_concurrency = max_concurrency or settings.AI_MAX_CONCURRENCY
+        self.max_retries = settings.AI_MAX_RETRIES if max_retries is None else max_retries
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def start(self):
+        """Open the shared client, called at app startup"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json"
+                },
+                timeout=httpx.Timeout(settings.AI_TIMEOUT, connect=10.0),
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                    keepalive_expiry=60.0
+                )
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def stop(self):
+        """Close the shared client, called at app shutdown"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._semaphore = None
+
+    def _payload(self, prompt: str, stream: bool = False) -> dict:
         payload = {
-            "model": "deepseek/deepseek-chat",
+            "model": settings.AI_MODEL,
             "messages": [
-                {"role": "system", "content": system_prompt},
+                {"role": "system", "content": SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ]
         }
-        
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(self.base_url, headers=headers, json=payload)
-            response.raise_for_status()
-            
-            data = response.json()
-            content = data["choices"][0]["message"]["content"]
-            
-            # Parse JSON from response
+        if stream:
+            payload["stream"] = True
+        return payload
+
+    def _backoff(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        """Seconds to wait before the next attempt"""
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
             try:
-                # Try to extract JSON from markdown code blocks
-                if "```json" in content:
-                    json_str = content.split("```json")[1].split("```")[0].strip()
-                elif "```" in content:
-                    json_str = content.split("```")[1].split("```")[0].strip()
-                else:
-                    json_str = content.strip()
-                
-                generated = json.loads(json_str)
-                
-                # Validate required fields
-                if "title" not in generated:
-                    generated["title"] = "AI Generated Blog Post"
-                if "content" not in generated:
-                    generated["content"] = content
-                if "excerpt" not in generated:
-                    generated["excerpt"] = generated["content"][:200]
-                if "tags" not in generated:
-                    generated["tags"] = []
-                
-                return generated
-                
-            except json.JSONDecodeError:
-                # Fallback if JSON parsing fails
-                return {
-                    "title": "AI Generated Blog Post",
-                    "content": content,
-                    "excerpt": content[:200] if len(content) > 200 else content,
-                    "tags": []
-                }
+                return min(float(retry_after), 30.0)
+            except ValueError:
+                pass
+        # Full jitter, so clients that failed together don't retry together
+        return random.uniform(0, min(0.5 * 2 ** attempt, 8.0))
+
+    async def _send(self, payload: dict, stream: bool = False) -> httpx.Response:
+        """POST to the completions endpoint, retrying transient failures
+
+        Every attempt takes one of the AI_MAX_CONCURRENCY slots and gives it
+        back before waiting to retry, so a backoff doesn't keep other calls
+        waiting. With stream=True the body is left unread and the slot stays
+        taken: the caller must close the response and then release the slot.
+        """
+        self.start()
+        operation = "stream" if stream else "generate"
+        attempt = 0
+        while True:
+            response = None
+            keep_slot = False
+            await self._semaphore.acquire()
+            try:
+                started = time.perf_counter()
+                request = self._client.build_request("POST", self.base_url, json=payload)
+                try:
+                    response = await self._client.send(request, stream=stream)
+                finally:
+                    metrics.observe_ai_call(
+                        operation, str(response.status_code) if response is not None else "error",
+                        time.perf_counter() - started
+                    )
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                    if response.is_error:
+                        await response.aread()
+                        await response.aclose()
+                    response.raise_for_status()
+                    keep_slot = stream
+                    return response
+                await response.aclose()
+            except httpx.TransportError:
+                if attempt >= self.max_retries:
+                    raise
+            finally:
+                if not keep_slot:
+                    self._semaphore.release()
+
+            delay = self._backoff(attempt, response)
+            logger.warning("OpenRouter call failed (attempt %d), retrying in %.2fs", attempt + 1, delay)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    @staticmethod
+    def parse_generated(content: str) -> dict:
+        """Turn the model's answer into title/content/excerpt/tags"""
+        try:
+            # Try to extract JSON from markdown code blocks
+            if "```json" in content:
+                json_str = content.split("```json")[1].split("```")[0].strip()
+            elif "```" in content:
+                json_str = content.split("```")[1].split("```")[0].strip()
+            else:
+                json_str = content.strip()
+
+            generated = json.loads(json_str)
+
+            # Validate required fields
+            if "title" not in generated:
+                generated["title"] = "AI Generated Blog Post"
+            if "content" not in generated:
+                generated["content"] = content
+            # A missing excerpt is made from the rendered content when the post is saved
+            generated.setdefault("excerpt", None)
+            if "tags" not in generated:
+                generated["tags"] = []
+
+            return generated
+
+        except json.JSONDecodeError:
+            # Fallback if JSON parsing fails
+            return {
+                "title": "AI Generated Blog Post",
+                "content": content,
+                "excerpt": None,
+                "tags": []
+            }
+
+    async def generate_blog_post(self, prompt: str) -> dict:
+        """Generate blog post using OpenRouter AI"""
+        response = await self._send(self._payload(prompt))
+        data = response.json()
+        content = data["choices"][0]["message"]["content"]
+        return self.parse_generated(content)
+
+    async def stream_blog_post(self, prompt: str) -> AsyncIterator[str]:
+        """Generate blog post, yielding the text as the model produces it
+
+        Only the connection is retried: once tokens have been yielded a
+        failure is raised to the caller.
+        """
+        response = await self._send(self._payload(prompt, stream=True), stream=True)
+        semaphore = self._semaphore
+        try:
+            async for line in response.aiter_lines():
+                # Server-sent events; lines starting with ":" are keep-alive comments
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                if "error" in chunk:
+                    raise httpx.HTTPError(chunk["error"].get("message", "OpenRouter stream error"))
+                choices = chunk.get("choices") or [{}]
+                text = (choices[0].get("delta") or {}).get("content")
+                if text:
+                    yield text
+        finally:
+            await response.aclose()
+            semaphore.release()
+
+ai_service = AIService()
@@ -0,0 +1,216 @@
+import json
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import AsyncIterator, Iterator, List, NamedTuple
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.core.cache import POSTS_SCOPE, response_cache
+from app.core.database import SessionLocal
+from app.models.blog_post import BlogPost, BlogPostTag, BlogPostImage
+from app.models.tag import Tag
+from app.schemas.blog_post import BlogPostArchive
+from app.services.blog_post_service import RENDERED_FIELDS, render_content
+from app.services.related_posts import related_posts
+from app.services.stats_service import PostFootprint, StatsService
+from app.services.tag_service import TagService
+
+# Post columns written to and read from an archive, everything but the id,
+# the comment count (comments aren't archived) and what is rendered from the
+# content, which an import renders again
+ARCHIVE_COLUMNS = tuple(
+    column.name for column in BlogPost.__table__.columns
+    if column.name not in ("id", "comment_count", "render_version")
+    and not column.name.startswith(RENDERED_FIELDS)
+)
+
+# Invalid lines reported back by an import, the rest are only counted
+MAX_REPORTED_ERRORS = 20
+
+
+def _serialize(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+class ArchivedPost(NamedTuple):
+    """A post read from an archive line, ready to render and insert"""
+    row: dict
+    tags: List[str]
+    images: List[str]
+
+
+class PostArchiveService:
+    """Moves posts in and out of the database as NDJSON, one post per line
+
+    Each line holds the post columns plus `tags` (names) and `images` (URLs).
+    Exports read through a server-side cursor and imports write in batches,
+    so neither keeps more than one batch of posts in memory.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def export_lines(self, batch_size: int = 1000) -> Iterator[bytes]:
+        """Every post as an NDJSON line, in id order"""
+        table = BlogPost.__table__
+        result = self.db.execute(
+            select(table).order_by(table.c.id).execution_options(yield_per=batch_size)
+        )
+        for posts in result.partitions():
+            post_ids = [post.id for post in posts]
+            tags = defaultdict(list)
+            for post_id, tag in self.db.execute(
+                select(BlogPostTag.post_id, Tag.name)
+                .join(Tag, Tag.id == BlogPostTag.tag_id)
+                .where(BlogPostTag.post_id.in_(post_ids))
+                .order_by(BlogPostTag.id)
+            ):
+                tags[post_id].append(tag)
+            images = defaultdict(list)
+            for post_id, image_url in self.db.execute(
+                select(BlogPostImage.post_id, BlogPostImage.image_url)
+                .where(BlogPostImage.post_id.in_(post_ids))
+                .order_by(BlogPostImage.id)
+            ):
+                images[post_id].append(image_url)
+
+            lines = []
+            for post in posts:
+                record = {"id": post.id}
+                record.update((name, _serialize(post._mapping[name])) for name in ARCHIVE_COLUMNS)
+                record["tags"] = tags[post.id]
+                record["images"] = images[post.id]
+                lines.append(json.dumps(record, ensure_ascii=False))
+            yield ("\n".join(lines) + "\n").encode()
+
+    def parse(self, record: dict) -> ArchivedPost:
+        """Check an archive line against the post schema and map it to column values
+
+        Raises ValueError if the line is not a valid post.
+        """
+        try:
+            post = BlogPostArchive.model_validate(record)
+        except ValidationError as e:
+            raise ValueError("; ".join(
+                f"{'.'.join(map(str, error['loc'])) or 'line'}: {error['msg']}" for error in e.errors()[:3]
+            ))
+
+        row = {name: getattr(post, name) for name in ARCHIVE_COLUMNS}
+        row["created_at"] = row["created_at"] or datetime.utcnow()
+        row["is_ai_generated"] = bool(row["is_ai_generated"])
+        row["view_count"] = row["view_count"] or 0
+        return ArchivedPost(row, [tag for tag in post.tags or [] if tag], [url for url in post.images or [] if url])
+
+    def import_batch(self, posts: List[ArchivedPost]) -> int:
+        """Insert posts with their tags and images in one transaction
+
+        Archived ids are not kept, every post gets a new one. The markdown is
+        rendered here rather than in parse(), as this runs in a worker thread
+        and parse() on the event loop. Returns the number of posts inserted.
+        """
+        if not posts:
+            return 0
+
+        table = BlogPost.__table__
+        rows = [{**post.row, **render_content(post.row)} for post in posts]
+        try:
+            # One multi-row INSERT ... RETURNING, ids come back in row order
+            post_ids = self.db.execute(
+                table.insert().returning(table.c.id, sort_by_parameter_order=True), rows
+            ).scalars().all()
+
+            tag_ids = TagService(self.db).ids(tag for post in posts for tag in post.tags)
+            tag_rows, image_rows, footprints = [], [], []
+            for post_id, post in zip(post_ids, posts):
+                tag_rows.extend({"post_id": post_id, "tag_id": tag_ids[tag]} for tag in dict.fromkeys(post.tags))
+                image_rows.extend({"post_id": post_id, "image_url": url} for url in post.images)
+                footprints.append((None, PostFootprint(
+                    post.row["author"], tuple(sorted(set(post.tags))),
+                    post.row["published"], post.row["view_count"]
+                )))
+            if tag_rows:
+                self.db.execute(BlogPostTag.__table__.insert(), tag_rows)
+            if image_rows:
+                self.db.execute(BlogPostImage.__table__.insert(), image_rows)
+
+            StatsService(self.db).record_changes(footprints)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        return len(post_ids)
+
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Split a byte stream into lines, whatever the chunk boundaries"""
+    rest = b""
+    async for chunk in chunks:
+        *lines, rest = (rest + chunk).split(b"\n")
+        for line in lines:
+            yield line
+    if rest:
+        yield rest
+
+
+def export_posts(session_factory=SessionLocal, batch_size: int = 1000) -> Iterator[bytes]:
+    """Stream an NDJSON export on its own session"""
+    db = session_factory()
+    try:
+        yield from PostArchiveService(db).export_lines(batch_size)
+    finally:
+        db.close()
+
+
+async def import_posts(chunks: AsyncIterator[bytes], session_factory=SessionLocal,
+                       batch_size: int = 1000) -> dict:
+    """Import an NDJSON byte stream in batches of `batch_size` posts
+
+    Lines that aren't valid posts are skipped and reported. The import stops
+    at the first batch the database rejects, with `aborted` set in the
+    report; earlier batches stay committed.
+    """
+    started = time.perf_counter()
+    report = {"imported": 0, "skipped": 0, "batches": 0, "errors": [], "aborted": False}
+
+    db = session_factory()
+    service = PostArchiveService(db)
+    batch: List[ArchivedPost] = []
+
+    async def flush():
+        report["imported"] += await run_in_threadpool(service.import_batch, list(batch))
+        report["batches"] += 1
+        batch.clear()
+
+    try:
+        line_number = 0
+        async for line in _lines(chunks):
+            line_number += 1
+            if not line.strip():
+                continue
+            try:
+                batch.append(service.parse(json.loads(line)))
+            except (ValueError, TypeError, AttributeError) as e:
+                # JSONDecodeError is a ValueError too
+                report["skipped"] += 1
+                if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                    report["errors"].append({"line": line_number, "error": str(e)})
+                continue
+            if len(batch) >= batch_size:
+                await flush()
+        if batch:
+            await flush()
+    except Exception as e:
+        report["aborted"] = True
+        report["error"] = f"Import stopped after {report['imported']} posts: {e}"
+    finally:
+        db.close()
+        if report["imported"]:
+            # Too many posts to index one by one
+            related_posts.rebuild_soon()
+            await response_cache.invalidate(POSTS_SCOPE)
+
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    report["rows_per_second"] = round(report["imported"] / report["seconds"], 1) if report["seconds"] else None
+    return report
@@ -0,0 +1,175 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import POSTS_SCOPE, post_scope, response_cache
+from app.models.blog_post import BlogPost
+from app.schemas.blog_post import BlogPostBatchUpdate, BlogPostCreate, BlogPostUpdate
+from app.services.blog_post_service import BlogPostService
+from app.services.related_posts import related_posts
+from app.services.stats_service import StatsService
+from app.services.tag_service import TagService
+from app.services.view_counter import view_counter
+from typing import Callable, Optional, List, TypeVar
+
+T = TypeVar("T")
+
+
+class AsyncBlogPostService:
+    """BlogPostService on an AsyncSession
+
+    Same methods and results as BlogPostService: the database work is done by
+    BlogPostService's private methods, run through AsyncSession.run_sync so
+    every statement is awaited on the async driver and a slow query doesn't
+    block the event loop. Only committing and what follows a commit are
+    written here.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def _run(self, work: Callable[[BlogPostService], T]) -> T:
+        """Run `work` with a BlogPostService whose Session executes on the async driver"""
+        return await self.db.run_sync(lambda session: work(BlogPostService(session)))
+
+    async def get_published_posts(self, page: int, size: int, sort_by: str, sort_dir: str, lang: str = "en",
+                                  fields: Optional[str] = None, cursor: Optional[str] = None,
+                                  include_total: Optional[bool] = None):
+        """Get paginated published posts, with their text in `lang`"""
+        return await self._run(
+            lambda service: service._published_posts(page, size, sort_by, sort_dir, lang, fields, cursor, include_total)
+        )
+
+    async def get_post_by_id(self, post_id: int) -> Optional[BlogPost]:
+        """Get post by ID, with its tags"""
+        return await self._run(lambda service: service._post(post_id))
+
+    async def get_localized_post(self, post_id: int, lang: str = "en") -> Optional[dict]:
+        """Get a post by ID as a response dict in `lang`, loading only that language's columns"""
+        return await self._run(lambda service: service._localized_post(post_id, lang))
+
+    async def increment_view_count(self, post_id: int):
+        """Increment view count
+
+        The view is buffered and written in a batch by the view counter.
+        """
+        view_counter.add(post_id)
+
+    async def create_post(self, post_data: BlogPostCreate, ai_prompt: Optional[str] = None) -> BlogPost:
+        """Create new blog post, marked as AI generated when an ai_prompt is given"""
+        post = await self._run(lambda service: service._create_post(post_data, ai_prompt))
+        await self.db.commit()
+        related_posts.mark_changed(post.id)
+        await response_cache.invalidate(POSTS_SCOPE)
+        return post
+
+    async def update_post(self, post_id: int, post_data: BlogPostUpdate) -> Optional[BlogPost]:
+        """Update blog post"""
+        post = await self._run(lambda service: service._update_post(post_id, post_data))
+        if not post:
+            return None
+        await self.db.commit()
+        related_posts.mark_changed(post_id)
+        await response_cache.invalidate(POSTS_SCOPE, post_scope(post_id))
+        return post
+
+    async def create_posts(self, posts: List[BlogPostCreate]) -> List[dict]:
+        """Create many posts in one transaction"""
+        post_ids = await self._run(lambda service: service._insert_posts(posts))
+        await self.db.commit()
+        related_posts.mark_changed(*post_ids)
+        await response_cache.invalidate(POSTS_SCOPE)
+        return [
+            {"index": index, "id": post_id, "status": "created"}
+            for index, post_id in enumerate(post_ids)
+        ]
+
+    async def update_posts(self, items: List[BlogPostBatchUpdate]) -> List[dict]:
+        """Apply many partial updates in one transaction"""
+        results = await self._run(lambda service: service._update_posts(items))
+        await self.db.commit()
+        updated = [result["id"] for result in results if result["status"] == "updated"]
+        if updated:
+            related_posts.mark_changed(*updated)
+            await response_cache.invalidate(POSTS_SCOPE, *(post_scope(post_id) for post_id in updated))
+        return results
+
+    async def delete_post(self, post_id: int) -> bool:
+        """Delete blog post"""
+        if not await self._run(lambda service: service._delete_post(post_id)):
+            return False
+        await self.db.commit()
+        related_posts.mark_changed(post_id)
+        await response_cache.invalidate(POSTS_SCOPE, post_scope(post_id))
+        return True
+
+    async def toggle_publish(self, post_id: int) -> Optional[BlogPost]:
+        """Toggle publish status"""
+        post = await self._run(lambda service: service._toggle_publish(post_id))
+        if not post:
+            return None
+        await self.db.commit()
+        related_posts.mark_changed(post_id)
+        await response_cache.invalidate(POSTS_SCOPE, post_scope(post_id))
+        return post
+
+    async def search_posts(self, keyword: str, page: int, size: int, cursor: Optional[str] = None,
+                           include_total: Optional[bool] = None, fields: Optional[str] = None):
+        """Search posts by keyword, best matches first"""
+        return await self._run(
+            lambda service: service._search_posts(keyword, page, size, cursor, include_total, fields)
+        )
+
+    async def get_posts_by_tag(self, tag: str, page: int, size: int, cursor: Optional[str] = None,
+                               include_total: Optional[bool] = None, fields: Optional[str] = None):
+        """Get posts by tag"""
+        return await self._run(
+            lambda service: service._posts_by_tag(tag, page, size, cursor, include_total, fields)
+        )
+
+    async def get_related_posts(self, post_id: int, limit: int, lang: str = "en") -> Optional[List[dict]]:
+        """Get the posts most related to a post, see BlogPostService.get_related_posts"""
+        return await self._run(lambda service: service._related_posts(post_id, limit, lang))
+
+    async def get_trending_posts(self, window: str, limit: int, lang: str = "en") -> List[dict]:
+        """Get the posts trending in a window, see BlogPostService.get_trending_posts"""
+        return await self._run(lambda service: service._trending_posts(window, limit, lang))
+
+    async def get_top_posts(self, limit: int) -> List[BlogPost]:
+        """Get top posts by view count"""
+        return await self._run(lambda service: service._top_posts(limit))
+
+    async def get_statistics(self):
+        """Get blog statistics from the maintained counters"""
+        return await self.db.run_sync(lambda session: StatsService(session).get_statistics())
+
+    async def get_tags(self, limit: int):
+        """Get tags that have published posts, with their post counts"""
+        return await self.db.run_sync(lambda session: TagService(session).list_tags(limit))
+
+    async def get_popular_tags(self, limit: int):
+        """Get the tags with the most published posts"""
+        return await self.db.run_sync(lambda session: TagService(session).popular(limit))
+
+    async def get_statistics_breakdown(self, scope: str, limit: int):
+        """Get per-tag or per-author statistics"""
+        return await self.db.run_sync(lambda session: StatsService(session).get_breakdown(scope, limit))
+
+    async def reconcile_statistics(self):
+        """Recompute the statistics counters from scratch"""
+        statistics = await self.db.run_sync(lambda session: StatsService(session).reconcile())
+        await response_cache.invalidate(POSTS_SCOPE)
+        return statistics
+
+    async def add_image(self, post_id: int, image_url: str) -> bool:
+        """Add image to post"""
+        if not await self._run(lambda service: service._add_image(post_id, image_url)):
+            return False
+        await self.db.commit()
+        await response_cache.invalidate(post_scope(post_id))
+        return True
+
+    async def set_featured_image(self, post_id: int, image_url: str) -> bool:
+        """Set featured image"""
+        if not await self._run(lambda service: service._set_featured_image(post_id, image_url)):
+            return False
+        await self.db.commit()
+        await response_cache.invalidate(POSTS_SCOPE, post_scope(post_id))
+        return True
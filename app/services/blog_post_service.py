@@ -1,78 +1,280 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import desc, asc, func, or_
+from sqlalchemy.orm import Session, load_only, selectinload, with_expression
+from sqlalchemy import case, desc, asc, func, inspect, or_, update
+from app.core.cache import POSTS_SCOPE, post_scope, response_cache
+from app.core.database import insert_missing
+from app.core.markdown import RENDER_VERSION, excerpt, plain_text, render_markdown
 from app.models.blog_post import BlogPost, BlogPostTag, BlogPostImage
-from app.schemas.blog_post import BlogPostCreate, BlogPostUpdate
-from typing import Optional, List
+from app.models.tag import Tag
+from app.schemas.blog_post import BlogPostBatchUpdate, BlogPostCreate, BlogPostUpdate
+from app.services.pagination import CURSOR_SORT_KEYS, apply_keyset, cursor_after, decode_cursor, encode_cursor
+from app.services.related_posts import related_posts
+from app.services.search_service import get_search_backend
+from app.services.stats_service import PostFootprint, StatsService
+from app.services.tag_service import TagService
+from app.services.trending import trending_posts
+from app.services.view_counter import view_counter
+from typing import Optional, List, Dict, Iterable, Tuple
 from datetime import datetime
 import math
 
+# Columns needed to render a post card in list responses
+LIST_FIELDS = (
+    "id", "title", "excerpt", "author", "featured_image", "published",
+    "view_count", "is_ai_generated", "created_at", "updated_at", "published_at",
+    "word_count", "reading_minutes"
+)
+
+# Large Text columns that list responses only load when asked for via `fields=`
+HEAVY_FIELDS = ("content", "content_bn", "content_hi", "content_html")
+
+# The start of the content of a post stored without an excerpt, enough markdown
+# to make one from; list queries load it instead of the whole content
+EXCERPT_SOURCE = case(
+    (or_(BlogPost.excerpt.is_(None), BlogPost.excerpt == ""), func.substr(BlogPost.content, 1, 1000))
+)
+
+# Columns of a single post response, besides its tags
+POST_FIELDS = LIST_FIELDS + ("content", "content_html")
+
+# Languages posts are written in; English is the original and the fallback
+LANGUAGES = ("en", "bn", "hi")
+
+# Fields stored once per language, as e.g. `title`, `title_bn` and `title_hi`
+TRANSLATED_FIELDS = ("title", "excerpt", "content", "content_html", "word_count", "reading_minutes")
+
+# Fields rendered from a language's markdown content whenever it is written
+RENDERED_FIELDS = ("content_html", "word_count", "reading_minutes")
+
+
+def parse_fields(fields: Optional[str]) -> List[str]:
+    """Return the heavy columns requested in a comma separated `fields` value"""
+    if not fields:
+        return []
+    requested = {field.strip() for field in fields.split(",")}
+    return [field for field in HEAVY_FIELDS if field in requested]
+
+
+def parse_lang(lang: Optional[str]) -> str:
+    """Return the language asked for by `lang`, English if posts aren't written in it"""
+    lang = (lang or "en").lower()
+    return lang if lang in LANGUAGES else "en"
+
+
+def language_suffix(lang: str) -> str:
+    """Suffix of the columns holding `lang`'s version of a translated field"""
+    return "" if lang == "en" else f"_{lang}"
+
+
+def render_content(values: dict, partial: bool = False) -> dict:
+    """Column values rendered from the markdown content in `values`
+    
+    Every language is rendered, one without content in `values` to empty
+    columns, and the row is marked as rendered with RENDER_VERSION. With
+    `partial` only the languages whose content is in `values` are rendered
+    and the version is left alone. A language gets an excerpt made from its
+    text unless `values` has one for it.
+    """
+    rendered = {}
+    for lang in LANGUAGES:
+        suffix = language_suffix(lang)
+        if partial and f"content{suffix}" not in values:
+            continue
+        content = values.get(f"content{suffix}")
+        if not content:
+            rendered.update((f"{name}{suffix}", None) for name in RENDERED_FIELDS)
+            continue
+        markdown = render_markdown(content)
+        rendered[f"content_html{suffix}"] = markdown.html
+        rendered[f"word_count{suffix}"] = markdown.word_count
+        rendered[f"reading_minutes{suffix}"] = markdown.reading_minutes
+        if not values.get(f"excerpt{suffix}"):
+            rendered[f"excerpt{suffix}"] = excerpt(markdown.text)
+    if not partial:
+        rendered["render_version"] = RENDER_VERSION
+    return rendered
+
+
+def render_post(post: BlogPost):
+    """Set a post's rendered columns from its content in every language"""
+    values = {
+        f"{name}{language_suffix(lang)}": getattr(post, f"{name}{language_suffix(lang)}")
+        for lang in LANGUAGES for name in ("content", "excerpt")
+    }
+    for name, value in render_content(values).items():
+        setattr(post, name, value)
+
+
+def translated_columns(names: Iterable[str], lang: str) -> List:
+    """Columns to load to show `names` in `lang`
+    
+    A translated field needs its `lang` column and the English one to fall
+    back on; the other languages' columns stay deferred.
+    """
+    columns = []
+    for name in names:
+        columns.append(getattr(BlogPost, name))
+        if lang != "en" and name in TRANSLATED_FIELDS:
+            columns.append(getattr(BlogPost, f"{name}_{lang}"))
+    return columns
+
+
+def diff_tags(existing: List[Tuple[int, str]], tags: List[str]) -> Tuple[List[int], List[str]]:
+    """Turn a post's (tag row id, tag) pairs into `tags`
+    
+    Returns the row ids to delete and the tags to insert. Unchanged tags keep
+    their rows; repeated tags are stored once.
+    """
+    wanted = list(dict.fromkeys(tags))
+    kept = set()
+    delete_ids = []
+    for row_id, tag in existing:
+        if tag in kept or tag not in wanted:
+            delete_ids.append(row_id)
+        else:
+            kept.add(tag)
+    return delete_ids, [tag for tag in wanted if tag not in kept]
+
+
 class BlogPostService:
+    """Blog post reads and writes on a Session
+    
+    The database work is done by the private methods, which never commit.
+    The public methods commit, update the related posts index and the
+    response cache around them. AsyncBlogPostService calls the same private
+    methods through AsyncSession.run_sync, so both services run the same
+    statements.
+    """
+    
     def __init__(self, db: Session):
         self.db = db
     
-    async def get_published_posts(self, page: int, size: int, sort_by: str, sort_dir: str, lang: str = "en"):
-        """Get paginated published posts"""
-        # Query published posts
-        query = self.db.query(BlogPost).filter(BlogPost.published == True)
+    def _load_tags(self, post_ids: Iterable[int]) -> Dict[int, List[str]]:
+        """Load the tags of many posts in a single query"""
+        tags = {post_id: [] for post_id in post_ids}
+        if not tags:
+            return tags
         
-        # Apply sorting
-        if sort_dir.lower() == "asc":
-            query = query.order_by(asc(getattr(BlogPost, sort_by, BlogPost.created_at)))
-        else:
-            query = query.order_by(desc(getattr(BlogPost, sort_by, BlogPost.created_at)))
+        rows = self.db.query(BlogPostTag.post_id, Tag.name).join(Tag, Tag.id == BlogPostTag.tag_id).filter(
+            BlogPostTag.post_id.in_(list(tags))
+        ).order_by(BlogPostTag.id).all()
+        for post_id, tag in rows:
+            tags[post_id].append(tag)
+        return tags
+    
+    @staticmethod
+    def _to_list_item(post: BlogPost, tags: List[str], fields: List[str], lang: str = "en") -> dict:
+        """Convert a post loaded with the list projection to a dict in `lang`"""
+        post_dict = {name: getattr(post, name) for name in LIST_FIELDS}
+        for name in fields:
+            post_dict[name] = getattr(post, name)
+        
+        # Posts written before excerpts were generated on write have none stored
+        if not post.excerpt:
+            source = post.content if "content" in fields else post.content_head
+            if source:
+                post_dict["excerpt"] = excerpt(plain_text(source))
+        
+        # Translations replace the English text, unless they are empty
+        if lang != "en":
+            for name in TRANSLATED_FIELDS:
+                if name in post_dict and getattr(post, f"{name}_{lang}"):
+                    post_dict[name] = getattr(post, f"{name}_{lang}")
+        
+        post_dict["tags"] = tags
+        return post_dict
+    
+    def _list_query(self, fields: List[str], lang: str = "en"):
+        """Query published posts with the list projection in `lang`"""
+        columns = translated_columns(LIST_FIELDS + tuple(fields), lang)
+        return self.db.query(BlogPost).options(
+            load_only(*columns), with_expression(BlogPost.content_head, EXCERPT_SOURCE)
+        ).filter(BlogPost.published == True)
+    
+    def _paginate(self, query, page: int, size: int, sort_by: str, sort_dir: str,
+                  cursor: Optional[str], include_total: Optional[bool], fields: List[str], lang: str = "en"):
+        """Fetch one page of a list query
+        
+        Uses offset pagination unless a cursor is given (an empty cursor asks
+        for the first page). Returns (content, total, next_cursor); total is
+        None when it was not requested, which is the default in cursor mode.
+        """
+        cursor_mode = cursor is not None
+        if include_total is None:
+            include_total = not cursor_mode
         
         # Get total count
-        total = query.count()
+        total = query.count() if include_total else None
+        
+        next_cursor = None
+        if cursor_mode:
+            if sort_by not in CURSOR_SORT_KEYS:
+                sort_by = "created_at"
+            # Fetch one extra row to know whether there is a next page
+            posts = apply_keyset(query, sort_by, sort_dir, cursor).limit(size + 1).all()
+            if len(posts) > size:
+                posts = posts[:size]
+                next_cursor = cursor_after(posts[-1], sort_by)
+        else:
+            # Apply sorting
+            column = getattr(BlogPost, sort_by, BlogPost.created_at)
+            if sort_dir.lower() == "asc":
+                query = query.order_by(asc(column))
+            else:
+                query = query.order_by(desc(column))
+            posts = query.offset(page * size).limit(size).all()
         
-        # Apply pagination
-        posts = query.offset(page * size).limit(size).all()
+        # Get tags for the whole page at once
+        tags = self._load_tags(post.id for post in posts)
         
         # Convert to dict
-        content = []
-        for post in posts:
-            post_dict = {
-                "id": post.id,
-                "title": post.title,
-                "content": post.content,
-                "excerpt": post.excerpt or post.generate_excerpt(),
-                "author": post.author,
-                "featured_image": post.featured_image,
-                "published": post.published,
-                "view_count": post.view_count,
-                "is_ai_generated": post.is_ai_generated,
-                "created_at": post.created_at,
-                "updated_at": post.updated_at,
-                "published_at": post.published_at
-            }
-            
-            # Get tags
-            tags = self.db.query(BlogPostTag.tag).filter(BlogPostTag.post_id == post.id).all()
-            post_dict["tags"] = [tag[0] for tag in tags]
-            
-            content.append(post_dict)
+        content = [self._to_list_item(post, tags[post.id], fields, lang) for post in posts]
+        return content, total, next_cursor
+    
+    def _ranked_items(self, post_ids: List[int], limit: int, lang: str) -> List[dict]:
+        """List items of the published ones of `post_ids`, in that order, at most `limit`
+        
+        Posts deleted or unpublished since a ranking was computed drop out here.
+        """
+        posts = {post.id: post for post in self._list_query([], lang).filter(BlogPost.id.in_(post_ids))}
+        post_ids = [post_id for post_id in post_ids if post_id in posts][:limit]
+        tags = self._load_tags(post_ids)
+        return [self._to_list_item(posts[post_id], tags[post_id], [], lang) for post_id in post_ids]
+    
+    def _published_posts(self, page: int, size: int, sort_by: str, sort_dir: str, lang: str = "en",
+                         fields: Optional[str] = None, cursor: Optional[str] = None,
+                         include_total: Optional[bool] = None) -> dict:
+        extra_fields = parse_fields(fields)
+        lang = parse_lang(lang)
+        query = self._list_query(extra_fields, lang)
+        
+        content, total, next_cursor = self._paginate(
+            query, page, size, sort_by, sort_dir, cursor, include_total, extra_fields, lang
+        )
         
         return {
             "content": content,
             "page": page,
             "size": size,
             "total_elements": total,
-            "total_pages": math.ceil(total / size) if size > 0 else 0
+            "total_pages": math.ceil(total / size) if total is not None else None,
+            "next_cursor": next_cursor
         }
     
-    async def get_post_by_id(self, post_id: int) -> Optional[BlogPost]:
-        """Get post by ID"""
-        return self.db.query(BlogPost).filter(BlogPost.id == post_id).first()
+    def _post(self, post_id: int) -> Optional[BlogPost]:
+        return self.db.query(BlogPost).options(selectinload(BlogPost.tags)).filter(BlogPost.id == post_id).first()
     
-    async def increment_view_count(self, post_id: int):
-        """Increment view count"""
-        post = await self.get_post_by_id(post_id)
-        if post:
-            post.view_count += 1
-            self.db.commit()
-    
-    async def create_post(self, post_data: BlogPostCreate) -> BlogPost:
-        """Create new blog post"""
-        # Create post
+    def _localized_post(self, post_id: int, lang: str = "en") -> Optional[dict]:
+        lang = parse_lang(lang)
+        post = self.db.query(BlogPost).options(load_only(*translated_columns(POST_FIELDS, lang))).filter(
+            BlogPost.id == post_id
+        ).first()
+        if not post:
+            return None
+        return self._to_list_item(post, self._load_tags([post.id])[post.id], ["content", "content_html"], lang)
+    
+    def _create_post(self, post_data: BlogPostCreate, ai_prompt: Optional[str] = None) -> BlogPost:
+        # Create post, tags are linked in the same transaction
+        tags = TagService(self.db).ensure(post_data.tags)
         post = BlogPost(
             title=post_data.title,
             content=post_data.content,
@@ -80,152 +282,419 @@ class BlogPostService:
             author=post_data.author,
             featured_image=post_data.featured_image,
             published=post_data.published,
-            created_at=datetime.utcnow()
+            is_ai_generated=ai_prompt is not None,
+            ai_prompt=ai_prompt,
+            created_at=datetime.utcnow(),
+            tags=[BlogPostTag(tag_ref=tag) for tag in tags.values()]
         )
         
-        # Generate excerpt if not provided
-        if not post.excerpt:
-            post.excerpt = post.generate_excerpt()
+        # Render the markdown once here rather than on every read; fills in the excerpt if not provided
+        render_post(post)
         
         self.db.add(post)
-        self.db.commit()
-        self.db.refresh(post)
-        
-        # Add tags
-        for tag in post_data.tags:
-            post_tag = BlogPostTag(post_id=post.id, tag=tag)
-            self.db.add(post_tag)
-        
-        self.db.commit()
+        StatsService(self.db).record_change(None, PostFootprint.of(post, post_data.tags))
         return post
     
-    async def update_post(self, post_id: int, post_data: BlogPostUpdate) -> Optional[BlogPost]:
-        """Update blog post"""
-        post = await self.get_post_by_id(post_id)
+    def _update_post(self, post_id: int, post_data: BlogPostUpdate) -> Optional[BlogPost]:
+        post = self._post(post_id)
         if not post:
             return None
+        old_footprint = PostFootprint.of(post)
         
         # Update fields
         update_data = post_data.dict(exclude_unset=True)
         for key, value in update_data.items():
             if key != "tags":
                 setattr(post, key, value)
+        if "content" in update_data:
+            if "excerpt" not in update_data:
+                # The old excerpt was made from the old text, or written for it
+                post.excerpt = None
+            render_post(post)
         
-        # Update tags if provided
+        # Update tags if provided, only the ones that changed are written
         if post_data.tags is not None:
-            # Delete old tags
-            self.db.query(BlogPostTag).filter(BlogPostTag.post_id == post_id).delete()
-            # Add new tags
-            for tag in post_data.tags:
-                post_tag = BlogPostTag(post_id=post.id, tag=tag)
-                self.db.add(post_tag)
+            delete_ids, insert_tags = diff_tags([(tag.id, tag.tag) for tag in post.tags], post_data.tags)
+            new_tags = TagService(self.db).ensure(insert_tags)
+            post.tags = [tag for tag in post.tags if tag.id not in delete_ids] + [
+                BlogPostTag(tag_ref=new_tags[tag]) for tag in insert_tags
+            ]
         
+        StatsService(self.db).record_change(old_footprint, PostFootprint.of(
+            post, post_data.tags if post_data.tags is not None else old_footprint.tags
+        ))
         post.updated_at = datetime.utcnow()
-        self.db.commit()
-        self.db.refresh(post)
         return post
     
-    async def delete_post(self, post_id: int) -> bool:
-        """Delete blog post"""
-        post = await self.get_post_by_id(post_id)
+    def _insert_posts(self, posts: List[BlogPostCreate]) -> List[int]:
+        """Insert many posts and their tags with bulk statements, without committing"""
+        table = BlogPost.__table__
+        now = datetime.utcnow()
+        rows = []
+        for post_data in posts:
+            row = post_data.dict(exclude={"tags"})
+            row.update(render_content(row))
+            row.update(is_ai_generated=False, view_count=0, created_at=now)
+            rows.append(row)
+        
+        # One multi-row INSERT ... RETURNING, ids come back in row order
+        post_ids = self.db.execute(
+            table.insert().returning(table.c.id, sort_by_parameter_order=True), rows
+        ).scalars().all()
+        
+        tag_ids = TagService(self.db).ids(tag for post_data in posts for tag in post_data.tags)
+        tag_rows = [
+            {"post_id": post_id, "tag_id": tag_ids[tag]}
+            for post_id, post_data in zip(post_ids, posts)
+            for tag in dict.fromkeys(post_data.tags)
+        ]
+        if tag_rows:
+            self.db.execute(BlogPostTag.__table__.insert(), tag_rows)
+        
+        StatsService(self.db).record_changes(
+            (None, PostFootprint(post_data.author, tuple(sorted(set(post_data.tags))), post_data.published, 0))
+            for post_data in posts
+        )
+        return post_ids
+    
+    def _update_posts(self, items: List[BlogPostBatchUpdate]) -> List[dict]:
+        """Apply many partial updates with bulk statements, without committing
+        
+        Returns one result per item, in order.
+        """
+        post_ids = list({item.id for item in items})
+        posts = {
+            row.id: row for row in self.db.query(
+                BlogPost.id, BlogPost.author, BlogPost.published, BlogPost.view_count
+            ).filter(BlogPost.id.in_(post_ids))
+        }
+        tag_rows: Dict[int, List[Tuple[int, str]]] = {post_id: [] for post_id in posts}
+        for row_id, post_id, tag in self.db.query(BlogPostTag.id, BlogPostTag.post_id, Tag.name).join(
+            Tag, Tag.id == BlogPostTag.tag_id
+        ).filter(BlogPostTag.post_id.in_(list(posts))).order_by(BlogPostTag.id):
+            tag_rows[post_id].append((row_id, tag))
+        
+        now = datetime.utcnow()
+        results, updates, changes, seen = [], [], [], set()
+        delete_ids, insert_rows = [], []
+        for index, item in enumerate(items):
+            post = posts.get(item.id)
+            if post is None:
+                results.append({"index": index, "id": item.id, "status": "not_found"})
+                continue
+            if item.id in seen:
+                results.append({"index": index, "id": item.id, "status": "error",
+                                "error": "Post appears more than once in the batch"})
+                continue
+            seen.add(item.id)
+            
+            values = item.dict(exclude_unset=True, exclude={"id", "tags"})
+            if "content" in values:
+                # Other languages keep their rendering, so the row's version stays as it is;
+                # the excerpt is made from the new text unless the item has one
+                values.update(render_content(values, partial=True))
+            old_tags = [tag for _, tag in tag_rows[item.id]]
+            old = PostFootprint(post.author, tuple(sorted(set(old_tags))), bool(post.published), post.view_count or 0)
+            new = old._replace(
+                author=values.get("author", old.author),
+                published=bool(values.get("published", old.published))
+            )
+            if item.tags is not None:
+                deleted, inserted = diff_tags(tag_rows[item.id], item.tags)
+                delete_ids.extend(deleted)
+                insert_rows.extend((item.id, tag) for tag in inserted)
+                new = new._replace(tags=tuple(sorted(set(item.tags))))
+            
+            updates.append({"id": item.id, "updated_at": now, **values})
+            changes.append((old, new))
+            results.append({"index": index, "id": item.id, "status": "updated"})
+        
+        # ORM bulk UPDATE by primary key: one executemany per distinct set of columns
+        if updates:
+            self.db.execute(update(BlogPost), updates)
+        if delete_ids:
+            self.db.query(BlogPostTag).filter(BlogPostTag.id.in_(delete_ids)).delete(synchronize_session=False)
+        if insert_rows:
+            tag_ids = TagService(self.db).ids(tag for _, tag in insert_rows)
+            # A concurrent batch may have linked the same tag since the read above
+            insert_missing(self.db, BlogPostTag, [
+                {"post_id": post_id, "tag_id": tag_ids[tag]} for post_id, tag in insert_rows
+            ], ["tag_id", "post_id"])
+        StatsService(self.db).record_changes(changes)
+        return results
+    
+    def _delete_post(self, post_id: int) -> bool:
+        post = self._post(post_id)
         if not post:
             return False
         
+        StatsService(self.db).record_change(PostFootprint.of(post), None)
         self.db.delete(post)
-        self.db.commit()
         return True
     
-    async def toggle_publish(self, post_id: int) -> Optional[BlogPost]:
-        """Toggle publish status"""
-        post = await self.get_post_by_id(post_id)
+    def _toggle_publish(self, post_id: int) -> Optional[BlogPost]:
+        post = self._post(post_id)
         if not post:
             return None
+        old_footprint = PostFootprint.of(post)
         
         post.published = not post.published
         if post.published and not post.published_at:
             post.published_at = datetime.utcnow()
         
-        self.db.commit()
-        self.db.refresh(post)
+        StatsService(self.db).record_change(old_footprint, old_footprint._replace(published=post.published))
         return post
     
-    async def search_posts(self, keyword: str, page: int, size: int):
-        """Search posts by keyword"""
-        query = self.db.query(BlogPost).filter(
-            BlogPost.published == True,
-            or_(
-                BlogPost.title.ilike(f"%{keyword}%"),
-                BlogPost.content.ilike(f"%{keyword}%"),
-                BlogPost.excerpt.ilike(f"%{keyword}%")
-            )
-        )
+    def _search_posts(self, keyword: str, page: int, size: int, cursor: Optional[str] = None,
+                      include_total: Optional[bool] = None, fields: Optional[str] = None) -> dict:
+        extra_fields = parse_fields(fields)
+        backend = get_search_backend(self.db.get_bind())
         
-        total = query.count()
-        posts = query.order_by(desc(BlogPost.created_at)).offset(page * size).limit(size).all()
+        cursor_mode = cursor is not None
+        if include_total is None:
+            include_total = not cursor_mode
+        total = backend.count(self.db, keyword) if include_total else None
+        
+        next_cursor = None
+        if cursor_mode:
+            after = decode_cursor(cursor, "relevance") if cursor else None
+            hits = backend.search(self.db, keyword, size + 1, after=after)
+            if len(hits) > size:
+                hits = hits[:size]
+                post_id, score = hits[-1]
+                next_cursor = encode_cursor("relevance", score, post_id)
+        else:
+            hits = backend.search(self.db, keyword, size, offset=page * size)
+        
+        post_ids = [post_id for post_id, _ in hits]
+        posts = {
+            post.id: post
+            for post in self._list_query(extra_fields).filter(BlogPost.id.in_(post_ids)).all()
+        }
+        tags = self._load_tags(post_ids)
+        snippets = backend.snippets(self.db, keyword, post_ids)
+        
+        # Keep the ranking order of the hits
+        content = []
+        for post_id in post_ids:
+            post_dict = self._to_list_item(posts[post_id], tags[post_id], extra_fields)
+            post_dict["snippet"] = snippets.get(post_id)
+            content.append(post_dict)
         
         return {
-            "content": posts,
+            "content": content,
             "total": total,
             "page": page,
-            "size": size
+            "size": size,
+            "next_cursor": next_cursor
         }
     
-    async def get_posts_by_tag(self, tag: str, page: int, size: int):
-        """Get posts by tag"""
-        post_ids = self.db.query(BlogPostTag.post_id).filter(BlogPostTag.tag == tag).all()
-        post_ids = [pid[0] for pid in post_ids]
+    def _posts_by_tag(self, tag: str, page: int, size: int, cursor: Optional[str] = None,
+                      include_total: Optional[bool] = None, fields: Optional[str] = None) -> dict:
+        extra_fields = parse_fields(fields)
+        # One join, walking the (tag_id, post_id) index from the tag's id
+        query = self._list_query(extra_fields).join(
+            BlogPostTag, BlogPostTag.post_id == BlogPost.id
+        ).join(Tag, Tag.id == BlogPostTag.tag_id).filter(Tag.name == tag)
         
-        query = self.db.query(BlogPost).filter(
-            BlogPost.id.in_(post_ids),
-            BlogPost.published == True
+        content, total, next_cursor = self._paginate(
+            query, page, size, "created_at", "desc", cursor, include_total, extra_fields
         )
         
-        total = query.count()
-        posts = query.order_by(desc(BlogPost.created_at)).offset(page * size).limit(size).all()
-        
         return {
-            "content": posts,
+            "content": content,
             "total": total,
             "page": page,
-            "size": size
+            "size": size,
+            "next_cursor": next_cursor
         }
     
+    def _related_posts(self, post_id: int, limit: int, lang: str = "en") -> Optional[List[dict]]:
+        related = related_posts.related(post_id)
+        if related is None:
+            # Unpublished, or the index isn't built yet
+            return [] if self.db.query(BlogPost.id).filter(BlogPost.id == post_id).first() else None
+        return self._ranked_items(related, limit, parse_lang(lang))
+    
+    def _trending_posts(self, window: str, limit: int, lang: str = "en") -> List[dict]:
+        scores = dict(trending_posts.trending(window) or [])
+        items = self._ranked_items(list(scores), limit, parse_lang(lang))
+        for item in items:
+            item["trending_score"] = round(scores[item["id"]], 3)
+        return items
+    
+    def _top_posts(self, limit: int) -> List[BlogPost]:
+        return self.db.query(BlogPost).options(selectinload(BlogPost.tags)).filter(
+            BlogPost.published == True
+        ).order_by(desc(BlogPost.view_count), desc(BlogPost.id)).limit(limit).all()
+    
+    def _add_image(self, post_id: int, image_url: str) -> bool:
+        if not self.db.get(BlogPost, post_id):
+            return False
+        self.db.add(BlogPostImage(post_id=post_id, image_url=image_url))
+        return True
+    
+    def _set_featured_image(self, post_id: int, image_url: str) -> bool:
+        post = self.db.get(BlogPost, post_id)
+        if not post:
+            return False
+        post.featured_image = image_url
+        return True
+    
+    async def get_published_posts(self, page: int, size: int, sort_by: str, sort_dir: str, lang: str = "en",
+                                  fields: Optional[str] = None, cursor: Optional[str] = None,
+                                  include_total: Optional[bool] = None):
+        """Get paginated published posts, with their text in `lang`"""
+        return self._published_posts(page, size, sort_by, sort_dir, lang, fields, cursor, include_total)
+    
+    async def get_post_by_id(self, post_id: int) -> Optional[BlogPost]:
+        """Get post by ID"""
+        return self._post(post_id)
+    
+    async def get_localized_post(self, post_id: int, lang: str = "en") -> Optional[dict]:
+        """Get a post by ID as a response dict in `lang`, loading only that language's columns"""
+        return self._localized_post(post_id, lang)
+    
+    async def increment_view_count(self, post_id: int):
+        """Increment view count
+        
+        The view is buffered and written in a batch by the view counter.
+        """
+        view_counter.add(post_id)
+    
+    async def create_post(self, post_data: BlogPostCreate, ai_prompt: Optional[str] = None) -> BlogPost:
+        """Create new blog post, marked as AI generated when an ai_prompt is given"""
+        post = self._create_post(post_data, ai_prompt)
+        self.db.commit()
+        related_posts.mark_changed(post.id)
+        await response_cache.invalidate(POSTS_SCOPE)
+        return post
+    
+    async def update_post(self, post_id: int, post_data: BlogPostUpdate) -> Optional[BlogPost]:
+        """Update blog post"""
+        post = self._update_post(post_id, post_data)
+        if not post:
+            return None
+        self.db.commit()
+        self.db.refresh(post)
+        related_posts.mark_changed(post_id)
+        await response_cache.invalidate(POSTS_SCOPE, post_scope(post_id))
+        return post
+    
+    async def create_posts(self, posts: List[BlogPostCreate]) -> List[dict]:
+        """Create many posts in one transaction"""
+        post_ids = self._insert_posts(posts)
+        self.db.commit()
+        related_posts.mark_changed(*post_ids)
+        await response_cache.invalidate(POSTS_SCOPE)
+        return [
+            {"index": index, "id": post_id, "status": "created"}
+            for index, post_id in enumerate(post_ids)
+        ]
+    
+    async def update_posts(self, items: List[BlogPostBatchUpdate]) -> List[dict]:
+        """Apply many partial updates in one transaction"""
+        results = self._update_posts(items)
+        self.db.commit()
+        updated = [result["id"] for result in results if result["status"] == "updated"]
+        if updated:
+            related_posts.mark_changed(*updated)
+            await response_cache.invalidate(POSTS_SCOPE, *(post_scope(post_id) for post_id in updated))
+        return results
+    
+    async def delete_post(self, post_id: int) -> bool:
+        """Delete blog post"""
+        if not self._delete_post(post_id):
+            return False
+        self.db.commit()
+        related_posts.mark_changed(post_id)
+        await response_cache.invalidate(POSTS_SCOPE, post_scope(post_id))
+        return True
+    
+    async def toggle_publish(self, post_id: int) -> Optional[BlogPost]:
+        """Toggle publish status"""
+        post = self._toggle_publish(post_id)
+        if not post:
+            return None
+        self.db.commit()
+        self.db.refresh(post)
+        related_posts.mark_changed(post_id)
+        await response_cache.invalidate(POSTS_SCOPE, post_scope(post_id))
+        return post
+    
+    async def search_posts(self, keyword: str, page: int, size: int, cursor: Optional[str] = None,
+                           include_total: Optional[bool] = None, fields: Optional[str] = None):
+        """Search posts by keyword, best matches first"""
+        return self._search_posts(keyword, page, size, cursor, include_total, fields)
+    
+    async def get_posts_by_tag(self, tag: str, page: int, size: int, cursor: Optional[str] = None,
+                               include_total: Optional[bool] = None, fields: Optional[str] = None):
+        """Get posts by tag"""
+        return self._posts_by_tag(tag, page, size, cursor, include_total, fields)
+    
+    async def get_related_posts(self, post_id: int, limit: int, lang: str = "en") -> Optional[List[dict]]:
+        """Get the posts most related to a post, best first, from the related posts index
+        
+        Returns None if the post doesn't exist.
+        """
+        return self._related_posts(post_id, limit, lang)
+    
+    async def get_trending_posts(self, window: str, limit: int, lang: str = "en") -> List[dict]:
+        """Get the posts with the most recent views in a window, best first, from the precomputed ranking"""
+        return self._trending_posts(window, limit, lang)
+    
     async def get_top_posts(self, limit: int) -> List[BlogPost]:
         """Get top posts by view count"""
-        return self.db.query(BlogPost).filter(
-            BlogPost.published == True
-        ).order_by(desc(BlogPost.view_count)).limit(limit).all()
+        return self._top_posts(limit)
     
     async def get_statistics(self):
-        """Get blog statistics"""
-        total_posts = self.db.query(func.count(BlogPost.id)).scalar()
-        published_posts = self.db.query(func.count(BlogPost.id)).filter(BlogPost.published == True).scalar()
-        total_views = self.db.query(func.sum(BlogPost.view_count)).scalar() or 0
-        
-        return {
-            "total_posts": total_posts,
-            "published_posts": published_posts,
-            "draft_posts": total_posts - published_posts,
-            "total_views": total_views
-        }
+        """Get blog statistics from the maintained counters"""
+        return StatsService(self.db).get_statistics()
+    
+    async def get_tags(self, limit: int):
+        """Get tags that have published posts, with their post counts"""
+        return TagService(self.db).list_tags(limit)
+    
+    async def get_popular_tags(self, limit: int):
+        """Get the tags with the most published posts"""
+        return TagService(self.db).popular(limit)
+    
+    async def get_statistics_breakdown(self, scope: str, limit: int):
+        """Get per-tag or per-author statistics"""
+        return StatsService(self.db).get_breakdown(scope, limit)
+    
+    async def reconcile_statistics(self):
+        """Recompute the statistics counters from scratch"""
+        statistics = StatsService(self.db).reconcile()
+        await response_cache.invalidate(POSTS_SCOPE)
+        return statistics
     
     async def add_image(self, post_id: int, image_url: str) -> bool:
         """Add image to post"""
-        post = await self.get_post_by_id(post_id)
-        if not post:
+        if not self._add_image(post_id, image_url):
             return False
-        
-        post_image = BlogPostImage(post_id=post_id, image_url=image_url)
-        self.db.add(post_image)
         self.db.commit()
+        await response_cache.invalidate(post_scope(post_id))
         return True
     
     async def set_featured_image(self, post_id: int, image_url: str) -> bool:
         """Set featured image"""
-        post = await self.get_post_by_id(post_id)
-        if not post:
+        if not self._set_featured_image(post_id, image_url):
             return False
-        
-        post.featured_image = image_url
         self.db.commit()
+        await response_cache.invalidate(POSTS_SCOPE, post_scope(post_id))
         return True
+
+
+def migrate_post_indexes(engine):
+    """Add the blog_posts indexes to an existing table
+
+    create_all only creates missing tables, so a database from before the
+    feed and top posts indexes never gets them otherwise. Does nothing once
+    they exist.
+    """
+    if not inspect(engine).has_table("blog_posts"):
+        return
+    with engine.begin() as connection:
+        for index in BlogPost.__table__.indexes:
+            index.create(connection, checkfirst=True)
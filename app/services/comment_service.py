@@ -0,0 +1,273 @@
+import math
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import delete, func, inspect, literal, select, text, update
+from sqlalchemy.orm import Session
+from app.core.cache import comments_scope, response_cache
+from app.core.config import settings
+from app.models.blog_post import BlogPost
+from app.models.comment import BlogComment
+from app.schemas.comment import CommentCreate
+
+# Replies nested deeper than this are not loaded; also stops the thread query
+# should parent links ever form a cycle
+MAX_THREAD_DEPTH = 20
+
+THREAD_COLUMNS = (
+    BlogComment.id, BlogComment.post_id, BlogComment.parent_id, BlogComment.author_name,
+    BlogComment.content, BlogComment.upvotes, BlogComment.created_at
+)
+
+
+class CommentService:
+    """Comment threads, with the approved count kept on the post
+
+    blog_posts.comment_count changes in the same transaction as every
+    approval or deletion, so reading it is a primary key lookup.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    @staticmethod
+    def _to_dict(comment) -> dict:
+        return {
+            "id": comment.id,
+            "post_id": comment.post_id,
+            "parent_id": comment.parent_id,
+            "author_name": comment.author_name,
+            "content": comment.content,
+            "upvotes": comment.upvotes or 0,
+            "created_at": comment.created_at,
+            "replies": []
+        }
+
+    def _add_to_count(self, post_id: int, approved: int):
+        if approved:
+            self.db.execute(
+                update(BlogPost).where(BlogPost.id == post_id)
+                # Not an edit of the post, updated_at stays as it was
+                .values(comment_count=BlogPost.comment_count + approved, updated_at=BlogPost.updated_at)
+            )
+
+    def _ancestry(self, comment_id: int) -> Tuple[int, bool]:
+        """How deep a comment is nested, and whether every comment above it is approved
+
+        One recursive query up the parent links; the depth is counted up to
+        MAX_THREAD_DEPTH + 1, which is already too deep to be shown.
+        """
+        ancestors = select(BlogComment.parent_id.label("id"), literal(1).label("depth")).where(
+            BlogComment.id == comment_id, BlogComment.parent_id.isnot(None)
+        ).cte("ancestors", recursive=True)
+        ancestors = ancestors.union_all(
+            select(BlogComment.parent_id, (ancestors.c.depth + 1).label("depth"))
+            .join(ancestors, BlogComment.id == ancestors.c.id)
+            .where(BlogComment.parent_id.isnot(None), ancestors.c.depth <= MAX_THREAD_DEPTH)
+        )
+        rows = self.db.execute(
+            select(ancestors.c.depth, BlogComment.approved).join(BlogComment, BlogComment.id == ancestors.c.id)
+        ).all()
+        return max((row.depth for row in rows), default=0), all(row.approved for row in rows)
+
+    async def create_comment(self, comment_data: CommentCreate) -> Optional[dict]:
+        """Add a comment or reply, approved right away only with COMMENTS_AUTO_APPROVE
+
+        A reply to a comment that isn't approved waits for approval either
+        way, it couldn't be shown before its parent. Returns None if the post
+        doesn't exist; raises ValueError if the parent comment is missing or
+        on another post, or the reply would be nested deeper than
+        MAX_THREAD_DEPTH.
+        """
+        if self.db.execute(select(BlogPost.id).where(BlogPost.id == comment_data.post_id)).first() is None:
+            return None
+        if comment_data.parent_id is not None:
+            parent_post_id = self.db.execute(
+                select(BlogComment.post_id).where(BlogComment.id == comment_data.parent_id)
+            ).scalar()
+            if parent_post_id != comment_data.post_id:
+                raise ValueError("Parent comment not found on this post")
+
+        comment = BlogComment(
+            **comment_data.dict(),
+            approved=settings.COMMENTS_AUTO_APPROVE,
+            upvotes=0,
+            created_at=datetime.utcnow()
+        )
+        self.db.add(comment)
+        self.db.flush()
+        if comment.parent_id is not None:
+            depth, ancestors_approved = self._ancestry(comment.id)
+            if depth > MAX_THREAD_DEPTH:
+                self.db.rollback()
+                raise ValueError(f"Replies can't be nested more than {MAX_THREAD_DEPTH} deep")
+            if not ancestors_approved:
+                comment.approved = False
+                self.db.flush()
+        self._add_to_count(comment.post_id, 1 if comment.approved else 0)
+        result = {**self._to_dict(comment), "approved": comment.approved}
+        self.db.commit()
+        if comment.approved:
+            await response_cache.invalidate(comments_scope(comment.post_id))
+        return result
+
+    async def approve_comment(self, comment_id: int) -> Optional[dict]:
+        """Approve a comment; approving it twice counts it once
+
+        Raises ValueError for a reply whose parent (or a comment further up)
+        isn't approved: it wouldn't be shown, so it isn't counted either.
+        """
+        depth, ancestors_approved = self._ancestry(comment_id)
+        if not ancestors_approved:
+            raise ValueError("Approve the comments this reply answers first")
+        if depth > MAX_THREAD_DEPTH:
+            raise ValueError(f"Replies nested more than {MAX_THREAD_DEPTH} deep are not shown")
+
+        post_id = self.db.execute(
+            update(BlogComment)
+            .where(BlogComment.id == comment_id, BlogComment.approved.isnot(True))
+            .values(approved=True)
+            .returning(BlogComment.post_id)
+        ).scalar()
+        if post_id is None:
+            self.db.rollback()
+            post_id = self.db.execute(select(BlogComment.post_id).where(BlogComment.id == comment_id)).scalar()
+            return None if post_id is None else {"id": comment_id, "post_id": post_id, "approved": True}
+
+        self._add_to_count(post_id, 1)
+        self.db.commit()
+        await response_cache.invalidate(comments_scope(post_id))
+        return {"id": comment_id, "post_id": post_id, "approved": True}
+
+    def _subtree(self, comment_id: int):
+        """A comment and every reply below it, one recursive query"""
+        tree = select(BlogComment.id, BlogComment.post_id, BlogComment.approved).where(
+            BlogComment.id == comment_id
+        ).cte("subtree", recursive=True)
+        tree = tree.union_all(
+            select(BlogComment.id, BlogComment.post_id, BlogComment.approved)
+            .join(tree, BlogComment.parent_id == tree.c.id)
+        )
+        return self.db.execute(select(tree)).all()
+
+    async def delete_comment(self, comment_id: int) -> bool:
+        """Delete a comment with its replies"""
+        rows = self._subtree(comment_id)
+        if not rows:
+            return False
+        post_id = rows[0].post_id
+        # Replies are removed here too, SQLite only cascades with foreign keys enabled
+        self.db.execute(
+            delete(BlogComment).where(BlogComment.id.in_([row.id for row in rows])),
+            execution_options={"synchronize_session": False}
+        )
+        self._add_to_count(post_id, -sum(1 for row in rows if row.approved))
+        self.db.commit()
+        await response_cache.invalidate(comments_scope(post_id))
+        return True
+
+    async def upvote_comment(self, comment_id: int) -> Optional[dict]:
+        """Add an upvote to an approved comment in one atomic UPDATE"""
+        row = self.db.execute(
+            update(BlogComment)
+            .where(BlogComment.id == comment_id, BlogComment.approved.is_(True))
+            .values(upvotes=func.coalesce(BlogComment.upvotes, 0) + 1)
+            .returning(BlogComment.post_id, BlogComment.upvotes)
+        ).first()
+        if row is None:
+            self.db.rollback()
+            return None
+        self.db.commit()
+        await response_cache.invalidate(comments_scope(row.post_id))
+        return {"id": comment_id, "upvotes": row.upvotes}
+
+    async def get_comment_count(self, post_id: int) -> Optional[int]:
+        """Approved comments of a post, replies included"""
+        return self.db.execute(select(BlogPost.comment_count).where(BlogPost.id == post_id)).scalar()
+
+    async def get_comments(self, post_id: int, page: int, size: int) -> dict:
+        """A page of top-level comments, newest first, each with all its replies
+
+        The page and every reply under it come from one recursive query
+        (plus one to count the top-level comments). Replies are oldest
+        first; those of an unapproved comment are left out with it.
+        """
+        top_level = (
+            BlogComment.post_id == post_id,
+            BlogComment.parent_id.is_(None),
+            BlogComment.approved.is_(True)
+        )
+        total = self.db.execute(select(func.count()).select_from(BlogComment).where(*top_level)).scalar()
+
+        page_ids = (
+            select(BlogComment.id).where(*top_level)
+            .order_by(BlogComment.created_at.desc(), BlogComment.id.desc())
+            .limit(size).offset(page * size)
+        )
+        thread = select(*THREAD_COLUMNS, literal(0).label("depth")).where(
+            BlogComment.id.in_(page_ids)
+        ).cte("thread", recursive=True)
+        thread = thread.union_all(
+            select(*THREAD_COLUMNS, (thread.c.depth + 1).label("depth"))
+            .join(thread, BlogComment.parent_id == thread.c.id)
+            .where(BlogComment.approved.is_(True), thread.c.depth < MAX_THREAD_DEPTH)
+        )
+        rows = self.db.execute(select(thread)).all()
+
+        nodes: Dict[int, dict] = {row.id: self._to_dict(row) for row in rows}
+        roots: List[dict] = []
+        for row in sorted(rows, key=lambda row: (row.created_at or datetime.min, row.id)):
+            if row.depth == 0:
+                roots.append(nodes[row.id])
+            else:
+                nodes[row.parent_id]["replies"].append(nodes[row.id])
+        roots.reverse()
+
+        total_pages = math.ceil(total / size)
+        return {
+            "content": roots,
+            "page": page,
+            "size": size,
+            "total_elements": total,
+            "total_pages": total_pages,
+            "last": page >= total_pages - 1
+        }
+
+
+def migrate_comment_count(engine):
+    """Add the approved-count column to an existing blog_posts table
+
+    BlogPost maps the column, so this runs with the posts' migrations, with
+    or without the comments API. The counts are filled from the approved
+    comments. Does nothing once the column exists.
+    """
+    inspector = inspect(engine)
+    if not inspector.has_table("blog_posts"):
+        return
+    if "comment_count" in {column["name"] for column in inspector.get_columns("blog_posts")}:
+        return
+
+    with engine.begin() as connection:
+        connection.execute(text("ALTER TABLE blog_posts ADD COLUMN comment_count BIGINT NOT NULL DEFAULT 0"))
+        if inspector.has_table("blog_comments"):
+            connection.execute(text(
+                "UPDATE blog_posts SET comment_count = "
+                "(SELECT count(*) FROM blog_comments WHERE blog_comments.post_id = blog_posts.id AND approved)"
+            ))
+
+
+def migrate_comments(engine):
+    """Add the upvote column and the comment count to an existing database
+
+    Does nothing once they exist.
+    """
+    migrate_comment_count(engine)
+    inspector = inspect(engine)
+    if not inspector.has_table("blog_comments"):
+        return
+    if "upvotes" in {column["name"] for column in inspector.get_columns("blog_comments")}:
+        return
+
+    with engine.begin() as connection:
+        connection.execute(text("ALTER TABLE blog_comments ADD COLUMN upvotes BIGINT NOT NULL DEFAULT 0"))
+        for index in BlogComment.__table__.indexes:
+            index.create(connection, checkfirst=True)
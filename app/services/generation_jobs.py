@@ -0,0 +1,217 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import httpx
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.schemas.blog_post import BlogPostCreate, BlogPostResponse
+from app.services.ai_service import ai_service
+from app.services.blog_post_service import BlogPostService
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class QueueFullError(Exception):
+    """Too many generation jobs are waiting"""
+
+
+def generated_post_data(generated: dict, author: Optional[str]) -> BlogPostCreate:
+    """Draft post built from the AI service's answer"""
+    return BlogPostCreate(
+        title=generated["title"],
+        content=generated["content"],
+        excerpt=generated["excerpt"],
+        author=author,
+        tags=generated.get("tags", []),
+        published=False
+    )
+
+
+def prompt_key(prompt: str, author: Optional[str]) -> str:
+    """Identity of a request: case and whitespace of the prompt don't matter"""
+    return f"{author or ''}\x00{' '.join(prompt.split()).casefold()}"
+
+
+class GenerationJob:
+    """One AI generation request and, once finished, its result"""
+
+    def __init__(self, prompt: str, author: Optional[str]):
+        self.id = uuid.uuid4().hex
+        self.prompt = prompt
+        self.author = author
+        self.key = prompt_key(prompt, author)
+        self.status = QUEUED
+        self.post: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "post_id": self.post["id"] if self.post else None,
+            "post": self.post,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+
+
+class GenerationJobs:
+    """Runs AI post generation in the background
+
+    Submitting returns a job right away; a fixed pool of worker tasks takes
+    jobs off a bounded queue, calls the AI service and saves the draft with
+    create_post. A prompt that is already queued or running, or that
+    succeeded less than `result_ttl` seconds ago, gets the existing job back
+    instead of another upstream call and another draft.
+
+    Jobs live in this process's memory, like the memory cache: run a single
+    worker process or pin job status requests to the process that took them.
+    """
+
+    def __init__(self, workers: int = settings.AI_JOB_WORKERS,
+                 max_queued: int = settings.AI_JOB_MAX_QUEUED,
+                 result_ttl: int = settings.AI_JOB_RESULT_TTL):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.result_ttl = result_ttl
+
+        self._jobs: "OrderedDict[str, GenerationJob]" = OrderedDict()
+        self._by_key: Dict[str, GenerationJob] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+        # Counters
+        self.deduplicated = 0
+
+    def _prune(self):
+        """Forget finished jobs older than the result TTL"""
+        cutoff = time.time() - self.result_ttl
+        while self._jobs:
+            job = next(iter(self._jobs.values()))
+            if job.finished_at is None or job.finished_at > cutoff:
+                break
+            self._jobs.popitem(last=False)
+            if self._by_key.get(job.key) is job:
+                del self._by_key[job.key]
+
+    def submit(self, prompt: str, author: Optional[str]) -> GenerationJob:
+        """Queue a generation, or return the job already covering this prompt"""
+        self.start()
+        self._prune()
+
+        job = self._by_key.get(prompt_key(prompt, author))
+        if job is not None and job.status != FAILED:
+            self.deduplicated += 1
+            return job
+
+        if self._queue.full():
+            raise QueueFullError()
+        job = GenerationJob(prompt, author)
+        self._jobs[job.id] = job
+        self._by_key[job.key] = job
+        self._queue.put_nowait(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[GenerationJob]:
+        self._prune()
+        return self._jobs.get(job_id)
+
+    async def _create_post(self, job: GenerationJob, generated: dict) -> dict:
+        post_data = generated_post_data(generated, job.author)
+        if settings.DB_ASYNC:
+            from app.core.database import AsyncSessionLocal
+            from app.services.async_blog_post_service import AsyncBlogPostService
+
+            async with AsyncSessionLocal() as db:
+                post = await AsyncBlogPostService(db).create_post(post_data, ai_prompt=job.prompt)
+                return BlogPostResponse.model_validate(post).model_dump(mode="json")
+
+        db = SessionLocal()
+        try:
+            post = await BlogPostService(db).create_post(post_data, ai_prompt=job.prompt)
+            return BlogPostResponse.model_validate(post).model_dump(mode="json")
+        finally:
+            db.close()
+
+    async def _run(self, job: GenerationJob):
+        job.status = RUNNING
+        job.started_at = time.time()
+        try:
+            generated = await ai_service.generate_blog_post(job.prompt)
+            job.post = await self._create_post(job, generated)
+            job.status = SUCCEEDED
+        except httpx.HTTPError:
+            logger.warning("AI generation job %s failed", job.id, exc_info=True)
+            job.status = FAILED
+            job.error = "AI service unavailable"
+        except ValueError as e:
+            job.status = FAILED
+            job.error = f"Generated post is invalid: {e}"
+        except Exception:
+            logger.exception("AI generation job %s failed", job.id)
+            job.status = FAILED
+            job.error = "Generation failed"
+        finally:
+            job.finished_at = time.time()
+            # Move to the end so pruning sees jobs in finishing order
+            if job.id in self._jobs:
+                self._jobs.move_to_end(job.id)
+
+    async def _work(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    def start(self):
+        """Start the worker tasks"""
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queued)
+            self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Stop the workers; queued and running jobs are abandoned"""
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        self._queue = None
+        for job in self._jobs.values():
+            if job.status in (QUEUED, RUNNING):
+                job.status = FAILED
+                job.error = "Server shut down"
+                job.finished_at = time.time()
+
+    def stats(self) -> dict:
+        """Counters describing the queue"""
+        statuses = [job.status for job in self._jobs.values()]
+        return {
+            "queued": statuses.count(QUEUED),
+            "running": statuses.count(RUNNING),
+            "succeeded": statuses.count(SUCCEEDED),
+            "failed": statuses.count(FAILED),
+            "deduplicated": self.deduplicated,
+            "workers": self.workers
+        }
+
+
+generation_jobs = GenerationJobs()
@@ -0,0 +1,141 @@
+import asyncio
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional, Set
+from PIL import Image, ImageOps, features
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Widths derivatives can be requested at, so the disk cache stays bounded
+VARIANT_WIDTHS = (200, 400, 800, 1200)
+
+# Derivatives rendered right after an upload: the list card size
+PREGENERATE = ((400, "webp"),)
+
+# Output formats: name -> (Pillow format, file extension, save options)
+FORMATS = {
+    "jpeg": ("JPEG", ".jpg", {"quality": 82, "optimize": True, "progressive": True}),
+    "png": ("PNG", ".png", {"optimize": True}),
+    "webp": ("WEBP", ".webp", {"quality": 80, "method": 4}),
+    "avif": ("AVIF", ".avif", {"quality": 60}),
+}
+
+
+def available_formats() -> Set[str]:
+    """Formats the installed Pillow can encode"""
+    formats = {"jpeg", "png"}
+    for name in ("webp", "avif"):
+        if features.check(name):
+            formats.add(name)
+    return formats
+
+
+def render_variant(source: str, target: str, width: int, fmt: str) -> str:
+    """Resize an image to at most `width` pixels wide and encode it
+
+    Runs in a worker process. Writes to a temporary name first so a reader
+    never sees a half written file.
+    """
+    pil_format, _, options = FORMATS[fmt]
+    with Image.open(source) as image:
+        # JPEGs can be decoded at a reduced scale, far cheaper than a full decode
+        if image.format == "JPEG" and image.width > width:
+            image.draft("RGB", (width, round(image.height * width / image.width)))
+        image = ImageOps.exif_transpose(image)
+        if image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.LANCZOS)
+
+        if pil_format == "JPEG" and image.mode != "RGB":
+            image = image.convert("RGB")
+        elif image.mode not in ("RGB", "RGBA", "L", "LA"):
+            image = image.convert("RGBA")
+
+        temp = f"{target}.{os.getpid()}.tmp"
+        image.save(temp, format=pil_format, **options)
+    os.replace(temp, target)
+    return target
+
+
+class ImageService:
+    """Renders and caches resized / re-encoded copies of uploaded images
+
+    Encoding is CPU bound, so it runs in a process pool instead of on the
+    event loop. Results are cached under UPLOAD_DIR/variants and concurrent
+    requests for the same derivative share one render.
+    """
+
+    def __init__(self, upload_dir: str = settings.UPLOAD_DIR, workers: int = settings.IMAGE_WORKERS):
+        self.upload_dir = Path(upload_dir)
+        self.variant_dir = self.upload_dir / "variants"
+        self.workers = workers or os.cpu_count() or 1
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._rendering: Dict[Path, asyncio.Future] = {}
+        self._background: Set[asyncio.Task] = set()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    def variant_path(self, filename: str, width: int, fmt: str) -> Path:
+        return self.variant_dir / f"{Path(filename).stem}_w{width}{FORMATS[fmt][1]}"
+
+    async def get_variant(self, filename: str, width: int, fmt: str) -> Path:
+        """Path of a derivative, rendering it first if it isn't cached yet"""
+        source = self.upload_dir / Path(filename).name
+        target = self.variant_path(filename, width, fmt)
+        if target.exists():
+            return target
+
+        future = self._rendering.get(target)
+        if future is None:
+            self.variant_dir.mkdir(parents=True, exist_ok=True)
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(
+                self._get_pool(), render_variant, str(source), str(target), width, fmt
+            )
+            self._rendering[target] = future
+            future.add_done_callback(lambda _: self._rendering.pop(target, None))
+        await asyncio.shield(future)
+        return target
+
+    def pregenerate(self, filename: str):
+        """Render the common derivatives of a new upload in the background"""
+        if Path(filename).suffix.lower() == ".gif":
+            return
+
+        async def render():
+            for width, fmt in PREGENERATE:
+                if fmt not in available_formats():
+                    continue
+                try:
+                    await self.get_variant(filename, width, fmt)
+                except Exception:
+                    # Served on demand later, or rejected then if unreadable
+                    logger.warning("Could not pregenerate %s at %dpx as %s", filename, width, fmt, exc_info=True)
+
+        task = asyncio.create_task(render())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def wait(self):
+        """Wait for the background renders started so far"""
+        await asyncio.gather(*self._background, return_exceptions=True)
+
+    def delete_variants(self, filename: str):
+        """Remove every cached derivative of an image"""
+        if self.variant_dir.exists():
+            for path in self.variant_dir.glob(f"{Path(filename).stem}_w*"):
+                path.unlink(missing_ok=True)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+image_service = ImageService()
@@ -0,0 +1,587 @@
+import asyncio
+import hashlib
+import hmac
+import html
+import logging
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from email import policy
+from email.message import EmailMessage
+from string import Template
+from typing import Dict, List, NamedTuple, Optional, Set
+from urllib.parse import urlencode
+from sqlalchemy import and_, bindparam, delete, func, inspect, or_, select, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.core.database import SessionLocal, insert_missing
+from app.core.mail import RateLimiter, SmtpPool
+from app.models.blog_post import BlogPost
+from app.models.newsletter import NewsletterDelivery, NewsletterIssue, NewsletterSubscription
+from app.schemas.newsletter import NewsletterIssueCreate, NewsletterSubscribe
+from app.services.blog_post_service import parse_lang, translated_columns
+
+logger = logging.getLogger(__name__)
+
+# Issue statuses
+DRAFT = "draft"
+SENDING = "sending"
+PAUSED = "paused"
+SENT = "sent"
+
+# Delivery statuses
+PENDING = "pending"
+DELIVERED = "sent"
+FAILED = "failed"
+UNKNOWN = "unknown"
+
+LABELS = {
+    "en": {"greeting": "Hi", "read_more": "Read more", "unsubscribe": "Unsubscribe"},
+    "bn": {"greeting": "নমস্কার", "read_more": "আরও পড়ুন", "unsubscribe": "সদস্যতা ছাড়ুন"},
+    "hi": {"greeting": "नमस्ते", "read_more": "आगे पढ़ें", "unsubscribe": "सदस्यता छोड़ें"},
+}
+
+# Long unsubscribe links must stay on one header line, folding would encode them
+MAIL_POLICY = policy.SMTP.clone(max_line_length=998)
+
+
+class SendInProgressError(Exception):
+    """Another send of the issue is running"""
+
+
+def unsubscribe_token(email: str) -> str:
+    """Signature proving an unsubscribe link came from one of our mails"""
+    key = settings.JWT_SECRET_KEY.encode()
+    return hmac.new(key, email.lower().encode(), hashlib.sha256).hexdigest()[:32]
+
+
+def valid_unsubscribe_token(email: str, token: str) -> bool:
+    return hmac.compare_digest(token, unsubscribe_token(email))
+
+
+def unsubscribe_url(email: str) -> str:
+    query = urlencode({"email": email, "token": unsubscribe_token(email)})
+    return f"{settings.PUBLIC_BASE_URL.rstrip('/')}/api/newsletter/unsubscribe?{query}"
+
+
+class NewsletterService:
+    """Subscriptions and newsletter issues"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    async def subscribe(self, data: NewsletterSubscribe) -> dict:
+        """Subscribe an address, or turn a lapsed subscription back on"""
+        email = data.email.lower()
+        language = parse_lang(data.language)
+        # Insert-or-update that holds against a concurrent signup of the same address
+        insert_missing(self.db, NewsletterSubscription, [{
+            "email": email, "name": data.name, "language": language,
+            "active": True, "subscribed_at": datetime.utcnow()
+        }], ["email"])
+        self.db.execute(
+            update(NewsletterSubscription).where(NewsletterSubscription.email == email).values(
+                name=func.coalesce(data.name, NewsletterSubscription.name),
+                language=language,
+                active=True,
+                unsubscribed_at=None
+            )
+        )
+        self.db.commit()
+        return {"email": email, "language": language, "active": True}
+
+    async def unsubscribe(self, email: str, token: str) -> Optional[bool]:
+        """Turn a subscription off; None if the token doesn't match the address"""
+        email = email.lower()
+        if not valid_unsubscribe_token(email, token):
+            return None
+        result = self.db.execute(
+            update(NewsletterSubscription)
+            .where(NewsletterSubscription.email == email, NewsletterSubscription.active.isnot(False))
+            .values(active=False, unsubscribed_at=datetime.utcnow())
+        )
+        self.db.commit()
+        return result.rowcount > 0 or self.db.execute(
+            select(NewsletterSubscription.id).where(NewsletterSubscription.email == email)
+        ).first() is not None
+
+    async def create_issue(self, issue_data: NewsletterIssueCreate) -> dict:
+        """Create a draft issue presenting some posts; raises ValueError if one doesn't exist"""
+        post_ids = list(dict.fromkeys(issue_data.post_ids))
+        found = set(self.db.execute(select(BlogPost.id).where(BlogPost.id.in_(post_ids))).scalars())
+        missing = [post_id for post_id in post_ids if post_id not in found]
+        if missing:
+            raise ValueError(f"Posts not found: {', '.join(map(str, missing))}")
+
+        issue = NewsletterIssue(
+            subject=issue_data.subject,
+            intro=issue_data.intro,
+            post_ids=post_ids,
+            status=DRAFT,
+            last_subscriber_id=0,
+            sent_count=0,
+            failed_count=0,
+            unknown_count=0,
+            send_seconds=0.0,
+            created_at=datetime.utcnow()
+        )
+        self.db.add(issue)
+        self.db.flush()
+        result = self._to_dict(issue)
+        self.db.commit()
+        return result
+
+    @staticmethod
+    def _to_dict(issue, remaining: Optional[int] = None) -> dict:
+        return {
+            "id": issue.id,
+            "subject": issue.subject,
+            "intro": issue.intro,
+            "post_ids": issue.post_ids,
+            "status": issue.status,
+            "sent": issue.sent_count,
+            "failed": issue.failed_count,
+            "unknown": issue.unknown_count,
+            "remaining": remaining,
+            "messages_per_second": round(issue.sent_count / issue.send_seconds, 1) if issue.send_seconds else None,
+            "created_at": issue.created_at,
+            "started_at": issue.started_at,
+            "finished_at": issue.finished_at
+        }
+
+    async def get_issue(self, issue_id: int) -> Optional[dict]:
+        """An issue with its send progress"""
+        issue = self.db.get(NewsletterIssue, issue_id)
+        if issue is None:
+            return None
+        remaining = 0
+        if issue.status != SENT:
+            remaining = self.db.execute(
+                select(func.count()).select_from(NewsletterSubscription).where(
+                    NewsletterSubscription.active.is_(True),
+                    NewsletterSubscription.id > issue.last_subscriber_id
+                )
+            ).scalar()
+        return self._to_dict(issue, remaining)
+
+
+class RenderedIssue(NamedTuple):
+    """An issue in one language; $greeting and $unsubscribe_url are filled in per subscriber"""
+    subject: str
+    greeting: str
+    text: Template
+    html: Template
+
+
+def render_issue(db: Session, subject: str, intro: Optional[str], post_ids: List[int], lang: str) -> RenderedIssue:
+    """Render an issue in `lang`, posts falling back to English where they aren't translated"""
+    labels = LABELS[lang]
+    base_url = settings.PUBLIC_BASE_URL.rstrip("/")
+    rows = {
+        row.id: row for row in db.execute(
+            select(BlogPost.id, *translated_columns(("title", "excerpt"), lang)).where(BlogPost.id.in_(post_ids))
+        )
+    }
+
+    def local(row, name: str) -> str:
+        value = getattr(row, f"{name}_{lang}") if lang != "en" else None
+        # Escaped for Template, which only fills in the per-subscriber placeholders
+        return (value or getattr(row, name) or "").replace("$", "$$")
+
+    text_parts = ["$greeting", ""]
+    html_parts = ["<p>$greeting</p>"]
+    if intro:
+        text_parts += [intro.replace("$", "$$"), ""]
+        html_parts.append(f"<p>{html.escape(intro).replace('$', '$$')}</p>")
+    for post_id in post_ids:
+        row = rows.get(post_id)
+        if row is None:
+            continue
+        url = f"{base_url}/post-detail.html?id={post_id}&lang={lang}"
+        title, excerpt = local(row, "title"), local(row, "excerpt")
+        text_parts += [title, excerpt, f"{labels['read_more']}: {url}", ""]
+        html_parts.append(
+            f'<h2><a href="{html.escape(url)}">{html.escape(title)}</a></h2>'
+            f"<p>{html.escape(excerpt)}</p>"
+            f'<p><a href="{html.escape(url)}">{html.escape(labels["read_more"])}</a></p>'
+        )
+    text_parts += ["--", f"{labels['unsubscribe']}: $unsubscribe_url"]
+    html_parts.append(f'<p><a href="$unsubscribe_url">{html.escape(labels["unsubscribe"])}</a></p>')
+
+    return RenderedIssue(
+        subject=subject,
+        greeting=labels["greeting"],
+        text=Template("\n".join(text_parts) + "\n"),
+        html=Template("<html><body>" + "".join(html_parts) + "</body></html>\n")
+    )
+
+
+def build_message(rendered: RenderedIssue, email: str, name: Optional[str]) -> EmailMessage:
+    """The mail for one subscriber"""
+    greeting = f"{rendered.greeting} {name}," if name else f"{rendered.greeting},"
+    url = unsubscribe_url(email)
+    message = EmailMessage(policy=MAIL_POLICY)
+    message["From"] = settings.NEWSLETTER_FROM
+    message["To"] = email
+    message["Subject"] = rendered.subject
+    message["List-Unsubscribe"] = f"<{url}>"
+    message["List-Unsubscribe-Post"] = "List-Unsubscribe=One-Click"
+    message.set_content(rendered.text.substitute(greeting=greeting, unsubscribe_url=url))
+    message.add_alternative(
+        rendered.html.substitute(greeting=html.escape(greeting), unsubscribe_url=html.escape(url)),
+        subtype="html"
+    )
+    return message
+
+
+def claim_issue(db: Session, issue_id: int, lease_seconds: float = settings.NEWSLETTER_LEASE_SECONDS) -> Optional[bool]:
+    """Take an issue for sending, returns None if there's no such issue
+
+    A draft or paused issue can be taken, and so can one whose sender hasn't
+    shown progress for `lease_seconds`, as it has crashed. Deliveries a
+    crashed send claimed but never confirmed may or may not have gone out;
+    they become "unknown" and are not sent again. Raises SendInProgressError
+    while another sender is alive, ValueError once the issue is sent.
+    """
+    now = datetime.utcnow()
+    claimed = db.execute(
+        update(NewsletterIssue)
+        .where(
+            NewsletterIssue.id == issue_id,
+            or_(
+                NewsletterIssue.status.in_((DRAFT, PAUSED)),
+                and_(
+                    NewsletterIssue.status == SENDING,
+                    or_(
+                        NewsletterIssue.heartbeat_at.is_(None),
+                        NewsletterIssue.heartbeat_at < now - timedelta(seconds=lease_seconds)
+                    )
+                )
+            )
+        )
+        .values(status=SENDING, heartbeat_at=now, started_at=func.coalesce(NewsletterIssue.started_at, now))
+        .returning(NewsletterIssue.id)
+    ).first()
+    if claimed is None:
+        db.rollback()
+        status = db.execute(select(NewsletterIssue.status).where(NewsletterIssue.id == issue_id)).scalar()
+        if status is None:
+            return None
+        if status == SENT:
+            raise ValueError("Issue was already sent")
+        raise SendInProgressError("Issue is being sent")
+
+    unknown = db.execute(
+        update(NewsletterDelivery)
+        .where(NewsletterDelivery.issue_id == issue_id, NewsletterDelivery.status == PENDING)
+        .values(status=UNKNOWN)
+    ).rowcount
+    if unknown:
+        logger.warning("Newsletter issue %d: %d deliveries of a crashed send are unknown", issue_id, unknown)
+        db.execute(
+            update(NewsletterIssue).where(NewsletterIssue.id == issue_id)
+            .values(unknown_count=NewsletterIssue.unknown_count + unknown)
+        )
+    db.commit()
+    return True
+
+
+def _claim_subscribers(db: Session, issue_id: int, subscriber_ids: List[int]) -> Set[int]:
+    """Insert pending deliveries, returns the subscribers that had none for the issue yet"""
+    rows = [{"issue_id": issue_id, "subscriber_id": subscriber_id, "status": PENDING} for subscriber_id in subscriber_ids]
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as upsert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as upsert
+    else:
+        upsert = None
+
+    if upsert is not None:
+        statement = upsert(NewsletterDelivery).on_conflict_do_nothing(
+            index_elements=["issue_id", "subscriber_id"]
+        ).returning(NewsletterDelivery.subscriber_id)
+        return set(db.execute(statement, rows).scalars())
+
+    claimed = set()
+    for row in rows:
+        try:
+            with db.begin_nested():
+                db.execute(NewsletterDelivery.__table__.insert(), row)
+            claimed.add(row["subscriber_id"])
+        except IntegrityError:
+            pass
+    return claimed
+
+
+# Result of a delivery skipped because the send is stopping
+_SKIPPED = object()
+
+
+def send_issue(issue_id: int, pool: SmtpPool, limiter: Optional[RateLimiter] = None,
+               session_factory=SessionLocal, batch_size: int = settings.NEWSLETTER_BATCH_SIZE,
+               lease_seconds: float = settings.NEWSLETTER_LEASE_SECONDS,
+               stop: Optional[threading.Event] = None) -> dict:
+    """Send a claimed issue (see claim_issue) to every active subscriber it hasn't reached yet
+
+    Subscribers are read in batches ordered by id, each batch a short keyset
+    query (id > the issue's cursor), so the list is never loaded whole and
+    no transaction stays open across the send. Before a batch is
+    mailed its subscribers are claimed: pending delivery rows go in with
+    the issue's cursor moved past them, in one commit. The unique
+    (issue, subscriber) index lets a subscriber be claimed once per issue,
+    whatever happens to the process. The outcomes are committed once the
+    batch is through, so a crash leaves at most one batch "unknown" rather
+    than mailing anyone twice.
+
+    The issue is rendered once per language; messages go out on pool.size
+    threads sharing the pool's connections, paced by `limiter`. Setting
+    `stop` pauses the send after the messages in flight. Returns what this
+    run did.
+    """
+    limiter = limiter or RateLimiter()
+    if limiter.rate > 0:
+        # Progress must show well within the lease, or another process may take the issue over
+        batch_size = max(1, min(batch_size, int(limiter.rate * lease_seconds / 2)))
+    stop = stop or threading.Event()
+
+    report = {"issue_id": issue_id, "sent": 0, "failed": 0, "batches": 0}
+    db = session_factory()
+    try:
+        issue = db.execute(
+            select(NewsletterIssue.subject, NewsletterIssue.intro, NewsletterIssue.post_ids,
+                   NewsletterIssue.last_subscriber_id).where(NewsletterIssue.id == issue_id)
+        ).one()
+        cursor = issue.last_subscriber_id
+        rendered: Dict[str, RenderedIssue] = {}
+
+        def deliver(subscriber):
+            if stop.is_set():
+                return _SKIPPED
+            limiter.wait()
+            if stop.is_set():
+                return _SKIPPED
+            message = build_message(rendered[parse_lang(subscriber.language)], subscriber.email, subscriber.name)
+            try:
+                pool.send(message)
+            except (smtplib.SMTPException, OSError) as e:
+                return str(e)[:500] or type(e).__name__
+            return None
+
+        status = PAUSED
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=pool.size) as executor:
+            while not stop.is_set():
+                subscribers = db.execute(
+                    select(NewsletterSubscription.id, NewsletterSubscription.email,
+                           NewsletterSubscription.name, NewsletterSubscription.language)
+                    .where(NewsletterSubscription.active.is_(True), NewsletterSubscription.id > cursor)
+                    .order_by(NewsletterSubscription.id)
+                    .limit(batch_size)
+                ).all()
+                if not subscribers:
+                    status = SENT
+                    break
+
+                claimed = _claim_subscribers(db, issue_id, [subscriber.id for subscriber in subscribers])
+                cursor = subscribers[-1].id
+                db.execute(
+                    update(NewsletterIssue).where(NewsletterIssue.id == issue_id)
+                    .values(last_subscriber_id=cursor, heartbeat_at=datetime.utcnow())
+                )
+                db.commit()
+
+                batch = [subscriber for subscriber in subscribers if subscriber.id in claimed]
+                for lang in {parse_lang(subscriber.language) for subscriber in batch} - rendered.keys():
+                    rendered[lang] = render_issue(db, issue.subject, issue.intro, issue.post_ids, lang)
+                batch_started = time.perf_counter()
+                outcomes = list(executor.map(deliver, batch))
+                seconds = time.perf_counter() - batch_started
+
+                sent = [subscriber.id for subscriber, outcome in zip(batch, outcomes) if outcome is None]
+                failed = [
+                    {"subscriber": subscriber.id, "message": outcome}
+                    for subscriber, outcome in zip(batch, outcomes)
+                    if outcome is not None and outcome is not _SKIPPED
+                ]
+                skipped = [subscriber.id for subscriber, outcome in zip(batch, outcomes) if outcome is _SKIPPED]
+                _record_batch(db, issue_id, sent, failed, skipped, seconds)
+                if skipped:
+                    cursor = min(skipped) - 1
+                db.commit()
+
+                report["batches"] += 1
+                report["sent"] += len(sent)
+                report["failed"] += len(failed)
+
+        db.execute(
+            update(NewsletterIssue).where(NewsletterIssue.id == issue_id).values(
+                status=status,
+                heartbeat_at=None,
+                finished_at=datetime.utcnow() if status == SENT else None
+            )
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    report["status"] = status
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    report["messages_per_second"] = round(report["sent"] / report["seconds"], 1) if report["seconds"] else None
+    return report
+
+
+def _record_batch(db: Session, issue_id: int, sent: List[int], failed: List[dict], skipped: List[int], seconds: float):
+    """Store the outcome of a batch and the issue's counters"""
+    now = datetime.utcnow()
+    if sent:
+        db.execute(
+            update(NewsletterDelivery)
+            .where(NewsletterDelivery.issue_id == issue_id, NewsletterDelivery.subscriber_id.in_(sent))
+            .values(status=DELIVERED, sent_at=now)
+        )
+    if failed:
+        table = NewsletterDelivery.__table__
+        db.execute(
+            table.update()
+            .where(table.c.issue_id == issue_id, table.c.subscriber_id == bindparam("subscriber"))
+            .values(status=FAILED, error=bindparam("message")),
+            failed
+        )
+    values = {
+        "sent_count": NewsletterIssue.sent_count + len(sent),
+        "failed_count": NewsletterIssue.failed_count + len(failed),
+        "send_seconds": NewsletterIssue.send_seconds + seconds,
+        "heartbeat_at": now
+    }
+    if skipped:
+        # Never attempted: release them and move the cursor back so a resumed
+        # send picks them up; the ones after them that were sent keep their rows
+        db.execute(
+            delete(NewsletterDelivery).where(
+                NewsletterDelivery.issue_id == issue_id, NewsletterDelivery.subscriber_id.in_(skipped)
+            ),
+            execution_options={"synchronize_session": False}
+        )
+        values["last_subscriber_id"] = min(skipped) - 1
+    db.execute(update(NewsletterIssue).where(NewsletterIssue.id == issue_id).values(**values))
+
+
+class NewsletterSender:
+    """Runs issue sends in the background of this process
+
+    Each send gets a thread, its own SmtpPool of NEWSLETTER_SMTP_CONNECTIONS
+    connections and a NEWSLETTER_RATE_PER_SECOND limit. stop() pauses the
+    running sends after the messages in flight; starting an issue again
+    resumes it, in this process or another.
+    """
+
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+        self._runs: Dict[int, asyncio.Future] = {}
+        self._stops: Dict[int, threading.Event] = {}
+        # The last finished run of each issue
+        self.reports: Dict[int, dict] = {}
+
+    def _claim(self, issue_id: int) -> Optional[bool]:
+        db = self.session_factory()
+        try:
+            return claim_issue(db, issue_id)
+        finally:
+            db.close()
+
+    def _send(self, issue_id: int, stop: threading.Event) -> dict:
+        pool = SmtpPool(
+            settings.SMTP_HOST, settings.SMTP_PORT, settings.SMTP_USERNAME, settings.SMTP_PASSWORD,
+            starttls=settings.SMTP_STARTTLS, timeout=settings.SMTP_TIMEOUT,
+            size=settings.NEWSLETTER_SMTP_CONNECTIONS, max_messages=settings.NEWSLETTER_MESSAGES_PER_CONNECTION
+        )
+        try:
+            report = send_issue(
+                issue_id, pool, RateLimiter(settings.NEWSLETTER_RATE_PER_SECOND), self.session_factory, stop=stop
+            )
+        except Exception:
+            logger.exception("Newsletter issue %d: send failed, it can be resumed", issue_id)
+            raise
+        finally:
+            pool.close()
+        report["connections_opened"] = pool.connections_opened
+        logger.info(
+            "Newsletter issue %d %s: %d sent, %d failed in %.1fs (%s messages/s, %d connections)",
+            issue_id, report["status"], report["sent"], report["failed"], report["seconds"],
+            report["messages_per_second"], pool.connections_opened
+        )
+        self.reports[issue_id] = report
+        return report
+
+    def _finished(self, issue_id: int, future: asyncio.Future):
+        self._runs.pop(issue_id, None)
+        self._stops.pop(issue_id, None)
+        if not future.cancelled():
+            future.exception()  # logged by _send
+
+    async def start(self, issue_id: int) -> Optional[bool]:
+        """Start or resume sending an issue; None if there's no such issue
+
+        Raises SendInProgressError or ValueError like claim_issue.
+        """
+        if issue_id in self._runs:
+            raise SendInProgressError("Issue is being sent")
+        claimed = await run_in_threadpool(self._claim, issue_id)
+        if claimed is None:
+            return None
+
+        stop = threading.Event()
+        # A plain executor thread, so the request that started the send doesn't
+        # get the send's statements counted in its metrics
+        future = asyncio.get_running_loop().run_in_executor(None, self._send, issue_id, stop)
+        self._runs[issue_id] = future
+        self._stops[issue_id] = stop
+        future.add_done_callback(lambda done: self._finished(issue_id, done))
+        return True
+
+    def running(self) -> List[int]:
+        """Issues being sent by this process"""
+        return sorted(self._runs)
+
+    async def stop(self):
+        """Pause every running send"""
+        for stop in self._stops.values():
+            stop.set()
+        if self._runs:
+            await asyncio.gather(*self._runs.values(), return_exceptions=True)
+
+    def stats(self) -> dict:
+        """Running sends and the last run of each issue"""
+        return {"running": self.running(), "last_runs": list(self.reports.values())}
+
+
+def migrate_newsletter(engine):
+    """Bring an existing database up to the issues and their deliveries
+
+    Creates the newsletter_issues and newsletter_deliveries tables and adds
+    the subscribers' language, existing subscribers get English. Does nothing
+    once they exist.
+    """
+    NewsletterIssue.__table__.create(bind=engine, checkfirst=True)
+    NewsletterDelivery.__table__.create(bind=engine, checkfirst=True)
+    inspector = inspect(engine)
+    if not inspector.has_table("newsletter_subscriptions"):
+        return
+    if "language" in {column["name"] for column in inspector.get_columns("newsletter_subscriptions")}:
+        return
+
+    with engine.begin() as connection:
+        connection.execute(text(
+            "ALTER TABLE newsletter_subscriptions ADD COLUMN language VARCHAR(5) NOT NULL DEFAULT 'en'"
+        ))
+
+
+newsletter_sender = NewsletterSender()
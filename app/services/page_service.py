@@ -0,0 +1,291 @@
+import gzip
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from email.utils import formatdate
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+from fastapi import Request
+from fastapi.responses import Response
+from sqlalchemy import delete, inspect, select, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.core.cache import PAGES_SCOPE, render_json, response_cache
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.static_files import accepted_encodings
+from app.models.page import Page
+from app.schemas.page import PageCreate, PageUpdate
+from app.services.blog_post_service import LANGUAGES, parse_lang
+
+try:
+    import brotli
+except ImportError:  # optional, pages are then served gzipped
+    brotli = None
+
+# Fields stored once per language, as e.g. `title`, `title_bn` and `title_hi`
+PAGE_TRANSLATED_FIELDS = ("title", "content")
+
+PAGE_COLUMNS = (
+    Page.id, Page.slug, Page.title, Page.content, Page.title_bn, Page.content_bn,
+    Page.title_hi, Page.content_hi, Page.created_at, Page.updated_at
+)
+
+
+def localize_page(page, lang: str) -> dict:
+    """A page row as a response dict in `lang`"""
+    result = {
+        "id": page.id,
+        "slug": page.slug,
+        "title": page.title,
+        "content": page.content,
+        "created_at": page.created_at,
+        "updated_at": page.updated_at
+    }
+    if lang != "en":
+        for name in PAGE_TRANSLATED_FIELDS:
+            if getattr(page, f"{name}_{lang}"):
+                result[name] = getattr(page, f"{name}_{lang}")
+    return result
+
+
+class PageService:
+    """Static pages such as about, contact and terms"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    async def get_page(self, slug: str, lang: str = "en") -> Optional[dict]:
+        """A published page in `lang`"""
+        page = self.db.execute(
+            select(*PAGE_COLUMNS).where(Page.slug == slug, Page.published.isnot(False))
+        ).first()
+        return None if page is None else localize_page(page, parse_lang(lang))
+
+    async def get_pages(self) -> List[dict]:
+        """Slug and title of every published page"""
+        return [
+            {"slug": page.slug, "title": page.title}
+            for page in self.db.execute(
+                select(Page.slug, Page.title).where(Page.published.isnot(False)).order_by(Page.slug)
+            )
+        ]
+
+    async def create_page(self, page_data: PageCreate) -> dict:
+        """Create a page; raises ValueError if the slug is taken"""
+        page = Page(**page_data.dict(), created_at=datetime.utcnow())
+        self.db.add(page)
+        try:
+            self.db.flush()
+        except IntegrityError:
+            self.db.rollback()
+            raise ValueError(f"A page with slug '{page_data.slug}' already exists")
+        result = {**localize_page(page, "en"), "published": page.published}
+        self.db.commit()
+        await invalidate_page(page.slug)
+        return result
+
+    async def update_page(self, slug: str, page_data: PageUpdate) -> Optional[dict]:
+        """Update a page, its cached renderings are dropped
+
+        Raises ValueError if the database rejects the new values.
+        """
+        values = page_data.dict(exclude_unset=True)
+        values["updated_at"] = datetime.utcnow()
+        try:
+            found = self.db.execute(
+                update(Page).where(Page.slug == slug).values(**values).returning(Page.id)
+            ).first()
+        except IntegrityError as e:
+            self.db.rollback()
+            raise ValueError(f"Page not updated: {e.orig}")
+        if found is None:
+            self.db.rollback()
+            return None
+        page = self.db.execute(select(*PAGE_COLUMNS, Page.published).where(Page.id == found.id)).first()
+        self.db.commit()
+        await invalidate_page(slug)
+        return {**localize_page(page, "en"), "published": page.published}
+
+    async def delete_page(self, slug: str) -> bool:
+        """Delete a page"""
+        deleted = self.db.execute(delete(Page).where(Page.slug == slug)).rowcount
+        self.db.commit()
+        if deleted:
+            await invalidate_page(slug)
+        return bool(deleted)
+
+
+async def load_page(slug: str, lang: str) -> Optional[dict]:
+    """get_page with a session of its own"""
+    db = SessionLocal()
+    try:
+        return await PageService(db).get_page(slug, lang)
+    finally:
+        db.close()
+
+
+class RenderedPage(NamedTuple):
+    """A page response, serialized and compressed once"""
+    # Content coding ("identity", "gzip", "br") -> (body, ETag)
+    bodies: Dict[str, Tuple[bytes, str]]
+    last_modified: float
+    # PAGES_SCOPE version the page was read at
+    version: int
+
+
+def render_page(page: dict, version: int) -> RenderedPage:
+    """Serialize a page and compress it with every coding available"""
+    body = render_json(page).encode()
+    digest = hashlib.sha1(body).hexdigest()
+    bodies = {
+        "identity": (body, f'"{digest}"'),
+        "gzip": (gzip.compress(body, compresslevel=9, mtime=0), f'"{digest}-gzip"')
+    }
+    if brotli is not None:
+        bodies["br"] = (brotli.compress(body, quality=11), f'"{digest}-br"')
+    return RenderedPage(bodies, time.time(), version)
+
+
+class PageCache:
+    """Rendered page responses in an LRU per (slug, lang)
+
+    Entries hold the JSON body already compressed with gzip (and brotli when
+    the package is installed), so a cached page is served without touching
+    the database, serializing or compressing. Every entry remembers the
+    version of PAGES_SCOPE in the response cache backend it was rendered
+    at: a page change bumps the version and, with the redis backend, every
+    worker drops its copies on their next use. The cache is filled with
+    every published page in every language at startup.
+    """
+
+    def __init__(self, max_entries: int = settings.PAGE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], RenderedPage]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, slug: str, lang: str, version: int) -> Optional[RenderedPage]:
+        with self._lock:
+            entry = self._entries.get((slug, lang))
+            if entry is None or entry.version != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((slug, lang))
+            self.hits += 1
+            return entry
+
+    def put(self, slug: str, lang: str, entry: RenderedPage):
+        with self._lock:
+            current = self._entries.get((slug, lang))
+            if current is not None and current.version > entry.version:
+                return
+            self._entries[(slug, lang)] = entry
+            self._entries.move_to_end((slug, lang))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, slug: str):
+        """Drop a page's entries in this process"""
+        with self._lock:
+            for lang in LANGUAGES:
+                self._entries.pop((slug, lang), None)
+
+    @staticmethod
+    def _response(request: Request, entry: RenderedPage, hit: bool) -> Response:
+        accepted = accepted_encodings(request.headers.get("accept-encoding", ""))
+        encoding = next((name for name in ("br", "gzip") if name in accepted and name in entry.bodies), "identity")
+        body, etag = entry.bodies[encoding]
+        headers = {
+            "ETag": etag,
+            "Last-Modified": formatdate(entry.last_modified, usegmt=True),
+            "Cache-Control": "no-cache",
+            "Vary": "Accept-Encoding",
+            "X-Cache": "HIT" if hit else "MISS"
+        }
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    async def respond(self, request: Request, slug: str, lang: str,
+                      load: Callable[[], Awaitable[Optional[dict]]]) -> Optional[Response]:
+        """Serve a page from the cache, or load, render and cache it; None if `load` finds no page"""
+        # Read before loading, so a change made meanwhile leaves this rendering stale
+        version = await response_cache.version(PAGES_SCOPE)
+        entry = self.get(slug, lang, version)
+        if entry is not None:
+            return self._response(request, entry, hit=True)
+
+        page = await load()
+        if page is None:
+            return None
+        entry = render_page(page, version)
+        self.put(slug, lang, entry)
+        return self._response(request, entry, hit=False)
+
+    def _load_all(self, session_factory) -> list:
+        db = session_factory()
+        try:
+            return db.execute(
+                select(*PAGE_COLUMNS).where(Page.published.isnot(False)).order_by(Page.id)
+            ).all()
+        finally:
+            db.close()
+
+    async def warm(self, session_factory=SessionLocal):
+        """Render every published page in every language, as many as fit"""
+        version = await response_cache.version(PAGES_SCOPE)
+        pages = await run_in_threadpool(self._load_all, session_factory)
+        for page in pages[:self.max_entries // len(LANGUAGES)]:
+            for lang in LANGUAGES:
+                self.put(page.slug, lang, render_page(localize_page(page, lang), version))
+
+    def stats(self) -> dict:
+        """Counters describing the cache"""
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "encodings": ["identity", "gzip"] + (["br"] if brotli is not None else [])
+        }
+
+
+page_cache = PageCache()
+
+
+async def invalidate_page(slug: str):
+    """Drop a page's cached renderings here and, through PAGES_SCOPE, in every worker"""
+    page_cache.invalidate(slug)
+    await response_cache.invalidate(PAGES_SCOPE)
+
+
+def migrate_pages(engine):
+    """Add the translation columns to an existing pages table
+
+    Does nothing once they exist.
+    """
+    inspector = inspect(engine)
+    if not inspector.has_table("pages"):
+        return
+    columns = {column["name"] for column in inspector.get_columns("pages")}
+    missing = [
+        (f"{name}_{lang}", "VARCHAR(200)" if name == "title" else "TEXT")
+        for lang in LANGUAGES if lang != "en"
+        for name in PAGE_TRANSLATED_FIELDS
+        if f"{name}_{lang}" not in columns
+    ]
+    if not missing:
+        return
+
+    with engine.begin() as connection:
+        for name, column_type in missing:
+            connection.execute(text(f"ALTER TABLE pages ADD COLUMN {name} {column_type}"))
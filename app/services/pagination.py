@@ -0,0 +1,79 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Optional, Tuple
+from sqlalchemy import and_, func, or_
+from app.models.blog_post import BlogPost
+
+# Sort keys that can be used for keyset pagination; (sort key, id) gives a
+# stable total order. view_count is NULL in rows written before it had a
+# default, so it is compared as 0: NULL would match neither side of the seek.
+CURSOR_SORT_KEYS = {
+    "created_at": BlogPost.created_at,
+    "view_count": func.coalesce(BlogPost.view_count, 0),
+    "title": BlogPost.title,
+    "id": BlogPost.id,
+}
+
+
+def encode_cursor(sort_by: str, value: Any, post_id: int) -> str:
+    """Encode the position after a post as an opaque cursor"""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([sort_by, value, post_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def cursor_after(post: BlogPost, sort_by: str) -> str:
+    """The cursor pointing after `post` in a keyset sorted by `sort_by`"""
+    value = getattr(post, sort_by)
+    if sort_by == "view_count":
+        value = value or 0
+    return encode_cursor(sort_by, value, post.id)
+
+
+def _is_int(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def decode_cursor(cursor: str, sort_by: str) -> Tuple[Any, int]:
+    """Decode a cursor into the (sort value, id) it points after
+
+    Raises ValueError for anything that isn't a cursor made by encode_cursor.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, value, post_id = json.loads(base64.urlsafe_b64decode(padded))
+        if not _is_int(post_id):
+            raise ValueError
+        if cursor_sort == "created_at":
+            value = datetime.fromisoformat(value)
+        elif cursor_sort in ("view_count", "id") and not _is_int(value):
+            raise ValueError
+        elif cursor_sort == "title" and not isinstance(value, str):
+            raise ValueError
+        elif cursor_sort == "relevance" and not (_is_int(value) or isinstance(value, float)):
+            raise ValueError
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+    if cursor_sort != sort_by:
+        raise ValueError("Cursor does not match the requested sort order")
+    return value, post_id
+
+
+def apply_keyset(query, sort_by: str, sort_dir: str, cursor: Optional[str]):
+    """Order a BlogPost query by (sort key, id) and seek past the cursor"""
+    column = CURSOR_SORT_KEYS[sort_by]
+    ascending = sort_dir.lower() == "asc"
+
+    if cursor:
+        value, post_id = decode_cursor(cursor, sort_by)
+        if ascending:
+            query = query.filter(or_(column > value, and_(column == value, BlogPost.id > post_id)))
+        else:
+            query = query.filter(or_(column < value, and_(column == value, BlogPost.id < post_id)))
+
+    if ascending:
+        return query.order_by(column.asc(), BlogPost.id.asc())
+    return query.order_by(column.desc(), BlogPost.id.desc())
@@ -0,0 +1,352 @@
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+from sqlalchemy import bindparam, func, inspect, select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.core.cache import POLLS_SCOPE, poll_scope, response_cache
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.poll import BlogPoll, PollOption, PollVote
+from app.schemas.poll import PollCreate
+
+logger = logging.getLogger(__name__)
+
+# Outcomes of a vote
+RECORDED = "recorded"
+DUPLICATE = "duplicate"
+CLOSED = "closed"
+NOT_FOUND = "not_found"
+
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Naive UTC, whether the database handed back an aware or a naive datetime"""
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _is_open(active: Optional[bool], expires_at: Optional[datetime], now: datetime) -> bool:
+    expires_at = _utc(expires_at)
+    return active is not False and (expires_at is None or expires_at > now)
+
+
+class PollService:
+    """Creates polls and reads their results"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    async def create_poll(self, poll_data: PollCreate) -> dict:
+        """Create a poll with its options
+
+        Raises ValueError if it would expire before it opens.
+        """
+        now = datetime.utcnow()
+        expires_at = _utc(poll_data.expires_at)
+        if expires_at is not None and expires_at <= now:
+            raise ValueError("expires_at must be in the future")
+
+        poll = BlogPoll(
+            question=poll_data.question,
+            active=True,
+            created_at=now,
+            expires_at=expires_at,
+            options=[PollOption(option_text=text, vote_count=0) for text in poll_data.options]
+        )
+        self.db.add(poll)
+        # Ids are known after the flush, read them before the commit expires everything
+        self.db.flush()
+        result = self._to_dict(poll, poll.options)
+        self.db.commit()
+        await response_cache.invalidate(POLLS_SCOPE)
+        return result
+
+    def _to_dict(self, poll, options, with_counts: bool = True) -> dict:
+        now = datetime.utcnow()
+        result = {
+            "id": poll.id,
+            "question": poll.question,
+            "created_at": poll.created_at,
+            "expires_at": poll.expires_at,
+            "is_open": _is_open(poll.active, poll.expires_at, now)
+        }
+        if not with_counts:
+            result["options"] = [{"id": option.id, "option_text": option.option_text} for option in options]
+            return result
+
+        total = sum(option.vote_count or 0 for option in options)
+        result["total_votes"] = total
+        result["options"] = [
+            {
+                "id": option.id,
+                "option_text": option.option_text,
+                "vote_count": option.vote_count or 0,
+                "percentage": round(100.0 * (option.vote_count or 0) / total, 1) if total else 0.0
+            }
+            for option in options
+        ]
+        return result
+
+    def _options(self, poll_ids: List[int]) -> Dict[int, list]:
+        options = {poll_id: [] for poll_id in poll_ids}
+        for option in self.db.execute(
+            select(PollOption.id, PollOption.poll_id, PollOption.option_text, PollOption.vote_count)
+            .where(PollOption.poll_id.in_(poll_ids))
+            .order_by(PollOption.id)
+        ):
+            options[option.poll_id].append(option)
+        return options
+
+    async def get_open_polls(self, limit: int) -> List[dict]:
+        """Newest polls still taking votes, without their counts"""
+        now = datetime.utcnow()
+        polls = self.db.execute(
+            select(BlogPoll.id, BlogPoll.question, BlogPoll.active, BlogPoll.created_at, BlogPoll.expires_at)
+            .where(BlogPoll.active.is_(True), (BlogPoll.expires_at.is_(None)) | (BlogPoll.expires_at > now))
+            .order_by(BlogPoll.id.desc())
+            .limit(limit)
+        ).all()
+        options = self._options([poll.id for poll in polls])
+        return [self._to_dict(poll, options[poll.id], with_counts=False) for poll in polls]
+
+    async def get_results(self, poll_id: int) -> Optional[dict]:
+        """A poll with the votes per option"""
+        poll = self.db.execute(
+            select(BlogPoll.id, BlogPoll.question, BlogPoll.active, BlogPoll.created_at, BlogPoll.expires_at)
+            .where(BlogPoll.id == poll_id)
+        ).first()
+        if poll is None:
+            return None
+        return self._to_dict(poll, self._options([poll_id])[poll_id])
+
+
+class PendingVote(NamedTuple):
+    poll_id: int
+    option_id: int
+    user_ip: str
+
+
+def record_votes(db: Session, votes: List[PendingVote]) -> List[str]:
+    """Record a batch of votes in one transaction, returns the outcome of each
+
+    The options are checked with one query, the votes go in as one
+    INSERT ... ON CONFLICT DO NOTHING, so the unique (poll_id, user_ip) index
+    decides which vote of an IP counts even against other processes, and
+    vote_count gets one `vote_count + n` UPDATE per option for the votes that
+    were actually inserted.
+    """
+    options = {
+        row.id: row for row in db.execute(
+            select(PollOption.id, PollOption.poll_id, BlogPoll.active, BlogPoll.expires_at)
+            .join(BlogPoll, BlogPoll.id == PollOption.poll_id)
+            .where(PollOption.id.in_({vote.option_id for vote in votes}))
+        )
+    }
+    now = datetime.utcnow()
+    outcomes: List[Optional[str]] = []
+    rows, first = [], set()
+    for vote in votes:
+        option = options.get(vote.option_id)
+        if option is None or option.poll_id != vote.poll_id:
+            outcomes.append(NOT_FOUND)
+        elif not _is_open(option.active, option.expires_at, now):
+            outcomes.append(CLOSED)
+        elif (vote.poll_id, vote.user_ip) in first:
+            outcomes.append(DUPLICATE)
+        else:
+            first.add((vote.poll_id, vote.user_ip))
+            rows.append({"poll_id": vote.poll_id, "option_id": vote.option_id, "user_ip": vote.user_ip})
+            outcomes.append(None)
+
+    inserted = _insert_votes(db, rows)
+    counts = Counter(row["option_id"] for row in rows if (row["poll_id"], row["user_ip"]) in inserted)
+    if counts:
+        table = PollOption.__table__
+        db.execute(
+            table.update().where(table.c.id == bindparam("option")).values(
+                vote_count=func.coalesce(table.c.vote_count, 0) + bindparam("votes")
+            ),
+            [{"option": option_id, "votes": votes} for option_id, votes in counts.items()]
+        )
+    db.commit()
+
+    return [
+        outcome or (RECORDED if (vote.poll_id, vote.user_ip) in inserted else DUPLICATE)
+        for vote, outcome in zip(votes, outcomes)
+    ]
+
+
+def _insert_votes(db: Session, rows: List[dict]) -> Set[Tuple[int, str]]:
+    """Insert the votes whose IP hasn't voted in the poll yet, returns the (poll_id, user_ip) inserted"""
+    if not rows:
+        return set()
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as upsert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as upsert
+    else:
+        upsert = None
+
+    if upsert is not None:
+        statement = upsert(PollVote).on_conflict_do_nothing(
+            index_elements=["poll_id", "user_ip"]
+        ).returning(PollVote.poll_id, PollVote.user_ip)
+        return set(db.execute(statement, rows).tuples())
+
+    inserted = set()
+    for row in rows:
+        try:
+            with db.begin_nested():
+                db.execute(PollVote.__table__.insert(), row)
+            inserted.add((row["poll_id"], row["user_ip"]))
+        except IntegrityError:
+            pass
+    return inserted
+
+
+class PollVoteBatcher:
+    """Group commit for poll votes
+
+    Votes are queued and written by one background task, every vote queued
+    while the previous batch was being written goes into the next one (up to
+    max_batch). A burst of votes costs a handful of transactions instead of
+    one each, and every caller still waits for its vote to be committed and
+    learns whether it counted. Cached results of the polls voted in are
+    invalidated once per batch.
+    """
+
+    def __init__(self, session_factory=SessionLocal, max_batch: int = settings.POLL_VOTE_MAX_BATCH):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+        # Counters
+        self.batches = 0
+        self.failed_batches = 0
+        self.outcomes: Dict[str, int] = Counter()
+        self.largest_batch = 0
+
+    def _record(self, votes: List[PendingVote]) -> List[str]:
+        db = self.session_factory()
+        try:
+            return record_votes(db, votes)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    async def _write(self, batch: list):
+        votes = [vote for vote, _ in batch]
+        try:
+            outcomes = await run_in_threadpool(self._record, votes)
+        except Exception as e:
+            self.failed_batches += 1
+            logger.exception("Failed to record %d poll votes", len(votes))
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.largest_batch = max(self.largest_batch, len(batch))
+        self.outcomes.update(outcomes)
+        for (_, future), outcome in zip(batch, outcomes):
+            if not future.done():
+                future.set_result(outcome)
+        voted = {vote.poll_id for vote, outcome in zip(votes, outcomes) if outcome == RECORDED}
+        if voted:
+            # The votes are in, a cache that can't be reached must not stop the writer
+            try:
+                await response_cache.invalidate(*(poll_scope(poll_id) for poll_id in voted))
+            except Exception:
+                logger.exception("Failed to invalidate the results of %d polls", len(voted))
+
+    async def _run(self):
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            stopping = False
+            while len(batch) < self.max_batch and not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._write(batch)
+            if stopping:
+                return
+
+    async def submit(self, poll_id: int, option_id: int, user_ip: str) -> str:
+        """Queue a vote and wait until it is committed, returns its outcome"""
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((PendingVote(poll_id, option_id, user_ip), future))
+        return await future
+
+    def start(self):
+        """Start the writer task, or start it again if it ended without being stopped
+
+        A restarted task takes over the queue, votes waiting in it are still written.
+        """
+        if self._task is None or self._task.done():
+            if self._queue is None:
+                self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Write the votes already queued, then stop"""
+        if self._task is not None:
+            self._queue.put_nowait(None)
+            await self._task
+            self._task = None
+            self._queue = None
+
+    def stats(self) -> dict:
+        """Counters describing the batcher"""
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "largest_batch": self.largest_batch,
+            "max_batch": self.max_batch,
+            "votes": dict(self.outcomes)
+        }
+
+
+def migrate_poll_votes(engine):
+    """Add the one-vote-per-IP index to an existing poll_votes table
+
+    Older databases may hold repeated votes; only the first of each IP is
+    kept and the option counts are recounted from the votes left. Does
+    nothing once the index exists.
+    """
+    inspector = inspect(engine)
+    if not inspector.has_table("poll_votes"):
+        return
+    if "uq_poll_votes_poll_ip" in {index["name"] for index in inspector.get_indexes("poll_votes")}:
+        return
+
+    with engine.begin() as connection:
+        connection.execute(text(
+            "DELETE FROM poll_votes WHERE id NOT IN "
+            "(SELECT min(id) FROM poll_votes GROUP BY poll_id, user_ip)"
+        ))
+        connection.execute(text(
+            "UPDATE poll_options SET vote_count = "
+            "(SELECT count(*) FROM poll_votes WHERE poll_votes.option_id = poll_options.id)"
+        ))
+        for table in (PollOption.__table__, PollVote.__table__):
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+
+
+poll_votes = PollVoteBatcher()
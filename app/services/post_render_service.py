@@ -0,0 +1,108 @@
+"""Backfill of the columns posts render from their markdown
+
+    python -m app.services.post_render_service [--batch-size 500] [--all]
+
+Posts are rendered when they are written. This renders the ones that never
+were (written before rendering moved to write time) or were rendered by an
+older markdown.RENDER_VERSION, in batches of `--batch-size` posts committed
+one at a time, so it can be stopped and run again. `--all` renders every
+post regardless.
+
+Cached responses are dropped afterwards only with CACHE_BACKEND=redis, the
+one cache this process shares with the servers. A memory cache lives in each
+server process, out of reach from here: those serve the old rendering until
+their entries expire (CACHE_TTL) or they are restarted.
+"""
+import argparse
+import asyncio
+import time
+from sqlalchemy import inspect, or_, select, text, update
+from app.core.cache import POSTS_SCOPE, RedisCacheBackend, response_cache
+from app.core.database import SessionLocal, engine
+from app.core.markdown import RENDER_VERSION
+from app.models.blog_post import BlogPost
+from app.services.blog_post_service import LANGUAGES, RENDERED_FIELDS, language_suffix, render_content
+
+# Columns a post is rendered from; updated_at is written back as it was, a
+# backfill is not an edit
+SOURCE_COLUMNS = [BlogPost.id, BlogPost.updated_at] + [
+    getattr(BlogPost, f"{name}{language_suffix(lang)}") for lang in LANGUAGES for name in ("content", "excerpt")
+]
+
+
+def backfill(session_factory=SessionLocal, batch_size: int = 500, all_posts: bool = False) -> dict:
+    """Render posts that are missing or behind on their rendered columns, in keyset batches"""
+    started = time.perf_counter()
+    rendered = batches = last_id = 0
+    db = session_factory()
+    try:
+        while True:
+            statement = select(*SOURCE_COLUMNS).where(BlogPost.id > last_id).order_by(BlogPost.id).limit(batch_size)
+            if not all_posts:
+                statement = statement.where(
+                    or_(BlogPost.render_version.is_(None), BlogPost.render_version < RENDER_VERSION)
+                )
+            rows = db.execute(statement).all()
+            if not rows:
+                break
+            # ORM bulk UPDATE by primary key
+            db.execute(update(BlogPost), [
+                {"id": row.id, "updated_at": row.updated_at, **render_content(row._asdict())} for row in rows
+            ])
+            db.commit()
+            rendered += len(rows)
+            batches += 1
+            last_id = rows[-1].id
+    finally:
+        db.close()
+
+    seconds = time.perf_counter() - started
+    return {
+        "rendered": rendered,
+        "batches": batches,
+        "seconds": round(seconds, 3),
+        "posts_per_second": round(rendered / seconds, 1) if seconds else 0.0
+    }
+
+
+def migrate_post_rendering(engine):
+    """Add the rendered columns to an existing blog_posts table
+
+    They stay empty until the post is written again or the backfill runs.
+    Does nothing once they exist.
+    """
+    inspector = inspect(engine)
+    if not inspector.has_table("blog_posts"):
+        return
+    columns = {column["name"] for column in inspector.get_columns("blog_posts")}
+    missing = [
+        (f"{name}{language_suffix(lang)}", "TEXT" if name == "content_html" else "INTEGER")
+        for name in RENDERED_FIELDS for lang in LANGUAGES
+        if f"{name}{language_suffix(lang)}" not in columns
+    ]
+    if "render_version" not in columns:
+        missing.append(("render_version", "INTEGER"))
+    if not missing:
+        return
+
+    with engine.begin() as connection:
+        for name, column_type in missing:
+            connection.execute(text(f"ALTER TABLE blog_posts ADD COLUMN {name} {column_type}"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--all", action="store_true", help="render every post, not only stale ones")
+    args = parser.parse_args()
+
+    migrate_post_rendering(engine)
+    report = backfill(batch_size=args.batch_size, all_posts=args.all)
+    # Cached responses hold the posts as they were; a memory cache here would be a new, empty one
+    if report["rendered"] and isinstance(response_cache.backend, RedisCacheBackend):
+        asyncio.run(response_cache.invalidate(POSTS_SCOPE))
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
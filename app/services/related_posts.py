@@ -0,0 +1,478 @@
+import asyncio
+import logging
+import string
+import threading
+import time
+import zlib
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from functools import lru_cache
+from itertools import chain, repeat
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+from scipy import sparse
+from sqlalchemy import or_, select
+from starlette.concurrency import run_in_threadpool
+from app.core.cache import RELATED_SCOPE, response_cache
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.blog_post import BlogPost, BlogPostTag
+from app.models.tag import Tag
+
+logger = logging.getLogger(__name__)
+
+# Words are hashed into the first TEXT_FEATURES columns of a post's vector
+# and tags into the TAG_FEATURES after them
+TEXT_FEATURES = 1 << 20
+TAG_FEATURES = 1 << 16
+FEATURES = TEXT_FEATURES + TAG_FEATURES
+
+# Times a word counts in the title and the excerpt, against once in the content
+TITLE_WEIGHT = 3
+EXCERPT_WEIGHT = 2
+# Heaviest words kept per post; fewer words keep the similarity products sparse
+TERMS_PER_POST = 64
+# Words in more than this share of the posts are dropped, once there are
+# MAX_DF_MIN_POSTS posts to tell
+MAX_DF = 0.5
+MAX_DF_MIN_POSTS = 100
+
+# Posts compared with all the others at once while building
+BUILD_BLOCK = 1024
+# Posts indexed since the last build are merged into the matrices once this many
+COMPACT_ROWS = 1024
+
+# Markup and punctuation separate words like spaces do; unlike \w this keeps
+# Bengali and Hindi vowel signs in their words
+_SEPARATORS = str.maketrans({character: " " for character in string.punctuation})
+
+
+def _words(text: Optional[str]) -> List[str]:
+    return (text or "").lower().translate(_SEPARATORS).split()
+
+
+@lru_cache(maxsize=1 << 20)
+def _word_feature(word: str) -> int:
+    return zlib.crc32(word.encode()) % TEXT_FEATURES
+
+
+def _tag_feature(tag: str) -> int:
+    return TEXT_FEATURES + zlib.crc32(tag.lower().encode()) % TAG_FEATURES
+
+
+def _count(posts: Iterable[Tuple[int, str, str, str]], tags: Dict[int, List[str]]):
+    """Weighted word counts and tags of posts as (post ids, rows, columns, counts) arrays"""
+    post_ids, columns, counts = [], [], []
+    for post_id, title, excerpt, content in posts:
+        words = Counter(_words(content))
+        for text, weight in ((excerpt, EXCERPT_WEIGHT), (title, TITLE_WEIGHT)):
+            for word in _words(text):
+                words[word] += weight
+        post_tags = set(tags.get(post_id, ()))
+        length = len(words) + len(post_tags)
+        post_ids.append(post_id)
+        columns.append(np.fromiter(
+            chain(map(_word_feature, words), map(_tag_feature, post_tags)), np.int64, length
+        ))
+        counts.append(np.fromiter(chain(words.values(), repeat(1, len(post_tags))), np.float32, length))
+
+    lengths = [len(row) for row in columns]
+    rows = np.repeat(np.arange(len(post_ids)), lengths)
+    if not post_ids:
+        return np.zeros(0, np.int64), rows, np.zeros(0, np.int64), np.zeros(0, np.float32)
+    return np.array(post_ids, np.int64), rows, np.concatenate(columns), np.concatenate(counts)
+
+
+def _normalized(rows, columns, weights, posts: int, scale: float, per_row: Optional[int] = None):
+    """Rows of unit length times `scale`, keeping the `per_row` heaviest entries of each"""
+    keep = weights > 0
+    rows, columns, weights = rows[keep], columns[keep], weights[keep]
+    if per_row is not None:
+        order = np.lexsort((-weights, rows))
+        rows, columns, weights = rows[order], columns[order], weights[order]
+        rank = np.arange(len(rows)) - np.searchsorted(rows, rows)
+        keep = rank < per_row
+        rows, columns, weights = rows[keep], columns[keep], weights[keep]
+    norms = np.sqrt(np.bincount(rows, weights=weights * weights, minlength=posts))
+    weights = weights / norms[rows] * scale
+    return sparse.csr_matrix((weights.astype(np.float32), (rows, columns)), shape=(posts, FEATURES))
+
+
+class RelatedPostsIndex:
+    """The most similar posts of every post, in arrays
+
+    A post is a vector of TF-IDF weighted words from its title, excerpt and
+    content plus its tags, both halves normalized so that the dot product of
+    two posts is `1 - tag_weight` times their text similarity plus
+    `tag_weight` times their tag overlap (cosine). Each row of `neighbours`
+    holds the ids of a post's `k` most similar posts, best first, 0 where
+    there are fewer.
+
+    Posts can be added and removed after the build. The term weights stay
+    those of the build, and a removed post leaves a gap in the lists it was
+    in until the next build. Not thread safe.
+    """
+
+    def __init__(self, idf: np.ndarray, k: int, tag_weight: float):
+        self.idf = idf
+        self.k = k
+        self.tag_weight = tag_weight
+
+        # Row -> post id (0 once removed), neighbours and their scores
+        self.size = 0
+        self.post_ids = np.zeros(0, np.int64)
+        self.neighbours = np.zeros((0, k), np.int64)
+        self.scores = np.zeros((0, k), np.float32)
+        self.rows: Dict[int, int] = {}
+
+        # Post vectors by row, and the same transposed to find the posts
+        # sharing a feature; rows added since are kept apart in `_recent`
+        self._matrix = sparse.csr_matrix((0, FEATURES), dtype=np.float32)
+        self._postings = sparse.csr_matrix((FEATURES, 0), dtype=np.float32)
+        self._recent: List[sparse.csr_matrix] = []
+
+    @classmethod
+    def build(cls, posts: Iterable[Tuple[int, str, str, str]], tags: Dict[int, List[str]],
+              k: int = settings.RELATED_POSTS_K,
+              tag_weight: float = settings.RELATED_POSTS_TAG_WEIGHT) -> "RelatedPostsIndex":
+        """Index (id, title, excerpt, content) posts with their tags"""
+        post_ids, rows, columns, counts = _count(posts, tags)
+        n = len(post_ids)
+        df = np.bincount(columns, minlength=FEATURES)
+        idf = (np.log((1 + n) / (1 + df)) + 1).astype(np.float32)
+        if n >= MAX_DF_MIN_POSTS:
+            idf[:TEXT_FEATURES][df[:TEXT_FEATURES] > MAX_DF * n] = 0
+
+        index = cls(idf, k, tag_weight)
+        index._grow(n)
+        index.size = n
+        index.post_ids[:n] = post_ids
+        index.rows = {int(post_id): row for row, post_id in enumerate(post_ids)}
+        index._set_matrix(index._vectors(rows, columns, counts, n))
+
+        for start in range(0, n, BUILD_BLOCK):
+            block = index._matrix[start:start + BUILD_BLOCK] @ index._postings
+            for i in range(block.shape[0]):
+                begin, end = block.indptr[i], block.indptr[i + 1]
+                index._set_neighbours(start + i, block.indices[begin:end], block.data[begin:end])
+        return index
+
+    def _vectors(self, rows, columns, counts, posts: int) -> sparse.csr_matrix:
+        """Post vectors from the arrays of _count"""
+        weights = (1 + np.log(counts)) * self.idf[columns]
+        is_tag = columns >= TEXT_FEATURES
+        words = _normalized(
+            rows[~is_tag], columns[~is_tag], weights[~is_tag], posts, np.sqrt(1 - self.tag_weight), TERMS_PER_POST
+        )
+        tags = _normalized(rows[is_tag], columns[is_tag], weights[is_tag], posts, np.sqrt(self.tag_weight))
+        return (words + tags).tocsr()
+
+    def _set_matrix(self, matrix: sparse.csr_matrix):
+        matrix.eliminate_zeros()
+        self._matrix = matrix
+        self._postings = matrix.T.tocsr()
+        self._postings.sort_indices()
+        self._recent = []
+
+    def _grow(self, size: int):
+        if size <= len(self.post_ids):
+            return
+        capacity = max(size, 2 * len(self.post_ids), 16)
+        extra = capacity - len(self.post_ids)
+        self.post_ids = np.concatenate([self.post_ids, np.zeros(extra, np.int64)])
+        self.neighbours = np.concatenate([self.neighbours, np.zeros((extra, self.k), np.int64)])
+        self.scores = np.concatenate([self.scores, np.zeros((extra, self.k), np.float32)])
+
+    def _set_neighbours(self, row: int, rows: np.ndarray, scores: np.ndarray):
+        """Keep the best `k` of the candidate rows as a row's neighbours"""
+        keep = (rows != row) & (scores > 0)
+        rows, scores = rows[keep], scores[keep]
+        if len(rows) > self.k:
+            best = np.argpartition(-scores, self.k)[:self.k]
+            rows, scores = rows[best], scores[best]
+        order = np.argsort(-scores, kind="stable")
+        self.neighbours[row] = 0
+        self.scores[row] = 0
+        self.neighbours[row, :len(rows)] = self.post_ids[rows[order]]
+        self.scores[row, :len(rows)] = scores[order]
+
+    def related(self, post_id: int) -> Optional[List[int]]:
+        """Ids of a post's neighbours, best first; None if the post isn't indexed"""
+        row = self.rows.get(post_id)
+        if row is None:
+            return None
+        return [int(neighbour) for neighbour in self.neighbours[row] if neighbour]
+
+    def add(self, post_id: int, title: str, excerpt: Optional[str], content: str, tags: List[str]):
+        """Index a post, or index it again after a change"""
+        self.remove(post_id)
+        _, rows, columns, counts = _count([(post_id, title, excerpt, content)], {post_id: tags})
+        vector = self._vectors(rows, columns, counts, 1)
+
+        # Similarity to every indexed post, through the posts sharing a feature
+        scores = vector @ self._postings
+        candidates, candidate_scores = scores.indices.astype(np.int64), scores.data
+        if self._recent:
+            recent = (sparse.vstack(self._recent) @ vector.T).toarray().ravel()
+            found = np.flatnonzero(recent)
+            candidates = np.concatenate([candidates, found + self._matrix.shape[0]])
+            candidate_scores = np.concatenate([candidate_scores, recent[found]])
+
+        row = self.size
+        self._grow(row + 1)
+        self.size += 1
+        self.post_ids[row] = post_id
+        self.rows[post_id] = row
+        self._recent.append(vector)
+        self._set_neighbours(row, candidates, candidate_scores)
+
+        # The post takes a place in the lists of the posts it is closer to than their last neighbour
+        closer = (candidate_scores > self.scores[candidates, -1]) & (candidate_scores > 0)
+        rows, row_scores = candidates[closer], candidate_scores[closer]
+        if len(rows):
+            neighbours = np.concatenate([self.neighbours[rows], np.full((len(rows), 1), post_id)], axis=1)
+            scores = np.concatenate([self.scores[rows], row_scores[:, None].astype(np.float32)], axis=1)
+            order = np.argsort(-scores, axis=1, kind="stable")[:, :self.k]
+            self.neighbours[rows] = np.take_along_axis(neighbours, order, axis=1)
+            self.scores[rows] = np.take_along_axis(scores, order, axis=1)
+
+        if len(self._recent) >= COMPACT_ROWS:
+            self._set_matrix(sparse.vstack([self._matrix] + self._recent, format="csr"))
+
+    def remove(self, post_id: int) -> bool:
+        """Take a post out of the index and out of other posts' neighbours"""
+        row = self.rows.pop(post_id, None)
+        if row is None:
+            return False
+
+        # Zero its vector, so it no longer matches anything
+        if row < self._matrix.shape[0]:
+            begin, end = self._matrix.indptr[row], self._matrix.indptr[row + 1]
+            for feature in self._matrix.indices[begin:end]:
+                first, last = self._postings.indptr[feature], self._postings.indptr[feature + 1]
+                position = first + np.searchsorted(self._postings.indices[first:last], row)
+                self._postings.data[position] = 0
+            self._matrix.data[begin:end] = 0
+        else:
+            self._recent[row - self._matrix.shape[0]].data[:] = 0
+        self.post_ids[row] = 0
+        self.neighbours[row] = 0
+        self.scores[row] = 0
+
+        # Close the gap it leaves in other lists
+        rows, positions = np.nonzero(self.neighbours[:self.size] == post_id)
+        if len(rows):
+            self.scores[rows, positions] = -1
+            rows = np.unique(rows)
+            order = np.argsort(-self.scores[rows], axis=1, kind="stable")
+            self.neighbours[rows] = np.take_along_axis(self.neighbours[rows], order, axis=1)
+            self.scores[rows] = np.take_along_axis(self.scores[rows], order, axis=1)
+            gaps = self.scores[:self.size] < 0
+            self.neighbours[:self.size][gaps] = 0
+            self.scores[:self.size][gaps] = 0
+        return True
+
+    def nbytes(self) -> int:
+        """Memory held by the arrays and matrices"""
+        matrices = [self._matrix, self._postings] + self._recent
+        return (
+            self.post_ids.nbytes + self.neighbours.nbytes + self.scores.nbytes + self.idf.nbytes
+            + sum(matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes for matrix in matrices)
+        )
+
+
+def _post_tags(db, condition) -> Dict[int, List[str]]:
+    tags = defaultdict(list)
+    for post_id, tag in db.execute(
+        select(BlogPostTag.post_id, Tag.name).join(Tag, Tag.id == BlogPostTag.tag_id)
+        .join(BlogPost, BlogPost.id == BlogPostTag.post_id).where(condition)
+    ):
+        tags[post_id].append(tag)
+    return tags
+
+
+POST_TEXT = (BlogPost.id, BlogPost.title, BlogPost.excerpt, BlogPost.content)
+
+
+class RelatedPosts:
+    """Related posts of every published post, from a RelatedPostsIndex
+
+    The index is built in the background at startup, and again every
+    `rebuild_interval` seconds to bring the term weights up to date. In
+    between, posts marked as changed are indexed again at most
+    `update_interval` seconds later, and posts changed through other worker
+    processes are picked up every `sync_interval` seconds by their
+    timestamps. Until the first build is done no post has related posts.
+    """
+
+    def __init__(self, session_factory=SessionLocal,
+                 update_interval: float = settings.RELATED_POSTS_UPDATE_INTERVAL,
+                 sync_interval: float = settings.RELATED_POSTS_SYNC_INTERVAL,
+                 rebuild_interval: float = settings.RELATED_POSTS_REBUILD_INTERVAL):
+        self.session_factory = session_factory
+        self.update_interval = update_interval
+        self.sync_interval = sync_interval
+        self.rebuild_interval = rebuild_interval
+
+        self._index: Optional[RelatedPostsIndex] = None
+        self._changed: Set[int] = set()
+        self._rebuild = False
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        # Posts changed since then are picked up by the next sync
+        self._synced_at: Optional[datetime] = None
+
+        # Counters
+        self.builds = 0
+        self.last_build_seconds: Optional[float] = None
+        self.last_build_at: Optional[float] = None
+        self.updated_posts = 0
+        self.failed_updates = 0
+
+    def mark_changed(self, *post_ids: int):
+        """Index posts again after they were created, edited, (un)published or deleted"""
+        with self._lock:
+            self._changed.update(post_ids)
+
+    def rebuild_soon(self):
+        """Rebuild the index on the next update, e.g. after a bulk import"""
+        self._rebuild = True
+
+    def related(self, post_id: int) -> Optional[List[int]]:
+        """Ids of a published post's related posts, best first; None if it isn't indexed"""
+        with self._lock:
+            return None if self._index is None else self._index.related(post_id)
+
+    def build(self) -> RelatedPostsIndex:
+        """Build the index from the published posts and start serving from it"""
+        started = time.perf_counter()
+        synced_at = datetime.utcnow()
+        db = self.session_factory()
+        try:
+            tags = _post_tags(db, BlogPost.published == True)
+            result = db.execute(
+                select(*POST_TEXT).where(BlogPost.published == True).order_by(BlogPost.id)
+                .execution_options(yield_per=2000)
+            )
+            index = RelatedPostsIndex.build((tuple(post) for post in result), tags)
+        finally:
+            db.close()
+
+        with self._lock:
+            self._index = index
+            self._synced_at = synced_at
+        self.builds += 1
+        self.last_build_seconds = time.perf_counter() - started
+        self.last_build_at = time.time()
+        return index
+
+    def update(self, since: Optional[datetime] = None) -> int:
+        """Index the posts marked as changed, and those changed after `since`; returns how many"""
+        with self._lock:
+            changed, self._changed = self._changed, set()
+            index = self._index
+        if index is None or not (changed or since):
+            return 0
+
+        condition = BlogPost.id.in_(changed) if changed else None
+        if since is not None:
+            recent = or_(BlogPost.created_at > since, BlogPost.updated_at > since)
+            condition = recent if condition is None else or_(condition, recent)
+        db = self.session_factory()
+        try:
+            posts = db.execute(select(*POST_TEXT, BlogPost.published).where(condition)).all()
+            tags = _post_tags(db, condition)
+        except Exception:
+            with self._lock:
+                self._changed |= changed
+            self.failed_updates += 1
+            raise
+        finally:
+            db.close()
+
+        with self._lock:
+            # A build may have replaced the index meanwhile, it has read these posts too
+            for post in posts:
+                if post.published:
+                    index.add(post.id, post.title, post.excerpt, post.content, tags.get(post.id, []))
+                else:
+                    index.remove(post.id)
+            deleted = changed - {post.id for post in posts}
+            for post_id in deleted:
+                index.remove(post_id)
+        self.updated_posts += len(posts) + len(deleted)
+        return len(posts) + len(deleted)
+
+    def _sync_since(self) -> Optional[datetime]:
+        """Start of the window the next sync reads, overlapping the last one so no commit is missed"""
+        if self._synced_at is None:
+            return None
+        since = self._synced_at - timedelta(seconds=self.sync_interval)
+        self._synced_at = datetime.utcnow()
+        return since
+
+    async def _run(self):
+        last_sync = last_build = time.monotonic()
+        try:
+            await run_in_threadpool(self.build)
+        except Exception:
+            logger.exception("Failed to build the related posts index")
+        await response_cache.invalidate(RELATED_SCOPE)
+
+        while True:
+            await asyncio.sleep(self.update_interval)
+            now = time.monotonic()
+            try:
+                if self._rebuild or self.rebuild_interval and now - last_build >= self.rebuild_interval:
+                    self._rebuild = False
+                    last_build = last_sync = now
+                    await run_in_threadpool(self.build)
+                    updated = 1
+                elif now - last_sync >= self.sync_interval:
+                    last_sync = now
+                    updated = await run_in_threadpool(self.update, self._sync_since())
+                else:
+                    updated = await run_in_threadpool(self.update)
+            except Exception:
+                logger.exception("Failed to update the related posts index")
+                continue
+            if updated:
+                await response_cache.invalidate(RELATED_SCOPE)
+
+    def start(self):
+        """Build the index and keep it up to date in the background"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop updating the index"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        """Counters describing the index"""
+        with self._lock:
+            index = self._index
+            pending = len(self._changed)
+            posts = 0 if index is None else len(index.rows)
+            nbytes = 0 if index is None else index.nbytes()
+        return {
+            "ready": index is not None,
+            "posts": posts,
+            "k": None if index is None else index.k,
+            "bytes": nbytes,
+            "pending_posts": pending,
+            "updated_posts": self.updated_posts,
+            "failed_updates": self.failed_updates,
+            "builds": self.builds,
+            "last_build_seconds": self.last_build_seconds,
+            "last_build_at": self.last_build_at
+        }
+
+
+related_posts = RelatedPosts()
@@ -0,0 +1,241 @@
+import html
+from sqlalchemy import or_, text
+from sqlalchemy.orm import Session
+from app.models.blog_post import BlogPost
+from typing import Dict, List, Optional, Tuple
+
+# A search hit is (post id, score). Lower scores rank first, so every backend
+# can page through hits in (score, id) order.
+Hit = Tuple[int, float]
+
+# Columns indexed for search, English first and then the translations
+SEARCH_COLUMNS = (
+    "title", "excerpt", "content",
+    "title_bn", "excerpt_bn", "content_bn",
+    "title_hi", "excerpt_hi", "content_hi"
+)
+
+# Snippets are cut from the raw post text, which may hold markup. The engines
+# mark matches with these private-use characters instead of tags, so the
+# fragment can be escaped before the marks become <mark> elements.
+MARK_START = "\ue000"
+MARK_END = "\ue001"
+
+
+def _snippet_html(fragment: Optional[str]) -> Optional[str]:
+    """Escape a fragment marked with MARK_START/MARK_END and wrap the matches in <mark>"""
+    if fragment is None:
+        return None
+    return html.escape(fragment).replace(MARK_START, "<mark>").replace(MARK_END, "</mark>")
+
+
+class LikeSearchBackend:
+    """Fallback for databases without a full-text engine: ILIKE scanning"""
+
+    def install(self, connection):
+        pass
+
+    def _query(self, db: Session, keyword: str):
+        pattern = f"%{keyword}%"
+        return db.query(BlogPost.id).filter(
+            BlogPost.published == True,
+            or_(
+                BlogPost.title.ilike(pattern),
+                BlogPost.content.ilike(pattern),
+                BlogPost.excerpt.ilike(pattern)
+            )
+        )
+
+    def count(self, db: Session, keyword: str) -> int:
+        return self._query(db, keyword).count()
+
+    def search(self, db: Session, keyword: str, limit: int, offset: int = 0,
+               after: Optional[Hit] = None) -> List[Hit]:
+        # No ranking here: newest posts (highest ids) first
+        query = self._query(db, keyword)
+        if after:
+            query = query.filter(BlogPost.id < after[1])
+        rows = query.order_by(BlogPost.id.desc()).offset(offset).limit(limit).all()
+        return [(row[0], 0.0) for row in rows]
+
+    def snippets(self, db: Session, keyword: str, post_ids: List[int]) -> Dict[int, str]:
+        return {}
+
+
+class PostgresSearchBackend:
+    """Weighted tsvector generated column with a GIN index
+
+    English columns use the english configuration; Bengali and Hindi have no
+    stemmer in Postgres and go through the simple configuration.
+    """
+
+    VECTOR = """
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(excerpt, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(content, '')), 'C') ||
+        setweight(to_tsvector('simple', coalesce(title_bn, '') || ' ' || coalesce(title_hi, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(excerpt_bn, '') || ' ' || coalesce(excerpt_hi, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(content_bn, '') || ' ' || coalesce(content_hi, '')), 'C')
+    """
+
+    QUERY = "(websearch_to_tsquery('english', :keyword) || websearch_to_tsquery('simple', :keyword))"
+
+    def install(self, connection):
+        # A stored generated column keeps itself up to date on insert/update
+        connection.execute(text(
+            "ALTER TABLE blog_posts ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            f"GENERATED ALWAYS AS ({self.VECTOR}) STORED"
+        ))
+        connection.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_blog_posts_search_vector "
+            "ON blog_posts USING GIN (search_vector)"
+        ))
+
+    def count(self, db: Session, keyword: str) -> int:
+        return db.execute(text(
+            f"SELECT count(*) FROM blog_posts, {self.QUERY} q "
+            "WHERE published AND search_vector @@ q"
+        ), {"keyword": keyword}).scalar()
+
+    def search(self, db: Session, keyword: str, limit: int, offset: int = 0,
+               after: Optional[Hit] = None) -> List[Hit]:
+        sql = (
+            "SELECT id, score FROM ("
+            "  SELECT id, -ts_rank_cd(search_vector, q)::float8 AS score"
+            f" FROM blog_posts, {self.QUERY} q"
+            "  WHERE published AND search_vector @@ q"
+            ") hits"
+        )
+        params = {"keyword": keyword, "limit": limit, "offset": offset}
+        if after:
+            sql += " WHERE (score, id) > (:after_score, :after_id)"
+            params.update(after_score=after[0], after_id=after[1])
+        sql += " ORDER BY score, id LIMIT :limit OFFSET :offset"
+        return [(row[0], row[1]) for row in db.execute(text(sql), params)]
+
+    def snippets(self, db: Session, keyword: str, post_ids: List[int]) -> Dict[int, str]:
+        if not post_ids:
+            return {}
+        rows = db.execute(text(
+            "SELECT id, ts_headline('english', "
+            "concat_ws(' ', excerpt, content, excerpt_bn, content_bn, excerpt_hi, content_hi), q, :options) "
+            f"FROM blog_posts, {self.QUERY} q WHERE id = ANY(:ids)"
+        ), {
+            "keyword": keyword,
+            "ids": list(post_ids),
+            "options": f"StartSel={MARK_START}, StopSel={MARK_END}, MaxFragments=2, MaxWords=30, MinWords=10"
+        })
+        return {row[0]: _snippet_html(row[1]) for row in rows}
+
+
+class SQLiteSearchBackend:
+    """External-content FTS5 table kept in sync by triggers"""
+
+    # bm25 weights, in SEARCH_COLUMNS order
+    WEIGHTS = "10.0, 4.0, 1.0, 10.0, 4.0, 1.0, 10.0, 4.0, 1.0"
+
+    def install(self, connection):
+        exists = connection.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'blog_posts_fts'"
+        )).first()
+        # A search table indexing other columns is dropped and built again
+        if exists and tuple(
+            row[1] for row in connection.execute(text("PRAGMA table_info(blog_posts_fts)"))
+        ) != SEARCH_COLUMNS:
+            for trigger in ("insert", "delete", "update"):
+                connection.execute(text(f"DROP TRIGGER IF EXISTS blog_posts_fts_{trigger}"))
+            connection.execute(text("DROP TABLE blog_posts_fts"))
+            exists = None
+
+        columns = ", ".join(SEARCH_COLUMNS)
+        new_values = ", ".join(f"new.{column}" for column in SEARCH_COLUMNS)
+        old_values = ", ".join(f"old.{column}" for column in SEARCH_COLUMNS)
+
+        connection.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS blog_posts_fts USING fts5({columns}, "
+            "content='blog_posts', content_rowid='id', "
+            # Count combining marks as word characters, otherwise Bengali and
+            # Hindi words are split at every vowel sign
+            "tokenize=\"unicode61 remove_diacritics 2 categories 'L* N* Co M*'\")"
+        ))
+        connection.execute(text(
+            "CREATE TRIGGER IF NOT EXISTS blog_posts_fts_insert AFTER INSERT ON blog_posts BEGIN "
+            f"INSERT INTO blog_posts_fts(rowid, {columns}) VALUES (new.id, {new_values}); END"
+        ))
+        connection.execute(text(
+            "CREATE TRIGGER IF NOT EXISTS blog_posts_fts_delete AFTER DELETE ON blog_posts BEGIN "
+            f"INSERT INTO blog_posts_fts(blog_posts_fts, rowid, {columns}) "
+            f"VALUES ('delete', old.id, {old_values}); END"
+        ))
+        # Only re-index when an indexed column changes, not on view count updates
+        connection.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS blog_posts_fts_update AFTER UPDATE OF {columns} ON blog_posts BEGIN "
+            f"INSERT INTO blog_posts_fts(blog_posts_fts, rowid, {columns}) "
+            f"VALUES ('delete', old.id, {old_values}); "
+            f"INSERT INTO blog_posts_fts(rowid, {columns}) VALUES (new.id, {new_values}); END"
+        ))
+
+        # Index the posts that existed before the search table did
+        if not exists:
+            connection.execute(text("INSERT INTO blog_posts_fts(blog_posts_fts) VALUES ('rebuild')"))
+
+    def _match(self, keyword: str) -> str:
+        """Quote every word so user input can't inject FTS5 query syntax"""
+        return " ".join('"' + word.replace('"', '""') + '"' for word in keyword.split())
+
+    def count(self, db: Session, keyword: str) -> int:
+        match = self._match(keyword)
+        if not match:
+            return 0
+        return db.execute(text(
+            "SELECT count(*) FROM blog_posts_fts JOIN blog_posts ON blog_posts.id = blog_posts_fts.rowid "
+            "WHERE blog_posts_fts MATCH :match AND blog_posts.published = 1"
+        ), {"match": match}).scalar()
+
+    def search(self, db: Session, keyword: str, limit: int, offset: int = 0,
+               after: Optional[Hit] = None) -> List[Hit]:
+        match = self._match(keyword)
+        if not match:
+            return []
+
+        sql = (
+            "SELECT id, score FROM ("
+            f"  SELECT blog_posts_fts.rowid AS id, bm25(blog_posts_fts, {self.WEIGHTS}) AS score"
+            "  FROM blog_posts_fts JOIN blog_posts ON blog_posts.id = blog_posts_fts.rowid"
+            "  WHERE blog_posts_fts MATCH :match AND blog_posts.published = 1"
+            ") hits"
+        )
+        params = {"match": match, "limit": limit, "offset": offset}
+        if after:
+            sql += " WHERE (score, id) > (:after_score, :after_id)"
+            params.update(after_score=after[0], after_id=after[1])
+        sql += " ORDER BY score, id LIMIT :limit OFFSET :offset"
+        return [(row[0], row[1]) for row in db.execute(text(sql), params)]
+
+    def snippets(self, db: Session, keyword: str, post_ids: List[int]) -> Dict[int, str]:
+        match = self._match(keyword)
+        if not post_ids or not match:
+            return {}
+        placeholders = ", ".join(f":id{i}" for i in range(len(post_ids)))
+        params = {f"id{i}": post_id for i, post_id in enumerate(post_ids)}
+        params.update(match=match, start=MARK_START, end=MARK_END)
+        rows = db.execute(text(
+            "SELECT rowid, snippet(blog_posts_fts, -1, :start, :end, '...', 24) "
+            f"FROM blog_posts_fts WHERE blog_posts_fts MATCH :match AND rowid IN ({placeholders})"
+        ), params)
+        return {row[0]: _snippet_html(row[1]) for row in rows}
+
+
+def get_search_backend(bind):
+    """Pick the search backend for the database dialect"""
+    if bind.dialect.name == "postgresql":
+        return PostgresSearchBackend()
+    if bind.dialect.name == "sqlite":
+        return SQLiteSearchBackend()
+    return LikeSearchBackend()
+
+
+def init_search_index(engine):
+    """Create the full-text index if it does not exist yet"""
+    with engine.begin() as connection:
+        get_search_backend(engine).install(connection)
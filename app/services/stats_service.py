@@ -0,0 +1,203 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from sqlalchemy import bindparam, case, func, insert
+from sqlalchemy.orm import Session
+from app.core.database import insert_missing
+from app.models.blog_post import BlogPost, BlogPostTag
+from app.models.blog_stat import BlogStat
+from app.models.tag import Tag
+
+ALL = ("all", "")
+
+
+class PostFootprint(NamedTuple):
+    """What a single post contributes to the counters"""
+    author: Optional[str]
+    tags: Tuple[str, ...]
+    published: bool
+    views: int
+
+    @classmethod
+    def of(cls, post: BlogPost, tags: Optional[Iterable[str]] = None) -> "PostFootprint":
+        if tags is None:
+            tags = [post_tag.tag for post_tag in post.tags]
+        return cls(post.author, tuple(sorted(set(tags))), bool(post.published), post.view_count or 0)
+
+    def keys(self) -> List[Tuple[str, str]]:
+        keys = [ALL] + [("tag", tag) for tag in self.tags]
+        if self.author:
+            keys.append(("author", self.author))
+        return keys
+
+
+class StatsService:
+    """Maintains the blog_stats counters and reads statistics from them"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _apply(self, deltas: Dict[Tuple[str, str], List[int]]):
+        """Add [posts, published, views] deltas to the counter rows"""
+        deltas = {key: delta for key, delta in deltas.items() if any(delta)}
+        if not deltas:
+            return
+
+        # Make sure every row exists, then increment them all in one batch
+        insert_missing(self.db, BlogStat, [
+            {"scope": scope, "name": name, "total_posts": 0, "published_posts": 0, "total_views": 0}
+            for scope, name in deltas
+        ], ["scope", "name"])
+
+        table = BlogStat.__table__
+        self.db.execute(
+            table.update()
+            .where(table.c.scope == bindparam("b_scope"), table.c.name == bindparam("b_name"))
+            .values(
+                total_posts=table.c.total_posts + bindparam("b_posts"),
+                published_posts=table.c.published_posts + bindparam("b_published"),
+                total_views=table.c.total_views + bindparam("b_views")
+            ),
+            [
+                {"b_scope": scope, "b_name": name, "b_posts": posts, "b_published": published, "b_views": views}
+                for (scope, name), (posts, published, views) in deltas.items()
+            ]
+        )
+
+    def record_change(self, old: Optional[PostFootprint], new: Optional[PostFootprint]):
+        """Move a post's contribution from its old footprint to its new one
+
+        Pass old=None for a created post and new=None for a deleted one. Runs
+        in the caller's transaction.
+        """
+        self.record_changes([(old, new)])
+
+    def record_changes(self, changes: Iterable[Tuple[Optional[PostFootprint], Optional[PostFootprint]]]):
+        """record_change for many posts, in one batch of counter updates"""
+        deltas = defaultdict(lambda: [0, 0, 0])
+        for old, new in changes:
+            for footprint, sign in ((old, -1), (new, 1)):
+                if footprint is None:
+                    continue
+                for key in footprint.keys():
+                    delta = deltas[key]
+                    delta[0] += sign
+                    delta[1] += sign * int(footprint.published)
+                    delta[2] += sign * footprint.views
+        self._apply(deltas)
+
+    def record_views(self, views: Dict[int, int]):
+        """Add buffered views of many posts to the counters"""
+        if not views:
+            return
+
+        post_ids = list(views)
+        authors = dict(self.db.query(BlogPost.id, BlogPost.author).filter(BlogPost.id.in_(post_ids)))
+        tags = defaultdict(set)
+        for post_id, tag in self.db.query(BlogPostTag.post_id, Tag.name).join(Tag, Tag.id == BlogPostTag.tag_id).filter(
+            BlogPostTag.post_id.in_(post_ids)
+        ):
+            tags[post_id].add(tag)
+
+        deltas = defaultdict(lambda: [0, 0, 0])
+        for post_id, count in views.items():
+            # Views of posts deleted in the meantime are dropped
+            if post_id not in authors:
+                continue
+            keys = [ALL] + [("tag", tag) for tag in tags[post_id]]
+            if authors[post_id]:
+                keys.append(("author", authors[post_id]))
+            for key in keys:
+                deltas[key][2] += count
+        self._apply(deltas)
+
+    def get_statistics(self) -> dict:
+        """Blog wide statistics, a single row lookup"""
+        row = self.db.query(BlogStat).filter(BlogStat.scope == ALL[0], BlogStat.name == ALL[1]).first()
+        total_posts = row.total_posts if row else 0
+        published_posts = row.published_posts if row else 0
+
+        return {
+            "total_posts": total_posts,
+            "published_posts": published_posts,
+            "draft_posts": total_posts - published_posts,
+            "total_views": row.total_views if row else 0
+        }
+
+    def get_breakdown(self, scope: str, limit: int) -> List[dict]:
+        """Per-tag or per-author statistics, most published posts first"""
+        rows = self.db.query(BlogStat).filter(
+            BlogStat.scope == scope,
+            BlogStat.total_posts > 0
+        ).order_by(BlogStat.published_posts.desc(), BlogStat.name).limit(limit).all()
+
+        return [
+            {
+                scope: row.name,
+                "total_posts": row.total_posts,
+                "published_posts": row.published_posts,
+                "draft_posts": row.total_posts - row.published_posts,
+                "total_views": row.total_views
+            }
+            for row in rows
+        ]
+
+    def reconcile(self) -> dict:
+        """Recompute every counter from the posts table, fixing any drift"""
+        published = func.sum(case((BlogPost.published == True, 1), else_=0))
+        views = func.coalesce(func.sum(BlogPost.view_count), 0)
+
+        rows = []
+        for posts, published_posts, total_views in self.db.query(func.count(BlogPost.id), published, views):
+            rows.append(("all", "", posts, published_posts or 0, total_views))
+        for author, posts, published_posts, total_views in self.db.query(
+            BlogPost.author, func.count(BlogPost.id), published, views
+        ).filter(BlogPost.author.isnot(None), BlogPost.author != "").group_by(BlogPost.author):
+            rows.append(("author", author, posts, published_posts, total_views))
+
+        # (tag, post) is unique, so a post counts once per tag
+        for tag, posts, published_posts, total_views in self.db.query(
+            Tag.name, func.count(BlogPost.id), published, views
+        ).join(BlogPostTag, BlogPostTag.tag_id == Tag.id).join(
+            BlogPost, BlogPost.id == BlogPostTag.post_id
+        ).group_by(Tag.name):
+            rows.append(("tag", tag, posts, published_posts, total_views))
+
+        self.db.query(BlogStat).delete()
+        self.db.execute(insert(BlogStat), [
+            {
+                "scope": scope,
+                "name": name,
+                "total_posts": posts,
+                "published_posts": published_posts,
+                "total_views": total_views
+            }
+            for scope, name, posts, published_posts, total_views in rows
+        ])
+        self.db.commit()
+        return self.get_statistics()
+
+
+def migrate_statistics(engine):
+    """Create the blog_stats table in an existing database"""
+    BlogStat.__table__.create(bind=engine, checkfirst=True)
+
+
+def ensure_statistics(session_factory):
+    """Build the counters from scratch if they have never been computed"""
+    db = session_factory()
+    try:
+        if not db.query(BlogStat.id).filter(BlogStat.scope == ALL[0]).first():
+            StatsService(db).reconcile()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    # python -m app.services.stats_service  recomputes every counter
+    from app.core.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        print(StatsService(db).reconcile())
+    finally:
+        db.close()
@@ -0,0 +1,90 @@
+from typing import Dict, Iterable, List
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import Session
+from app.core.database import insert_missing
+from app.models.blog_post import BlogPostTag
+from app.models.blog_stat import BlogStat
+from app.models.tag import Tag
+
+
+class TagService:
+    """Looks up and creates tags, and lists them with their post counts"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def ensure(self, names: Iterable[str]) -> Dict[str, Tag]:
+        """The tags with the given names, created if they don't exist yet"""
+        names = list(dict.fromkeys(names))
+        if not names:
+            return {}
+
+        tags = {tag.name: tag for tag in self.db.query(Tag).filter(Tag.name.in_(names))}
+        missing = [name for name in names if name not in tags]
+        if missing:
+            insert_missing(self.db, Tag, [{"name": name} for name in missing], ["name"])
+            tags.update((tag.name, tag) for tag in self.db.query(Tag).filter(Tag.name.in_(missing)))
+        return tags
+
+    def ids(self, names: Iterable[str]) -> Dict[str, int]:
+        """Tag ids by name, creating missing tags"""
+        return {name: tag.id for name, tag in self.ensure(names).items()}
+
+    def _counted(self):
+        return self.db.query(BlogStat.name, BlogStat.published_posts).filter(
+            BlogStat.scope == "tag",
+            BlogStat.published_posts > 0
+        )
+
+    def list_tags(self, limit: int) -> List[dict]:
+        """Tags with published posts, by name"""
+        rows = self._counted().order_by(BlogStat.name).limit(limit)
+        return [{"name": name, "post_count": count} for name, count in rows]
+
+    def popular(self, limit: int) -> List[dict]:
+        """Tags with the most published posts"""
+        rows = self._counted().order_by(BlogStat.published_posts.desc(), BlogStat.name).limit(limit)
+        return [{"name": name, "post_count": count} for name, count in rows]
+
+
+def migrate_tag_links(engine):
+    """Move blog_post_tags from one tag name per row to tag ids
+
+    Databases created before the tags table have a `tag` string column;
+    this fills the tags table from it, links rows by id, removes repeated
+    links and adds the indexes. Does nothing once migrated.
+    """
+    inspector = inspect(engine)
+    if not inspector.has_table("blog_post_tags"):
+        return
+    columns = {column["name"] for column in inspector.get_columns("blog_post_tags")}
+    if "tag" not in columns:
+        return
+
+    with engine.begin() as connection:
+        # Those databases have no tags table yet either
+        Tag.__table__.create(connection, checkfirst=True)
+        connection.execute(text(
+            "INSERT INTO tags (name) SELECT DISTINCT tag FROM blog_post_tags "
+            "WHERE tag NOT IN (SELECT name FROM tags)"
+        ))
+        if "tag_id" not in columns:
+            connection.execute(text(
+                "ALTER TABLE blog_post_tags ADD COLUMN tag_id BIGINT REFERENCES tags(id) ON DELETE CASCADE"
+            ))
+        connection.execute(text(
+            "UPDATE blog_post_tags SET tag_id = (SELECT id FROM tags WHERE tags.name = blog_post_tags.tag)"
+        ))
+        connection.execute(text(
+            "DELETE FROM blog_post_tags WHERE id NOT IN "
+            "(SELECT min(id) FROM blog_post_tags GROUP BY post_id, tag_id)"
+        ))
+        connection.execute(text("ALTER TABLE blog_post_tags DROP COLUMN tag"))
+        if engine.dialect.name == "postgresql":
+            connection.execute(text("ALTER TABLE blog_post_tags ALTER COLUMN tag_id SET NOT NULL"))
+
+        connection.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_blog_post_tags_tag_post ON blog_post_tags (tag_id, post_id)"
+        ))
+        for index in BlogPostTag.__table__.indexes:
+            index.create(connection, checkfirst=True)
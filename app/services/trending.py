@@ -0,0 +1,205 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from sqlalchemy import bindparam, case, func, select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.core.cache import TRENDING_SCOPE, response_cache
+from app.core.config import settings
+from app.core.database import SessionLocal, insert_missing
+from app.models.blog_post import BlogPost
+from app.models.blog_stat import PostViewBucket
+
+logger = logging.getLogger(__name__)
+
+
+class Window(NamedTuple):
+    """A trending window: the hours it covers, and after how many hours a view counts half"""
+    hours: int
+    half_life: float
+
+
+WINDOWS = {
+    "24h": Window(24, 6),
+    "7d": Window(24 * 7, 36),
+}
+# Buckets older than every window are deleted
+KEEP_HOURS = max(window.hours for window in WINDOWS.values())
+
+
+def current_hour() -> int:
+    """Hours since the epoch, the bucket a view made now is counted in"""
+    return int(time.time() // 3600)
+
+
+class TrendingService:
+    """Reads and writes the hourly view buckets"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def record_views(self, views: Dict[Tuple[int, int], int]):
+        """Add views, keyed by (post id, hour), to their buckets
+
+        Runs in the caller's transaction.
+        """
+        views = {key: count for key, count in views.items() if count}
+        if not views:
+            return
+
+        insert_missing(self.db, PostViewBucket, [
+            {"post_id": post_id, "hour": hour, "views": 0} for post_id, hour in views
+        ], ["post_id", "hour"])
+
+        table = PostViewBucket.__table__
+        self.db.execute(
+            table.update()
+            .where(table.c.post_id == bindparam("b_post_id"), table.c.hour == bindparam("b_hour"))
+            .values(views=table.c.views + bindparam("b_views")),
+            [
+                {"b_post_id": post_id, "b_hour": hour, "b_views": count}
+                for (post_id, hour), count in views.items()
+            ]
+        )
+
+    def rank(self, window: Window, hour: int, limit: int) -> List[Tuple[int, float]]:
+        """The published posts with the highest decayed view score in `window`, ending at `hour`
+
+        A view counts 0.5 ** (age in hours / half life), so recent views
+        outweigh older ones. Returns (post id, score) pairs, best first.
+        """
+        table = PostViewBucket.__table__
+        first_hour = hour - window.hours + 1
+        weight = case(
+            {bucket: 0.5 ** ((hour - bucket) / window.half_life) for bucket in range(first_hour, hour + 1)},
+            value=table.c.hour,
+            else_=0
+        )
+        score = func.sum(table.c.views * weight).label("score")
+        rows = self.db.execute(
+            select(table.c.post_id, score)
+            .join(BlogPost, BlogPost.id == table.c.post_id)
+            .where(table.c.hour >= first_hour, table.c.hour <= hour, BlogPost.published == True)
+            .group_by(table.c.post_id)
+            .order_by(score.desc(), table.c.post_id.desc())
+            .limit(limit)
+        )
+        return [(post_id, float(score)) for post_id, score in rows]
+
+    def prune(self, hour: int) -> int:
+        """Delete the buckets no window ending at `hour` covers, returns how many"""
+        deleted = self.db.query(PostViewBucket).filter(
+            PostViewBucket.hour <= hour - KEEP_HOURS
+        ).delete(synchronize_session=False)
+        self.db.commit()
+        return deleted
+
+
+class TrendingPosts:
+    """Precomputed ranking of the trending posts of every window
+
+    Rankings are computed from the view buckets in the background every
+    `refresh_interval` seconds and kept in memory, so serving one never
+    sorts the posts. Views reach the buckets through the view counter's
+    flush, so a ranking trails the views by up to both intervals.
+    """
+
+    def __init__(self, session_factory=SessionLocal,
+                 refresh_interval: float = settings.TRENDING_REFRESH_INTERVAL,
+                 size: int = settings.TRENDING_MAX_POSTS):
+        self.session_factory = session_factory
+        self.refresh_interval = refresh_interval
+        self.size = size
+
+        self._rankings: Dict[str, List[Tuple[int, float]]] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._pruned_hour: Optional[int] = None
+
+        # Counters
+        self.refreshes = 0
+        self.failed_refreshes = 0
+        self.pruned_buckets = 0
+        self.last_refresh_seconds: Optional[float] = None
+        self.last_refresh_at: Optional[float] = None
+
+    def trending(self, window: str) -> Optional[List[Tuple[int, float]]]:
+        """(post id, score) of a window's trending posts, best first; None before the first refresh"""
+        with self._lock:
+            return self._rankings.get(window)
+
+    def refresh(self) -> bool:
+        """Rank every window again, returns whether any ranking changed"""
+        started = time.perf_counter()
+        hour = current_hour()
+        db = self.session_factory()
+        try:
+            service = TrendingService(db)
+            rankings = {name: service.rank(window, hour, self.size) for name, window in WINDOWS.items()}
+            if self._pruned_hour != hour:
+                self.pruned_buckets += service.prune(hour)
+                self._pruned_hour = hour
+        except Exception:
+            self.failed_refreshes += 1
+            raise
+        finally:
+            db.close()
+
+        with self._lock:
+            changed = rankings != self._rankings
+            self._rankings = rankings
+        self.refreshes += 1
+        self.last_refresh_seconds = time.perf_counter() - started
+        self.last_refresh_at = time.time()
+        return changed
+
+    async def _run(self):
+        while True:
+            try:
+                changed = await run_in_threadpool(self.refresh)
+            except Exception:
+                logger.exception("Failed to refresh the trending posts")
+                changed = False
+            if changed:
+                await response_cache.invalidate(TRENDING_SCOPE)
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self):
+        """Rank the trending posts now and again every refresh interval"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop refreshing the rankings"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        """Counters describing the rankings"""
+        with self._lock:
+            posts = {name: len(ranking) for name, ranking in self._rankings.items()}
+        return {
+            "ready": bool(posts),
+            "posts": posts,
+            "refresh_interval": self.refresh_interval,
+            "refreshes": self.refreshes,
+            "failed_refreshes": self.failed_refreshes,
+            "pruned_buckets": self.pruned_buckets,
+            "last_refresh_seconds": self.last_refresh_seconds,
+            "last_refresh_at": self.last_refresh_at
+        }
+
+
+def migrate_view_buckets(engine):
+    """Create the post_view_buckets table in an existing database"""
+    PostViewBucket.__table__.create(bind=engine, checkfirst=True)
+
+
+trending_posts = TrendingPosts()
@@ -0,0 +1,50 @@
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+from app.core.database import insert_missing
+from app.models.upload import UploadedFile
+
+
+class UploadService:
+    """Counts the uploads sharing each content-addressed file"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    async def add(self, filename: str) -> int:
+        """Count one more upload of a file, returns how many there are now"""
+        insert_missing(self.db, UploadedFile, [{"filename": filename, "references": 0}], ["filename"])
+        self.db.execute(
+            update(UploadedFile)
+            .where(UploadedFile.filename == filename)
+            .values(references=UploadedFile.references + 1)
+        )
+        references = self.db.execute(
+            select(UploadedFile.references).where(UploadedFile.filename == filename)
+        ).scalar_one()
+        self.db.commit()
+        return references
+
+    async def release(self, filename: str) -> bool:
+        """Count one upload of a file less, returns whether none is left and the file can go
+
+        Files stored before uploads were counted have no row and count as one
+        upload. Runs in the caller's transaction: remove the file before
+        committing, so an upload of the same content made meanwhile waits
+        and then stores the file again.
+        """
+        self.db.execute(
+            update(UploadedFile)
+            .where(UploadedFile.filename == filename, UploadedFile.references > 0)
+            .values(references=UploadedFile.references - 1)
+        )
+        self.db.execute(
+            delete(UploadedFile).where(UploadedFile.filename == filename, UploadedFile.references <= 0)
+        )
+        return self.db.execute(
+            select(UploadedFile.id).where(UploadedFile.filename == filename)
+        ).first() is None
+
+
+def migrate_uploads(engine):
+    """Create the uploaded_files table in an existing database"""
+    UploadedFile.__table__.create(bind=engine, checkfirst=True)
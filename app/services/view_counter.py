@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+from sqlalchemy import bindparam, func
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.blog_post import BlogPost
+from app.services.stats_service import StatsService
+from app.services.trending import TrendingService, current_hour
+
+logger = logging.getLogger(__name__)
+
+# Hours of views the buffer keeps apart; a flush normally leaves only the current one
+RING_HOURS = 24
+
+
+class ViewCounter:
+    """Write-behind buffer for post view counts
+    
+    Views are summed per post in memory and written periodically as one
+    batched `UPDATE ... SET view_count = view_count + n` statement, instead of
+    a read-modify-write transaction per page view.
+    
+    The sums are kept per hour, in a ring of RING_HOURS slots indexed by
+    the hour, and the same flush adds them to the hourly view buckets the
+    trending posts are ranked from.
+    """
+    
+    def __init__(self, session_factory=SessionLocal,
+                 flush_interval: float = settings.VIEW_COUNT_FLUSH_INTERVAL,
+                 max_pending: int = settings.VIEW_COUNT_MAX_PENDING):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        
+        self._hours: List[Optional[int]] = [None] * RING_HOURS
+        self._ring: List[Dict[int, int]] = [defaultdict(int) for _ in range(RING_HOURS)]
+        self._pending_views = 0
+        self._lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        
+        # Counters
+        self.flushed_views = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.last_flush_at: Optional[float] = None
+    
+    def add(self, post_id: int, views: int = 1, hour: Optional[int] = None):
+        """Record views of a post, made in `hour` (hours since the epoch) or now"""
+        if hour is None:
+            hour = current_hour()
+        slot = hour % RING_HOURS
+        with self._lock:
+            if not self._ring[slot] or self._hours[slot] < hour:
+                # Views still here from RING_HOURS ago, after a day of failed
+                # flushes, move to the newer hour so view_count stays right
+                self._hours[slot] = hour
+            self._ring[slot][post_id] += views
+            self._pending_views += views
+            full = self._pending_views >= self.max_pending
+        
+        # Don't wait for the interval when the buffer is full
+        if full and self._wakeup is not None:
+            self._wakeup.set()
+    
+    def pending(self, post_id: int) -> int:
+        """Views of a post that have not been written yet"""
+        with self._lock:
+            return sum(views.get(post_id, 0) for views in self._ring)
+    
+    def flush(self) -> int:
+        """Write all pending views to the database, returns the number written"""
+        with self._lock:
+            buckets = [(hour, views) for hour, views in zip(self._hours, self._ring) if views]
+            self._ring = [defaultdict(int) for _ in range(RING_HOURS)]
+            self._pending_views = 0
+        
+        if not buckets:
+            return 0
+        
+        pending = defaultdict(int)
+        hourly = {}
+        for hour, views in buckets:
+            for post_id, count in views.items():
+                pending[post_id] += count
+                hourly[post_id, hour] = count
+        
+        table = BlogPost.__table__
+        # updated_at is kept as it was: a view is not an edit, and the related
+        # posts sync would index every viewed post again
+        statement = table.update().where(table.c.id == bindparam("post_id")).values(
+            view_count=func.coalesce(table.c.view_count, 0) + bindparam("views"),
+            updated_at=table.c.updated_at
+        )
+        
+        db = self.session_factory()
+        try:
+            db.execute(statement, [
+                {"post_id": post_id, "views": views} for post_id, views in pending.items()
+            ])
+            StatsService(db).record_views(pending)
+            TrendingService(db).record_views(hourly)
+            db.commit()
+        except Exception:
+            db.rollback()
+            self.failed_flushes += 1
+            # Keep the views for the next attempt
+            for (post_id, hour), views in hourly.items():
+                self.add(post_id, views, hour)
+            raise
+        finally:
+            db.close()
+        
+        written = sum(pending.values())
+        self.flushed_views += written
+        self.flushes += 1
+        self.last_flush_at = time.time()
+        return written
+    
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            
+            try:
+                await run_in_threadpool(self.flush)
+            except Exception:
+                logger.exception("Failed to flush view counts")
+    
+    def start(self):
+        """Start flushing in the background"""
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Stop the background flush and write what is left"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._wakeup = None
+        await run_in_threadpool(self.flush)
+    
+    def stats(self) -> dict:
+        """Counters describing the buffer"""
+        with self._lock:
+            pending_views = self._pending_views
+            pending_posts = len(set().union(*self._ring))
+            pending_hours = sum(1 for views in self._ring if views)
+        
+        return {
+            "pending_views": pending_views,
+            "pending_posts": pending_posts,
+            "pending_hours": pending_hours,
+            "flushed_views": self.flushed_views,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "last_flush_at": self.last_flush_at,
+            "flush_interval": self.flush_interval
+        }
+
+
+view_counter = ViewCounter()
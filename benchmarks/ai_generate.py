@@ -0,0 +1,119 @@
+"""Measure AI generation latency against a local mock OpenRouter server
+
+    python -m benchmarks.ai_generate --calls 50 --concurrency 10 --first-token 0.8
+
+Starts benchmarks.mock_openrouter on a free port and compares:
+
+* a new httpx client per call (the old behaviour) with the shared pooled client
+* time to first byte and to the finished post of POST /posts/generate
+  (a background job, polled) with POST /posts/generate/stream (server-sent
+  events)
+"""
+import argparse
+import asyncio
+import os
+import time
+from benchmarks.common import Timer, build_app, configure_environment, percentile, serve
+
+
+async def client_modes(base_url: str, calls: int, concurrency: int):
+    import httpx
+    from app.services.ai_service import AIService
+
+    pooled = AIService(base_url=base_url, max_concurrency=concurrency)
+    payload = pooled._payload("benchmark prompt")
+
+    async def fresh_client():
+        async with httpx.AsyncClient(timeout=60.0) as client:
+            response = await client.post(pooled.base_url, json=payload)
+            response.raise_for_status()
+
+    async def shared_client():
+        await pooled.generate_blog_post("benchmark prompt")
+
+    semaphore = asyncio.Semaphore(concurrency)
+    for mode, call in (("client per call", fresh_client), ("pooled client", shared_client)):
+        latencies = []
+
+        async def one():
+            async with semaphore:
+                start = time.perf_counter()
+                await call()
+                latencies.append(time.perf_counter() - start)
+
+        with Timer() as timer:
+            await asyncio.gather(*(one() for _ in range(calls)))
+        print(
+            f"{mode:>16}: {calls / timer.elapsed:6.2f} calls/s  "
+            f"p50 {percentile(latencies, 0.5) * 1000:7.1f} ms  p95 {percentile(latencies, 0.95) * 1000:7.1f} ms"
+        )
+    await pooled.stop()
+
+
+async def time_to_first_byte(app_url: str, calls: int):
+    import httpx
+
+    async with httpx.AsyncClient(base_url=app_url, timeout=60.0) as client:
+        # Generation job: the response comes back at once, the post when the
+        # job has finished. Prompts differ so the job cache doesn't kick in.
+        first_byte, total = [], []
+        for i in range(calls):
+            start = time.perf_counter()
+            response = await client.post("/api/posts/generate", json={
+                "prompt": f"Write about connection pooling, take {i}", "author": "Benchmark"
+            })
+            response.raise_for_status()
+            first_byte.append(time.perf_counter() - start)
+            status_url = response.headers["location"]
+            while response.json()["status"] not in ("succeeded", "failed"):
+                await asyncio.sleep(0.02)
+                response = await client.get(status_url)
+            total.append(time.perf_counter() - start)
+        print(
+            f"{'/api/posts/generate (job)':>26}: first byte p50 {percentile(first_byte, 0.5) * 1000:7.1f} ms  "
+            f"complete p50 {percentile(total, 0.5) * 1000:7.1f} ms"
+        )
+
+        first_byte, total = [], []
+        for i in range(calls):
+            start = time.perf_counter()
+            async with client.stream("POST", "/api/posts/generate/stream", json={
+                "prompt": f"Write about connection pooling, take {i}", "author": "Benchmark"
+            }) as response:
+                response.raise_for_status()
+                async for _ in response.aiter_raw():
+                    if len(first_byte) == len(total):
+                        first_byte.append(time.perf_counter() - start)
+            total.append(time.perf_counter() - start)
+        print(
+            f"{'/api/posts/generate/stream':>26}: first byte p50 {percentile(first_byte, 0.5) * 1000:7.1f} ms  "
+            f"complete p50 {percentile(total, 0.5) * 1000:7.1f} ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--first-token", type=float, default=0.8)
+    parser.add_argument("--token-delay", type=float, default=0.005)
+    parser.add_argument("--tokens", type=int, default=200)
+    args = parser.parse_args()
+
+    from benchmarks.mock_openrouter import create_app
+
+    upstream = serve(create_app(args.first_token, args.token_delay, args.tokens)) + "/api/v1"
+    os.environ["OPENROUTER_BASE_URL"] = upstream
+    configure_environment()
+
+    from app.core.database import Base, engine
+    import app.models  # noqa: F401  (register every table)
+
+    Base.metadata.create_all(bind=engine)
+    print(f"mock upstream: first token after {args.first_token}s, {args.tokens} tokens")
+    asyncio.run(client_modes(upstream, args.calls, args.concurrency))
+    asyncio.run(time_to_first_byte(serve(build_app()), max(1, args.calls // 10)))
+
+
+if __name__ == "__main__":
+    main()
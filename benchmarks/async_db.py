@@ -0,0 +1,93 @@
+"""Compare concurrent-request throughput of the sync and async database paths
+
+    python -m benchmarks.async_db --posts 2000 --requests 2000 --concurrency 50
+
+Uses DATABASE_URL when it is set (e.g. a Postgres instance, where the async
+path matters most because every query waits on the network) and a throwaway
+SQLite file otherwise. Both modes serve the same app in-process; only the
+blog post service dependency is swapped.
+"""
+import argparse
+import asyncio
+import random
+import time
+from benchmarks.common import Timer, build_app, configure_environment, percentile, seed_posts
+
+
+async def drive(app, requests: int, concurrency: int, posts: int):
+    """Fire `requests` list/detail requests with `concurrency` in flight"""
+    import httpx
+
+    rng = random.Random(7)
+    urls = [
+        "/api/posts?size=20" if rng.random() < 0.5 else f"/api/posts/{rng.randint(1, posts)}"
+        for _ in range(requests)
+    ]
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def one(url):
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(url)
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        with Timer() as timer:
+            await asyncio.gather(*(one(url) for url in urls))
+
+    return {
+        "requests_per_second": requests / timer.elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url")
+    parser.add_argument("--posts", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    url = configure_environment(args.database_url)
+
+    from app.api.blog_posts import get_post_service
+    from app.core.database import SessionLocal, create_async_db_engine, engine
+    from app.services.async_blog_post_service import AsyncBlogPostService
+    from app.services.blog_post_service import BlogPostService
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    seed_posts(engine, args.posts)
+    app = build_app()
+
+    async def sync_service():
+        db = SessionLocal()
+        try:
+            yield BlogPostService(db)
+        finally:
+            db.close()
+
+    async_engine = create_async_db_engine(url)
+    AsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
+    async def async_service():
+        async with AsyncSessionLocal() as db:
+            yield AsyncBlogPostService(db)
+
+    print(f"{args.posts} posts, {args.requests} requests, concurrency {args.concurrency}")
+    for mode, dependency in (("sync", sync_service), ("async", async_service)):
+        app.dependency_overrides[get_post_service] = dependency
+        result = asyncio.run(drive(app, args.requests, args.concurrency, args.posts))
+        print(
+            f"{mode:>5}: {result['requests_per_second']:8.1f} req/s  "
+            f"p50 {result['p50_ms']:7.1f} ms  p95 {result['p95_ms']:7.1f} ms"
+        )
+
+    asyncio.run(async_engine.dispose())
+
+
+if __name__ == "__main__":
+    main()
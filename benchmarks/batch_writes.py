@@ -0,0 +1,100 @@
+"""Count statements and commits per post: one call per post vs the batch API
+
+    python -m benchmarks.batch_writes --posts 500
+
+Creates `--posts` posts and then edits all of them (new title; tags with one
+changed and two unchanged), first through create_post/update_post one post
+at a time and then through create_posts/update_posts in one transaction.
+Statements are counted on the engine; an executemany counts once. SQLite
+can't return ids of a multi-row INSERT in a guaranteed order, so there the
+batch create still sends one INSERT per post (inside the one transaction);
+Postgres gets a single INSERT per 1000 rows.
+"""
+import argparse
+import asyncio
+from benchmarks.common import Timer, configure_environment, sentence
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url")
+    parser.add_argument("--posts", type=int, default=500)
+    args = parser.parse_args()
+
+    import random
+
+    configure_environment(args.database_url)
+
+    from sqlalchemy import event
+    from app.core.database import Base, SessionLocal, engine
+    from app.schemas.blog_post import BlogPostBatchUpdate, BlogPostCreate, BlogPostUpdate
+    from app.services.blog_post_service import BlogPostService
+    import app.models  # noqa: F401  (register every table)
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    counts = {"statements": 0, "commits": 0}
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_statement(*_):
+        counts["statements"] += 1
+
+    @event.listens_for(engine, "commit")
+    def count_commit(*_):
+        counts["commits"] += 1
+
+    rng = random.Random(42)
+    posts = [
+        BlogPostCreate(
+            title=sentence(rng, 6).title(), content=sentence(rng, 200), author=f"author{i % 20}",
+            tags=["news", "python", f"tag{i % 50}"], published=True
+        )
+        for i in range(args.posts)
+    ]
+
+    def edits(post_ids):
+        return [
+            BlogPostBatchUpdate(id=post_id, title=f"Edited {post_id}", tags=["news", "python", "edited"])
+            for post_id in post_ids
+        ]
+
+    async def one_at_a_time(service):
+        post_ids = [(await service.create_post(post)).id for post in posts]
+        yield "create"
+        for edit in edits(post_ids):
+            await service.update_post(edit.id, BlogPostUpdate(**edit.model_dump(exclude={"id"}, exclude_unset=True)))
+        yield "update"
+
+    async def batched(service):
+        results = await service.create_posts(posts)
+        yield "create"
+        await service.update_posts(edits([result["id"] for result in results]))
+        yield "update"
+
+    async def measure(mode, steps):
+        db = SessionLocal()
+        try:
+            steps = steps(BlogPostService(db))
+            while True:
+                counts.update(statements=0, commits=0)
+                with Timer() as timer:
+                    try:
+                        step = await steps.__anext__()
+                    except StopAsyncIteration:
+                        return
+                print(
+                    f"{mode:>13} {step}: {counts['statements']:6} statements "
+                    f"({counts['statements'] / args.posts:5.2f}/post)  {counts['commits']:5} commits  "
+                    f"{args.posts / timer.elapsed:8.1f} posts/s"
+                )
+        finally:
+            db.close()
+
+    print(f"{args.posts} posts")
+    asyncio.run(measure("one at a time", one_at_a_time))
+    asyncio.run(measure("batch", batched))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Compare bulk NDJSON import with creating posts one at a time, then export
+
+    python -m benchmarks.bulk_import --posts 100000 --baseline 2000
+
+Writes an archive of `--posts` synthetic posts, times `--baseline` of them
+through BlogPostService.create_post (two commits per post), imports the
+whole archive with the batched importer, then streams it back out and
+reports the peak Python memory the export needed.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import tracemalloc
+from datetime import datetime, timedelta
+from benchmarks.common import Timer, configure_environment, sentence
+
+
+def write_archive(path: str, posts: int, seed: int = 42):
+    import random
+
+    rng = random.Random(seed)
+    start = datetime(2020, 1, 1)
+    with open(path, "w") as archive:
+        for i in range(posts):
+            archive.write(json.dumps({
+                "title": sentence(rng, 6).title(),
+                "content": sentence(rng, 400),
+                "excerpt": sentence(rng, 30),
+                "author": f"author{i % 20}",
+                "published": i % 4 != 0,
+                "view_count": rng.randint(0, 10000),
+                "created_at": (start + timedelta(minutes=i)).isoformat(),
+                "tags": [f"tag{rng.randint(1, 50)}" for _ in range(3)],
+                "images": [f"/api/upload/images/{i}.webp"] if i % 10 == 0 else []
+            }) + "\n")
+
+
+async def read_chunks(path: str, chunk_size: int = 64 * 1024):
+    with open(path, "rb") as archive:
+        while True:
+            chunk = archive.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url")
+    parser.add_argument("--posts", type=int, default=100000)
+    parser.add_argument("--baseline", type=int, default=2000, help="posts created one at a time")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    configure_environment(args.database_url)
+
+    from app.core.database import Base, SessionLocal, engine
+    from app.schemas.blog_post import BlogPostCreate
+    from app.services.archive_service import export_posts, import_posts
+    from app.services.blog_post_service import BlogPostService
+    import app.models  # noqa: F401  (register every table)
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    path = os.path.join(tempfile.mkdtemp(prefix="blog-bench-archive-"), "posts.ndjson")
+    write_archive(path, args.posts)
+    print(f"archive: {args.posts} posts, {os.path.getsize(path) / 2 ** 20:.1f} MiB")
+
+    async def one_at_a_time():
+        db = SessionLocal()
+        service = BlogPostService(db)
+        try:
+            with open(path) as archive:
+                for _, line in zip(range(args.baseline), archive):
+                    record = json.loads(line)
+                    await service.create_post(BlogPostCreate(**{
+                        name: record[name] for name in ("title", "content", "excerpt", "author", "published", "tags")
+                    }))
+        finally:
+            db.close()
+
+    with Timer() as timer:
+        asyncio.run(one_at_a_time())
+    print(f"create_post one at a time: {args.baseline / timer.elapsed:9.1f} rows/s  ({args.baseline} posts)")
+
+    report = asyncio.run(import_posts(read_chunks(path), SessionLocal, args.batch_size))
+    if report.get("error"):
+        raise SystemExit(report["error"])
+    print(
+        f"bulk import, batches of {args.batch_size}: {report['rows_per_second']:9.1f} rows/s  "
+        f"({report['imported']} posts in {report['seconds']:.1f} s)"
+    )
+
+    exported = 0
+    with Timer() as timer:
+        for chunk in export_posts(SessionLocal, args.batch_size):
+            exported += chunk.count(b"\n")
+    print(f"export: {exported / timer.elapsed:9.1f} rows/s  ({exported} posts)")
+
+    # Traced separately, tracemalloc slows everything down
+    tracemalloc.start()
+    for chunk in export_posts(SessionLocal, args.batch_size):
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"export peak Python memory: {peak / 2 ** 20:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Helpers shared by the benchmark scripts
+
+The app settings are read at import time, so `configure_environment` must run
+before anything from `app` is imported.
+"""
+import os
+import random
+import socket
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+WORDS = (
+    "python fastapi database index query cache latency throughput async "
+    "server client request response blog post author editor article news "
+    "story reader comment image upload search ranking tag vector"
+).split()
+
+
+def configure_environment(database_url: str = None) -> str:
+    """Point the app at a benchmark database and fill in required settings"""
+    if database_url:
+        os.environ["DATABASE_URL"] = database_url
+    elif "DATABASE_URL" not in os.environ:
+        path = os.path.join(tempfile.mkdtemp(prefix="blog-bench-"), "bench.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+
+    for name in ("OPENROUTER_API_KEY", "CHATBOT_API_KEY", "JWT_SECRET_KEY"):
+        os.environ.setdefault(name, "benchmark")
+    return os.environ["DATABASE_URL"]
+
+
+def build_app():
+    """Mount the API routers the way main.py does"""
+    from fastapi import FastAPI
+    from app.api import blog_posts, comments, file_upload, metrics, newsletter, pages, polls
+    from app.core.metrics import MetricsMiddleware
+
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(blog_posts.router, prefix="/api")
+    app.include_router(file_upload.router, prefix="/api")
+    app.include_router(comments.router, prefix="/api")
+    app.include_router(polls.router, prefix="/api")
+    app.include_router(newsletter.router, prefix="/api")
+    app.include_router(pages.router, prefix="/api")
+    app.include_router(metrics.router)
+    return app
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def seed_posts(engine, posts: int, tags_per_post: int = 3, seed: int = 42, tags: int = 50,
+               images_per_post: int = 0, comments_per_post: int = 0):
+    """Create the schema and insert `posts` published posts with tags
+
+    Optionally adds `images_per_post` image URLs and `comments_per_post`
+    approved comments to every post, a third of them replies.
+    """
+    from app.core.database import Base
+    from app.models.blog_post import BlogPost, BlogPostImage, BlogPostTag
+    from app.models.comment import BlogComment
+    from app.models.tag import Tag
+    import app.models  # noqa: F401  (register every table)
+
+    rng = random.Random(seed)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    start = datetime.utcnow() - timedelta(days=posts)
+    with engine.begin() as connection:
+        connection.execute(BlogPost.__table__.insert(), [
+            {
+                "id": i,
+                "title": sentence(rng, 6).title(),
+                "content": sentence(rng, 800),
+                "excerpt": sentence(rng, 30),
+                "author": f"author{i % 20}",
+                "published": True,
+                "view_count": rng.randint(0, 10000),
+                "comment_count": comments_per_post,
+                "is_ai_generated": False,
+                "created_at": start + timedelta(days=i)
+            }
+            for i in range(1, posts + 1)
+        ])
+        connection.execute(Tag.__table__.insert(), [{"id": i, "name": f"tag{i}"} for i in range(1, tags + 1)])
+        connection.execute(BlogPostTag.__table__.insert(), [
+            {"post_id": i, "tag_id": tag_id}
+            for i in range(1, posts + 1)
+            for tag_id in rng.sample(range(1, tags + 1), min(tags_per_post, tags))
+        ])
+        if images_per_post:
+            connection.execute(BlogPostImage.__table__.insert(), [
+                {"post_id": i, "image_url": f"/api/upload/images/{i}-{n}.webp"}
+                for i in range(1, posts + 1)
+                for n in range(images_per_post)
+            ])
+        if comments_per_post:
+            comment_id = 0
+            rows = []
+            for i in range(1, posts + 1):
+                first = comment_id + 1
+                for n in range(comments_per_post):
+                    comment_id += 1
+                    rows.append({
+                        "id": comment_id,
+                        "post_id": i,
+                        "parent_id": rng.randint(first, comment_id - 1) if n and n % 3 == 0 else None,
+                        "content": sentence(rng, 40),
+                        "author_name": f"reader{rng.randint(1, 500)}",
+                        "approved": True,
+                        "created_at": start + timedelta(days=i, minutes=n)
+                    })
+            connection.execute(BlogComment.__table__.insert(), rows)
+
+
+def serve(app) -> str:
+    """Serve an ASGI app with uvicorn in a background thread, return its URL"""
+    import uvicorn
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+def percentile(values, fraction: float) -> float:
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Timer:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
@@ -0,0 +1,541 @@
+"""Benchmark every API route in-process against a seeded database
+
+    python -m benchmarks.endpoints --posts 2000 --requests 200 --concurrency 10 --out bench.json
+    python -m benchmarks.endpoints --posts 2000 --requests 200 --concurrency 10 --baseline bench.json
+
+Seeds a throwaway SQLite file (or DATABASE_URL / --database-url, e.g.
+Postgres) with posts, tags, images and comments, starts the app's routers
+the way main.py does, and sends `--requests` requests per scenario with
+`--concurrency` in flight. Each route of app/api/blog_posts.py,
+app/api/file_upload.py, app/api/comments.py, app/api/polls.py and
+app/api/pages.py has at
+least one scenario; AI generation runs against benchmarks.mock_openrouter on
+a local port. Reads come before writes, and requests are drawn from a fixed
+seed, so two runs send the same requests.
+
+For every scenario it reports p50/p95/p99 latency, requests per second,
+SQL statements per request (everything the engine ran during the scenario,
+background view-count flushes and generation jobs included) and unexpected
+status codes. `--out` saves the results as JSON. `--baseline` compares with
+a saved run and exits with status 1 when a scenario regressed: latency (the
+`--gate` percentile, p50 by default as it is the least noisy) up by more
+than `--latency-tolerance` and at least 1 ms, statements per request up by
+more than `--statement-tolerance`, or new errors. Statement counts hardly
+vary between runs; latency does, so compare runs from the same machine.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, List, NamedTuple, Optional, Tuple
+from benchmarks.common import WORDS, Timer, build_app, configure_environment, percentile, seed_posts, sentence, serve
+
+# A latency change smaller than this is noise, whatever the ratio
+NOISE_MS = 1.0
+
+
+class Scenario(NamedTuple):
+    """Requests to one route
+
+    `request(i, rng, context)` returns the keyword arguments of the i-th
+    httpx request; `setup(client, context, count)` runs untimed before it.
+    `share` scales the request count for slow or heavy routes.
+    """
+    name: str
+    method: str
+    request: Callable[[int, random.Random, dict], dict]
+    statuses: Tuple[int, ...] = (200,)
+    setup: Optional[Callable] = None
+    share: float = 1.0
+
+
+def post_body(rng: random.Random, context: dict) -> dict:
+    return {
+        "title": sentence(rng, 6).title(),
+        "content": sentence(rng, 300),
+        "author": f"author{rng.randint(0, 19)}",
+        "tags": rng.sample(context["tags"], 3),
+        "published": True
+    }
+
+
+def png(seed: int) -> bytes:
+    """A small PNG that differs for every seed, so uploads aren't deduplicated"""
+    from PIL import Image
+
+    image = Image.new("RGB", (640, 480), ((seed * 37) % 256, (seed * 91) % 256, (seed * 53) % 256))
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+async def create_posts(client, context: dict, count: int) -> List[int]:
+    rng = random.Random(count)
+    ids = []
+    for start in range(0, count, 1000):
+        response = await client.post("/api/posts/batch", json={
+            "posts": [post_body(rng, context) for _ in range(min(1000, count - start))]
+        })
+        response.raise_for_status()
+        ids.extend(result["id"] for result in response.json()["results"])
+    return ids
+
+
+async def upload_images(client, count: int, first: int) -> List[str]:
+    from app.services.image_service import image_service
+
+    filenames = []
+    for i in range(first, first + count):
+        response = await client.post("/api/upload/image", files={"file": (f"{i}.png", png(i), "image/png")})
+        response.raise_for_status()
+        filenames.append(response.json()["filename"])
+    # Let the derivatives of the uploads render before they're read or deleted
+    await image_service.wait()
+    return filenames
+
+
+async def readable_images(client, context: dict, count: int):
+    if "images" not in context:
+        context["images"] = await upload_images(client, 10, 100000)
+
+
+async def deletable_images(client, context: dict, count: int):
+    context["deletable_images"] = await upload_images(client, count, 200000)
+
+
+async def deletable_posts(client, context: dict, count: int):
+    context["deletable"] = await create_posts(client, context, count)
+
+
+async def upload_payloads(client, context: dict, count: int):
+    context["uploads"] = [png(i) for i in range(count)]
+
+
+async def submit_jobs(client, context: dict, count: int):
+    # Jobs left by POST /posts/generate could still fill the queue
+    while (await client.get("/api/posts/stats/generation")).json()["queued"]:
+        await asyncio.sleep(0.05)
+    context["jobs"] = []
+    for i in range(min(count, 20)):
+        response = await client.post("/api/posts/generate", json={"prompt": f"Write about benchmarks, job {i}"})
+        response.raise_for_status()
+        context["jobs"].append(response.json()["job_id"])
+
+
+async def pending_comments(client, context: dict, count: int):
+    """Unapproved comments, for the approve and delete scenarios"""
+    context["pending_comments"] = []
+    for i in range(count):
+        response = await client.post("/api/posts/comments", json=comment_body(i, random.Random(i), context))
+        response.raise_for_status()
+        context["pending_comments"].append(response.json()["id"])
+
+
+def comment_body(i: int, rng: random.Random, context: dict) -> dict:
+    return {
+        "post_id": rng.randint(1, context["posts"]),
+        "author_name": f"reader{i}",
+        "author_email": f"reader{i}@example.com",
+        "content": sentence(rng, 30)
+    }
+
+
+async def create_poll(client, context: dict, count: int):
+    if "poll" not in context:
+        response = await client.post("/api/polls", json={
+            "question": "Which benchmark matters most?", "options": ["p50", "p95", "p99", "throughput"]
+        })
+        response.raise_for_status()
+        context["poll"] = response.json()
+
+
+async def deletable_pages(client, context: dict, count: int):
+    context["deletable_pages"] = []
+    for i in range(count):
+        slug = f"deletable-page-{i}"
+        response = await client.post("/api/pages", json={"slug": slug, "title": slug, "content": "To be deleted"})
+        response.raise_for_status()
+        context["deletable_pages"].append(slug)
+
+
+PAGE_SLUGS = ("about", "contact", "terms", "report", "circulation", "advertisement", "newsletter")
+
+
+async def create_pages(client, context: dict, count: int):
+    if "pages" not in context:
+        rng = random.Random(7)
+        for slug in PAGE_SLUGS:
+            response = await client.post("/api/pages", json={
+                "slug": slug, "title": slug.title(), "content": sentence(rng, 600),
+                "title_bn": slug.title(), "content_bn": sentence(rng, 600)
+            })
+            response.raise_for_status()
+        context["pages"] = PAGE_SLUGS
+
+
+def poll_body(rng: random.Random, context: dict) -> dict:
+    return {"question": sentence(rng, 8) + "?", "options": [sentence(rng, 2) for _ in range(rng.randint(2, 6))]}
+
+
+def vote(i: int, rng: random.Random, context: dict) -> dict:
+    poll = context["poll"]
+    return {
+        "url": f"/api/polls/{poll['id']}/vote",
+        "json": {"option_id": rng.choice(poll["options"])["id"]},
+        # A voter per request, see ProxyHeadersMiddleware in main()
+        "headers": {"X-Forwarded-For": f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}"}
+    }
+
+
+def archive(rng: random.Random, context: dict, posts: int = 100) -> bytes:
+    lines = []
+    for _ in range(posts):
+        record = post_body(rng, context)
+        record["images"] = []
+        lines.append(json.dumps(record))
+    return ("\n".join(lines) + "\n").encode()
+
+
+def scenarios(args) -> List[Scenario]:
+    posts = args.posts
+    pages = max(1, posts // 10)
+
+    def post_id(rng):
+        return rng.randint(1, posts)
+
+    def comment_id(rng):
+        return rng.randint(1, posts * args.comments_per_post)
+
+    return [
+        # Reads
+        Scenario("GET /posts", "GET", lambda i, rng, c: {"url": f"/api/posts?page={rng.randrange(pages)}&size=10"}),
+        Scenario("GET /posts?cursor", "GET", lambda i, rng, c: {"url": f"/api/posts?cursor=&size={rng.randint(10, 30)}"}),
+        Scenario("GET /posts?fields=content", "GET", lambda i, rng, c: {
+            "url": f"/api/posts?page={rng.randrange(pages)}&size=10&fields=content"
+        }),
+        Scenario("GET /posts/{id}", "GET", lambda i, rng, c: {"url": f"/api/posts/{post_id(rng)}"}),
+        Scenario("GET /posts/{id}?lang=bn", "GET", lambda i, rng, c: {"url": f"/api/posts/{post_id(rng)}?lang=bn"}),
+        Scenario("GET /posts/{id}/related", "GET", lambda i, rng, c: {
+            "url": f"/api/posts/{post_id(rng)}/related?limit={rng.randint(1, 10)}"
+        }),
+        Scenario("GET /posts/search", "GET", lambda i, rng, c: {
+            "url": f"/api/posts/search?keyword={rng.choice(WORDS)}+{rng.choice(WORDS)}&page={rng.randrange(5)}"
+        }),
+        Scenario("GET /posts/tag/{tag}", "GET", lambda i, rng, c: {
+            "url": f"/api/posts/tag/{rng.choice(c['tags'])}?page={rng.randrange(5)}"
+        }),
+        Scenario("GET /tags", "GET", lambda i, rng, c: {"url": f"/api/tags?limit={rng.randint(1, 500)}"}),
+        Scenario("GET /tags/popular", "GET", lambda i, rng, c: {"url": f"/api/tags/popular?limit={rng.randint(1, 100)}"}),
+        Scenario("GET /posts/top", "GET", lambda i, rng, c: {"url": f"/api/posts/top?limit={rng.randint(1, 50)}"}),
+        Scenario("GET /posts/trending", "GET", lambda i, rng, c: {
+            "url": f"/api/posts/trending?window={rng.choice(['24h', '7d'])}&limit={rng.randint(1, 50)}"
+        }),
+        Scenario("GET /posts/stats", "GET", lambda i, rng, c: {"url": "/api/posts/stats"}),
+        Scenario("GET /posts/stats/tags", "GET", lambda i, rng, c: {"url": f"/api/posts/stats/tags?limit={rng.randint(1, 500)}"}),
+        Scenario("GET /posts/stats/authors", "GET", lambda i, rng, c: {
+            "url": f"/api/posts/stats/authors?limit={rng.randint(1, 500)}"
+        }),
+        Scenario("GET /posts/stats/views", "GET", lambda i, rng, c: {"url": "/api/posts/stats/views"}),
+        Scenario("GET /posts/stats/generation", "GET", lambda i, rng, c: {"url": "/api/posts/stats/generation"}),
+        Scenario("GET /posts/stats/related", "GET", lambda i, rng, c: {"url": "/api/posts/stats/related"}),
+        Scenario("GET /posts/stats/trending", "GET", lambda i, rng, c: {"url": "/api/posts/stats/trending"}),
+        Scenario("GET /posts/export", "GET", lambda i, rng, c: {"url": "/api/posts/export"}, share=0.05),
+        Scenario("GET /posts/{id}/comments", "GET", lambda i, rng, c: {
+            "url": f"/api/posts/{post_id(rng)}/comments?page=0&size=10"
+        }),
+        Scenario("GET /posts/{id}/comments/count", "GET", lambda i, rng, c: {
+            "url": f"/api/posts/{post_id(rng)}/comments/count"
+        }),
+        Scenario("GET /polls", "GET", lambda i, rng, c: {"url": "/api/polls"}, setup=create_poll),
+        Scenario("GET /polls/{id}/results", "GET", lambda i, rng, c: {
+            "url": f"/api/polls/{c['poll']['id']}/results"
+        }, setup=create_poll),
+        Scenario("GET /polls/stats/votes", "GET", lambda i, rng, c: {"url": "/api/polls/stats/votes"}),
+        Scenario("GET /pages", "GET", lambda i, rng, c: {"url": "/api/pages"}, setup=create_pages),
+        Scenario("GET /pages/{slug}?lang=bn", "GET", lambda i, rng, c: {
+            "url": f"/api/pages/{rng.choice(c['pages'])}?lang=bn"
+        }, setup=create_pages),
+        Scenario("GET /pages/stats/cache", "GET", lambda i, rng, c: {"url": "/api/pages/stats/cache"}),
+        Scenario("GET /upload/images/{filename}", "GET", lambda i, rng, c: {
+            "url": f"/api/upload/images/{rng.choice(c['images'])}"
+        }, setup=readable_images),
+        Scenario("GET /upload/images/{filename}?w=400", "GET", lambda i, rng, c: {
+            "url": f"/api/upload/images/{rng.choice(c['images'])}?w=400&format=webp"
+        }, setup=readable_images),
+        # Writes
+        Scenario("POST /posts", "POST", lambda i, rng, c: {"url": "/api/posts", "json": post_body(rng, c)},
+                 statuses=(201,)),
+        Scenario("POST /posts/batch", "POST", lambda i, rng, c: {
+            "url": "/api/posts/batch", "json": {"posts": [post_body(rng, c) for _ in range(20)]}
+        }, statuses=(201,), share=0.25),
+        Scenario("PATCH /posts/batch", "PATCH", lambda i, rng, c: {
+            "url": "/api/posts/batch",
+            "json": {"posts": [
+                {"id": post_id, "title": f"Edited {i}", "tags": rng.sample(c["tags"], 3)}
+                for post_id in rng.sample(range(1, posts + 1), min(20, posts))
+            ]}
+        }, share=0.25),
+        Scenario("PUT /posts/{id}", "PUT", lambda i, rng, c: {
+            "url": f"/api/posts/{post_id(rng)}", "json": {"title": f"Edited {i}", "tags": rng.sample(c["tags"], 3)}
+        }),
+        Scenario("PATCH /posts/{id}/publish", "PATCH", lambda i, rng, c: {"url": f"/api/posts/{post_id(rng)}/publish"}),
+        Scenario("POST /posts/{id}/images", "POST", lambda i, rng, c: {
+            "url": f"/api/posts/{post_id(rng)}/images?image_url=/api/upload/images/bench-{i}.webp"
+        }),
+        Scenario("PATCH /posts/{id}/featured-image", "PATCH", lambda i, rng, c: {
+            "url": f"/api/posts/{post_id(rng)}/featured-image?image_url=/api/upload/images/bench-{i}.webp"
+        }),
+        Scenario("POST /posts/import", "POST", lambda i, rng, c: {
+            "url": "/api/posts/import", "content": archive(rng, c)
+        }, share=0.1),
+        Scenario("POST /posts/stats/reconcile", "POST", lambda i, rng, c: {"url": "/api/posts/stats/reconcile"},
+                 share=0.1),
+        Scenario("POST /upload/image", "POST", lambda i, rng, c: {
+            "url": "/api/upload/image", "files": {"file": (f"{i}.png", c["uploads"][i], "image/png")}
+        }, setup=upload_payloads),
+        Scenario("POST /posts/comments", "POST", lambda i, rng, c: {
+            "url": "/api/posts/comments", "json": comment_body(i, rng, c)
+        }, statuses=(201,)),
+        Scenario("POST /posts/comments/{id}/upvote", "POST", lambda i, rng, c: {
+            "url": f"/api/posts/comments/{comment_id(rng)}/upvote"
+        }),
+        Scenario("PATCH /posts/comments/{id}/approve", "PATCH", lambda i, rng, c: {
+            "url": f"/api/posts/comments/{c['pending_comments'][i]}/approve"
+        }, setup=pending_comments),
+        Scenario("POST /pages", "POST", lambda i, rng, c: {"url": "/api/pages", "json": {
+            "slug": f"bench-page-{i}", "title": sentence(rng, 4), "content": sentence(rng, 300)
+        }}, statuses=(201,)),
+        Scenario("PUT /pages/{slug}", "PUT", lambda i, rng, c: {
+            "url": f"/api/pages/{rng.choice(c['pages'])}", "json": {"content": sentence(rng, 600)}
+        }, setup=create_pages),
+        Scenario("POST /polls", "POST", lambda i, rng, c: {"url": "/api/polls", "json": poll_body(rng, c)},
+                 statuses=(201,)),
+        Scenario("POST /polls/{id}/vote", "POST", vote, statuses=(201,), setup=create_poll),
+        Scenario("POST /posts/generate", "POST", lambda i, rng, c: {
+            "url": "/api/posts/generate", "json": {"prompt": f"Write about latency percentiles, take {i}"}
+        }, statuses=(202,)),
+        Scenario("GET /posts/generate/{job_id}", "GET", lambda i, rng, c: {
+            "url": f"/api/posts/generate/{rng.choice(c['jobs'])}"
+        }, setup=submit_jobs),
+        Scenario("POST /posts/generate/stream", "POST", lambda i, rng, c: {
+            "url": "/api/posts/generate/stream", "json": {"prompt": f"Write about streaming responses, take {i}"}
+        }, share=0.2),
+        # Deletes
+        Scenario("DELETE /posts/{id}", "DELETE", lambda i, rng, c: {"url": f"/api/posts/{c['deletable'][i]}"},
+                 statuses=(204,), setup=deletable_posts),
+        Scenario("DELETE /posts/comments/{id}", "DELETE", lambda i, rng, c: {
+            "url": f"/api/posts/comments/{c['pending_comments'][i]}"
+        }, statuses=(204,), setup=pending_comments),
+        Scenario("DELETE /upload/images/{filename}", "DELETE", lambda i, rng, c: {
+            "url": f"/api/upload/images/{c['deletable_images'][i]}"
+        }, setup=deletable_images),
+        Scenario("DELETE /pages/{slug}", "DELETE", lambda i, rng, c: {
+            "url": f"/api/pages/{c['deletable_pages'][i]}"
+        }, setup=deletable_pages),
+    ]
+
+
+async def run_scenario(client, scenario: Scenario, count: int, concurrency: int, context: dict,
+                       counts: dict, seed: int) -> dict:
+    if scenario.setup is not None:
+        await scenario.setup(client, context, count)
+
+    rng = random.Random(f"{seed}:{scenario.name}")
+    requests = [scenario.request(i, rng, context) for i in range(count)]
+    latencies, errors = [], []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(kwargs):
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.request(scenario.method, **kwargs)
+            await response.aread()
+            latencies.append(time.perf_counter() - start)
+            if response.status_code not in scenario.statuses:
+                errors.append(f"{response.status_code} {kwargs['url']} {response.text[:200]}")
+
+    counts["statements"] = 0
+    with Timer() as timer:
+        await asyncio.gather(*(one(kwargs) for kwargs in requests))
+
+    if errors:
+        print(f"  {scenario.name}: {len(errors)} unexpected responses, e.g. {errors[0]}", file=sys.stderr)
+    return {
+        "requests": count,
+        "requests_per_second": round(count / timer.elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "statements_per_request": round(counts["statements"] / count, 2),
+        "errors": len(errors)
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def regressions(current: dict, baseline: dict, gate: str, latency_tolerance: float,
+                statement_tolerance: float) -> List[str]:
+    """Scenarios that got slower, chattier or started failing, as messages"""
+    found = []
+    latency = f"{gate}_ms"
+    for name, result in current["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if before is None:
+            continue
+        if (result[latency] > before[latency] * (1 + latency_tolerance)
+                and result[latency] - before[latency] > NOISE_MS):
+            found.append(f"{name}: {gate} {before[latency]} -> {result[latency]} ms")
+        if result["statements_per_request"] > before["statements_per_request"] * (1 + statement_tolerance):
+            found.append(
+                f"{name}: statements/request {before['statements_per_request']} -> {result['statements_per_request']}"
+            )
+        if result["errors"] > before["errors"]:
+            found.append(f"{name}: errors {before['errors']} -> {result['errors']}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url")
+    parser.add_argument("--posts", type=int, default=2000)
+    parser.add_argument("--tags", type=int, default=50)
+    parser.add_argument("--tags-per-post", type=int, default=3)
+    parser.add_argument("--images-per-post", type=int, default=2)
+    parser.add_argument("--comments-per-post", type=int, default=5)
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", help="run the scenarios whose name contains this text")
+    parser.add_argument("--out", help="save the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON file of an earlier run to compare with")
+    parser.add_argument("--gate", choices=("p50", "p95", "p99"), default="p50",
+                        help="latency percentile compared with the baseline")
+    parser.add_argument("--latency-tolerance", type=float, default=0.5)
+    parser.add_argument("--statement-tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+
+    os.environ.setdefault("UPLOAD_DIR", tempfile.mkdtemp(prefix="blog-bench-uploads-"))
+    from benchmarks.mock_openrouter import create_app as create_mock_openrouter
+
+    os.environ["OPENROUTER_BASE_URL"] = serve(create_mock_openrouter(first_token=0.0, token_delay=0.0)) + "/api/v1"
+    configure_environment(args.database_url)
+
+    import httpx
+    from sqlalchemy import event
+    from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
+    from app.core.config import settings
+    from app.core.database import async_engine, engine
+    from app.services.related_posts import related_posts
+    from app.services.trending import trending_posts
+    from app.services.view_counter import view_counter
+
+    seed_posts(
+        engine, args.posts, args.tags_per_post, args.seed, args.tags,
+        images_per_post=args.images_per_post, comments_per_post=args.comments_per_post
+    )
+
+    counts = {"statements": 0}
+
+    def count_statement(*_):
+        counts["statements"] += 1
+
+    for target in [engine] + ([async_engine.sync_engine] if async_engine is not None else []):
+        event.listen(target, "before_cursor_execute", count_statement)
+
+    selected = [scenario for scenario in scenarios(args) if not args.only or args.only in scenario.name]
+    results = {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat() + "Z",
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "database": engine.dialect.name,
+            "db_async": settings.DB_ASYNC,
+            "cache_backend": settings.CACHE_BACKEND,
+            **{name: getattr(args, name) for name in (
+                "posts", "tags", "tags_per_post", "images_per_post", "comments_per_post",
+                "requests", "concurrency", "seed"
+            )}
+        },
+        "scenarios": {}
+    }
+
+    async def run():
+        app = build_app()
+        await app.router.startup()
+        # The related posts index builds in the background; wait, or its route has nothing to serve
+        deadline = time.monotonic() + 300
+        while not related_posts.stats()["ready"] and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        context = {"tags": [f"tag{i}" for i in range(1, args.tags + 1)], "posts": args.posts}
+        try:
+            async with httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=ProxyHeadersMiddleware(app, trusted_hosts="*")),
+                base_url="http://bench", timeout=120.0
+            ) as client:
+                for scenario in selected:
+                    count = max(1, int(args.requests * scenario.share))
+                    result = await run_scenario(
+                        client, scenario, count, args.concurrency, context, counts, args.seed
+                    )
+                    results["scenarios"][scenario.name] = result
+                    print(
+                        f"{scenario.name:<40} {result['requests_per_second']:8.1f} req/s  "
+                        f"p50 {result['p50_ms']:7.1f}  p95 {result['p95_ms']:7.1f}  p99 {result['p99_ms']:7.1f} ms  "
+                        f"{result['statements_per_request']:6.1f} SQL/req"
+                        + (f"  {result['errors']} errors" if result["errors"] else "")
+                    )
+                    # Write buffered views now, so the next scenario isn't charged for them,
+                    # and rank them so /posts/trending has posts to serve
+                    view_counter.flush()
+                    trending_posts.refresh()
+        finally:
+            await app.router.shutdown()
+
+    print(
+        f"{engine.dialect.name} ({'async' if settings.DB_ASYNC else 'sync'}), {args.posts} posts, "
+        f"{args.requests} requests per scenario, concurrency {args.concurrency}"
+    )
+    asyncio.run(run())
+
+    if args.out:
+        with open(args.out, "w") as out:
+            json.dump(results, out, indent=2)
+        print(f"saved to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        different = [
+            name for name, value in results["meta"].items()
+            if name in ("database", "db_async", "posts", "requests", "concurrency", "seed")
+            and baseline["meta"].get(name) != value
+        ]
+        if different:
+            print(f"note: baseline was run with different {', '.join(different)}")
+        found = regressions(results, baseline, args.gate, args.latency_tolerance, args.statement_tolerance)
+        if found:
+            print(f"{len(found)} regressions against {args.baseline}:")
+            for message in found:
+                print(f"  {message}")
+            raise SystemExit(1)
+        print(f"no regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Measure image derivative encoding throughput, in one process and in a pool
+
+    python -m benchmarks.image_encode --size 4000x3000 --images 8
+
+Renders a synthetic photo-like source image to every width in VARIANT_WIDTHS
+and every format the installed Pillow can encode, first serially in this
+process and then spread over a process pool like the upload path does.
+"""
+import argparse
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from benchmarks.common import Timer, configure_environment
+
+
+def make_source(path: str, width: int, height: int):
+    """Write a noisy gradient JPEG, which compresses roughly like a photo"""
+    from PIL import Image
+
+    gradient = Image.linear_gradient("L").resize((width, height))
+    noise = Image.effect_noise((width, height), 48)
+    image = Image.merge("RGB", (gradient, noise, gradient.transpose(Image.FLIP_LEFT_RIGHT)))
+    image.save(path, format="JPEG", quality=90)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", default="4000x3000", help="source image size, WIDTHxHEIGHT")
+    parser.add_argument("--images", type=int, default=8, help="renders of each width/format per run")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    configure_environment()
+    from app.services.image_service import VARIANT_WIDTHS, available_formats, render_variant
+
+    width, height = (int(value) for value in args.size.lower().split("x"))
+    workdir = tempfile.mkdtemp(prefix="blog-bench-images-")
+    source = os.path.join(workdir, "source.jpg")
+    make_source(source, width, height)
+
+    formats = sorted(available_formats())
+    print(f"source {width}x{height}, {args.images} renders per width/format, {args.workers} workers")
+    for fmt in formats:
+        for variant_width in VARIANT_WIDTHS:
+            jobs = [
+                (source, os.path.join(workdir, f"{fmt}_{variant_width}_{i}"), variant_width, fmt)
+                for i in range(args.images)
+            ]
+
+            with Timer() as serial:
+                for job in jobs:
+                    render_variant(*job)
+            with ProcessPoolExecutor(max_workers=args.workers) as pool:
+                # Start the workers before timing, the app keeps its pool warm
+                list(pool.map(render_variant, *zip(*jobs[:args.workers])))
+                with Timer() as pooled:
+                    list(pool.map(render_variant, *zip(*jobs)))
+
+            size = os.path.getsize(jobs[0][1])
+            print(
+                f"{fmt:>5} w{variant_width:<5} {size / 1024:7.1f} KiB  "
+                f"1 process {args.images / serial.elapsed:6.1f} img/s  "
+                f"pool {args.images / pooled.elapsed:6.1f} img/s  "
+                f"({args.images / pooled.elapsed / args.workers:5.1f} img/s per core)"
+            )
+
+
+if __name__ == "__main__":
+    main()
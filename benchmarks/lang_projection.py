@@ -0,0 +1,120 @@
+"""Bytes read from the database and sent per response, by language
+
+    python -m benchmarks.lang_projection --posts 500 --requests 200
+
+Seeds posts written in English, Bengali and Hindi (a share of them left
+untranslated to exercise the English fallback) and, for a Bengali reader,
+compares:
+
+- a post page, loading the whole row as before vs only the English and
+  Bengali columns;
+- a page of posts with bodies, asking for `fields=content,content_bn` to get
+  the Bengali text as before vs `fields=content&lang=bn`.
+
+Database bytes are the column values loaded into BlogPost objects; response
+bytes are the JSON bodies. The response cache is off so every request reads
+the database.
+"""
+import argparse
+import asyncio
+import os
+import random
+from benchmarks.common import configure_environment, seed_posts, sentence
+
+BENGALI_WORDS = "খবর লেখা পাঠক ছবি প্রশ্ন উত্তর বিজ্ঞান প্রযুক্তি দ্রুত তথ্য".split()
+HINDI_WORDS = "खबर लेख पाठक चित्र प्रश्न उत्तर विज्ञान तकनीक तेज़ जानकारी".split()
+
+
+def translate(engine, posts: int, translated: float, seed: int = 7):
+    """Fill the Bengali and Hindi columns of a `translated` share of the posts"""
+    from app.models.blog_post import BlogPost
+
+    rng = random.Random(seed)
+    table = BlogPost.__table__
+    with engine.begin() as connection:
+        for post_id in range(1, posts + 1):
+            if rng.random() >= translated:
+                continue
+            values = {}
+            for lang, words in (("bn", BENGALI_WORDS), ("hi", HINDI_WORDS)):
+                values[f"title_{lang}"] = " ".join(rng.choice(words) for _ in range(6))
+                values[f"excerpt_{lang}"] = " ".join(rng.choice(words) for _ in range(30))
+                values[f"content_{lang}"] = " ".join(rng.choice(words) for _ in range(800))
+            connection.execute(table.update().where(table.c.id == post_id).values(**values))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url")
+    parser.add_argument("--posts", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--translated", type=float, default=0.8, help="share of posts with translations")
+    args = parser.parse_args()
+
+    os.environ.setdefault("CACHE_BACKEND", "none")
+    configure_environment(args.database_url)
+
+    import httpx
+    from sqlalchemy import event
+    from app.core.database import SessionLocal, engine
+    from app.models.blog_post import BlogPost
+    from app.schemas.blog_post import BlogPostResponse
+    from benchmarks.common import build_app
+
+    seed_posts(engine, args.posts)
+    translate(engine, args.posts, args.translated)
+    columns = [column.key for column in BlogPost.__table__.columns]
+    loaded = {"bytes": 0}
+
+    @event.listens_for(BlogPost, "load")
+    def count_loaded(post, _):
+        for name in columns:
+            value = post.__dict__.get(name)
+            if value is not None:
+                loaded["bytes"] += len(str(value).encode())
+
+    rng = random.Random(42)
+    post_ids = [rng.randint(1, args.posts) for _ in range(args.requests)]
+    pages = [rng.randint(0, args.posts // 10 - 1) for _ in range(args.requests)]
+
+    def report(name, database_bytes, response_bytes):
+        print(
+            f"{name:<44} {database_bytes / args.requests:10.0f} B from the database  "
+            f"{response_bytes / args.requests:10.0f} B per response"
+        )
+
+    # Before: the post page loaded the whole row, every language
+    loaded["bytes"] = response_bytes = 0
+    db = SessionLocal()
+    try:
+        for post_id in post_ids:
+            post = db.query(BlogPost).filter(BlogPost.id == post_id).first()
+            response_bytes += len(BlogPostResponse.model_validate(post).model_dump_json())
+            db.expunge_all()
+    finally:
+        db.close()
+    report("post page, whole row (before)", loaded["bytes"], response_bytes)
+
+    async def measure(name, urls):
+        loaded["bytes"] = response_bytes = 0
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=build_app()), base_url="http://bench") as client:
+            for url in urls:
+                response = await client.get(url)
+                response.raise_for_status()
+                response_bytes += len(response.content)
+        report(name, loaded["bytes"], response_bytes)
+
+    asyncio.run(measure("post page, lang=bn", [f"/api/posts/{post_id}?lang=bn" for post_id in post_ids]))
+    asyncio.run(measure("post page, lang=en", [f"/api/posts/{post_id}?lang=en" for post_id in post_ids]))
+    asyncio.run(measure(
+        "10 posts, fields=content,content_bn (before)",
+        [f"/api/posts?page={page}&size=10&fields=content,content_bn" for page in pages]
+    ))
+    asyncio.run(measure(
+        "10 posts, fields=content&lang=bn",
+        [f"/api/posts?page={page}&size=10&fields=content&lang=bn" for page in pages]
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Markdown rendering moved from the read path to the write path
+
+    python -m benchmarks.markdown_render --posts 1000 --requests 300 --words 800
+
+Seeds `--posts` posts whose content is markdown of about `--words` words
+(headings, lists, links, code, tables, and a little raw HTML and a
+javascript: link that must not survive) stored without their rendered
+columns, as rows written before rendering moved to write time are. Then:
+
+- backfills them with app.services.post_render_service, reporting posts/s;
+- reads post pages with GET /api/posts/{id}, serving the stored HTML, and
+  the same reads rendering the markdown on every view as a read-time
+  renderer would;
+- creates posts with POST /api/posts, reporting how much of a write the
+  rendering takes.
+
+The response cache is off so every read goes to the database. Exits with
+status 1 if a post is left unrendered or unsafe HTML gets through.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from benchmarks.common import WORDS, configure_environment, percentile, seed_posts
+
+
+def markdown_post(rng: random.Random, words: int) -> str:
+    """A markdown post of about `words` words"""
+    def text(count):
+        return " ".join(rng.choice(WORDS) for _ in range(count))
+
+    blocks = [f"# {text(5).title()}", "Intro with <b>raw html</b> and a [bad link](javascript:alert(1))."]
+    written = 0
+    while written < words:
+        kind = rng.random()
+        if kind < 0.1:
+            blocks.append(f"## {text(4).title()}")
+            written += 4
+        elif kind < 0.25:
+            blocks.append("\n".join(f"- **{text(2)}** {text(8)}" for _ in range(4)))
+            written += 40
+        elif kind < 0.3:
+            blocks.append(f"```python\n{text(6)}\n{text(6)}\n```")
+            written += 12
+        elif kind < 0.33:
+            blocks.append("| name | value |\n|---|---|\n" + "\n".join(f"| {text(1)} | {text(2)} |" for _ in range(3)))
+            written += 11
+        else:
+            blocks.append(
+                f"{text(20)} *{text(3)}* [{text(2)}](https://example.com/{rng.randrange(1000)}) "
+                f"`{text(1)}` {text(25)}"
+            )
+            written += 51
+    return "\n\n".join(blocks)
+
+
+def store_markdown(engine, posts: int, words: int, seed: int = 7):
+    """Replace the seeded content with markdown, leaving the rendered columns empty"""
+    from app.models.blog_post import BlogPost
+
+    rng = random.Random(seed)
+    table = BlogPost.__table__
+    with engine.begin() as connection:
+        for post_id in range(1, posts + 1):
+            connection.execute(
+                table.update().where(table.c.id == post_id).values(content=markdown_post(rng, words), excerpt=None)
+            )
+
+
+def summary(name: str, latencies: list) -> str:
+    return (
+        f"{name:<40} p50 {percentile(latencies, 0.5) * 1000:7.2f} ms  "
+        f"p95 {percentile(latencies, 0.95) * 1000:7.2f} ms"
+    )
+
+
+def unsafe(html: str) -> bool:
+    # A rejected link stays in the text as written, only a live one is unsafe
+    return "<b>" in html or 'href="javascript:' in html
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url")
+    parser.add_argument("--posts", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--words", type=int, default=800)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    os.environ.setdefault("CACHE_BACKEND", "none")
+    configure_environment(args.database_url)
+
+    import httpx
+    from sqlalchemy import func, or_, select
+    from app.core.database import engine
+    from app.core.markdown import RENDER_VERSION, render_markdown
+    from app.models.blog_post import BlogPost
+    from app.services.post_render_service import backfill
+    from benchmarks.common import build_app
+
+    seed_posts(engine, args.posts)
+    store_markdown(engine, args.posts, args.words)
+
+    report = backfill(batch_size=args.batch_size)
+    print(
+        f"backfill: {report['rendered']} posts in {report['seconds']:.2f}s, "
+        f"{report['posts_per_second']:.0f} posts/s, {report['batches']} batches"
+    )
+
+    problems = []
+    with engine.connect() as connection:
+        stale = connection.scalar(select(func.count(BlogPost.id)).where(
+            or_(BlogPost.render_version.is_(None), BlogPost.render_version < RENDER_VERSION)
+        ))
+        if stale:
+            problems.append(f"{stale} posts left unrendered by the backfill")
+        if any(unsafe(html) for html in connection.scalars(select(BlogPost.content_html))):
+            problems.append("raw HTML or a javascript: link in a rendered post")
+
+    rng = random.Random(42)
+    post_ids = [rng.randint(1, args.posts) for _ in range(args.requests)]
+    new_posts = [markdown_post(rng, args.words) for _ in range(args.requests)]
+
+    async def run():
+        app = build_app()
+        await app.router.startup()
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            stored, per_view = [], []
+            for post_id in post_ids:
+                started = time.perf_counter()
+                response = await client.get(f"/api/posts/{post_id}")
+                response.raise_for_status()
+                stored.append(time.perf_counter() - started)
+                if not response.json()["content_html"]:
+                    problems.append(f"post {post_id} served without content_html")
+
+                # What rendering at read time adds to the same view
+                started = time.perf_counter()
+                response = await client.get(f"/api/posts/{post_id}")
+                render_markdown(response.json()["content"])
+                per_view.append(time.perf_counter() - started)
+            print(summary("GET post, stored HTML", stored))
+            print(summary("GET post, rendered per view (before)", per_view))
+
+            writes, renders = [], []
+            for index, content in enumerate(new_posts):
+                started = time.perf_counter()
+                response = await client.post("/api/posts", json={"title": f"Markdown post {index}", "content": content})
+                response.raise_for_status()
+                writes.append(time.perf_counter() - started)
+                if unsafe(response.json()["content_html"]):
+                    problems.append(f"unsafe HTML in created post {response.json()['id']}")
+
+                started = time.perf_counter()
+                render_markdown(content)
+                renders.append(time.perf_counter() - started)
+            print(summary("POST post, rendered on write", writes))
+            print(summary("  of which rendering", renders))
+        await app.router.shutdown()
+
+    asyncio.run(run())
+
+    for problem in problems:
+        print(f"  MISMATCH {problem}")
+    print("every post rendered and safe" if not problems else "rendering DOES NOT check out")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""A local stand-in for the OpenRouter chat completions API
+
+    python -m benchmarks.mock_openrouter --port 8099 --first-token 0.8 --tokens 200
+
+Point the app at it with OPENROUTER_BASE_URL=http://127.0.0.1:8099/api/v1.
+Answers with a fixed blog post in the JSON shape the AI service asks for,
+either at once or streamed token by token as server-sent events, after a
+configurable delay. --fail-rate makes that share of calls answer 503 so the
+retry path can be exercised.
+"""
+import argparse
+import asyncio
+import json
+import random
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+POST = {
+    "title": "Connection Pooling in Practice",
+    "content": " ".join(
+        ["Reusing connections saves a TCP and TLS handshake on every call."] * 40
+    ),
+    "excerpt": "Why long-lived HTTP clients are faster than one client per request.",
+    "tags": ["http", "performance", "python"]
+}
+
+
+def create_app(first_token: float = 0.5, token_delay: float = 0.005, tokens: int = 200,
+               fail_rate: float = 0.0) -> FastAPI:
+    app = FastAPI()
+    app.state.calls = 0
+    answer = json.dumps(POST)
+    step = max(1, len(answer) // tokens)
+    chunks = [answer[i:i + step] for i in range(0, len(answer), step)]
+
+    @app.post("/api/v1/chat/completions")
+    async def completions(request: Request):
+        body = await request.json()
+        app.state.calls += 1
+        if random.random() < fail_rate:
+            return JSONResponse({"error": {"message": "overloaded"}}, status_code=503)
+
+        if not body.get("stream"):
+            await asyncio.sleep(first_token + token_delay * len(chunks))
+            return {"choices": [{"message": {"role": "assistant", "content": answer}}]}
+
+        async def events():
+            yield ": OPENROUTER PROCESSING\n\n"
+            await asyncio.sleep(first_token)
+            for chunk in chunks:
+                data = {"choices": [{"delta": {"content": chunk}}]}
+                yield f"data: {json.dumps(data)}\n\n"
+                await asyncio.sleep(token_delay)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--first-token", type=float, default=0.5, help="seconds before the first token")
+    parser.add_argument("--token-delay", type=float, default=0.005, help="seconds between tokens")
+    parser.add_argument("--tokens", type=int, default=200)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    app = create_app(args.first_token, args.token_delay, args.tokens, args.fail_rate)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
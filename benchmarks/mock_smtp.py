@@ -0,0 +1,115 @@
+"""A local SMTP stand-in that accepts and counts mail
+
+    python -m benchmarks.mock_smtp --port 8025 --delay 0.002 --connect-delay 0.02
+
+Point the app at it with SMTP_HOST=127.0.0.1 SMTP_PORT=8025. Speaks enough
+SMTP for smtplib (EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP, QUIT), waits
+--connect-delay before its greeting (a stand-in for the TCP and TLS setup of
+a real server) and --delay before accepting each message, and counts the
+messages per recipient. --fail-rate refuses that share of recipients.
+"""
+import argparse
+import asyncio
+import random
+import re
+import threading
+from collections import Counter
+
+ADDRESS = re.compile(rb"<([^>]*)>")
+
+
+class MockSMTP:
+    def __init__(self, delay: float = 0.0, connect_delay: float = 0.0, fail_rate: float = 0.0):
+        self.delay = delay
+        self.connect_delay = connect_delay
+        self.fail_rate = fail_rate
+        self.received: Counter = Counter()
+        self.messages = 0
+        self.connections = 0
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        await asyncio.sleep(self.connect_delay)
+        writer.write(b"220 mock ESMTP\r\n")
+        recipients = []
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    return
+                command = line[:4].upper()
+                if command == b"EHLO":
+                    writer.write(b"250-mock\r\n250-8BITMIME\r\n250 SIZE 10485760\r\n")
+                elif command == b"MAIL":
+                    recipients = []
+                    writer.write(b"250 OK\r\n")
+                elif command == b"RCPT":
+                    if random.random() < self.fail_rate:
+                        writer.write(b"550 Mailbox unavailable\r\n")
+                    else:
+                        match = ADDRESS.search(line)
+                        recipients.append(match.group(1).decode() if match else "")
+                        writer.write(b"250 OK\r\n")
+                elif command == b"DATA":
+                    writer.write(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+                    await writer.drain()
+                    while (await reader.readline()) not in (b".\r\n", b""):
+                        pass
+                    await asyncio.sleep(self.delay)
+                    self.messages += 1
+                    self.received.update(recipients)
+                    writer.write(b"250 OK queued\r\n")
+                elif command == b"QUIT":
+                    writer.write(b"221 Bye\r\n")
+                    await writer.drain()
+                    return
+                elif command in (b"HELO", b"RSET", b"NOOP"):
+                    writer.write(b"250 OK\r\n")
+                else:
+                    writer.write(b"502 Command not implemented\r\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str, port: int) -> asyncio.AbstractServer:
+        return await asyncio.start_server(self.handle, host, port)
+
+
+def serve_in_thread(server: MockSMTP, host: str = "127.0.0.1") -> int:
+    """Run the server on a free port in a background thread, return the port"""
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    port = []
+
+    def run():
+        asyncio.set_event_loop(loop)
+        listener = loop.run_until_complete(server.serve(host, 0))
+        port.append(listener.sockets[0].getsockname()[1])
+        started.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    started.wait()
+    return port[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds before accepting a message")
+    parser.add_argument("--connect-delay", type=float, default=0.0, help="seconds before the greeting")
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    async def run():
+        server = await MockSMTP(args.delay, args.connect_delay, args.fail_rate).serve("127.0.0.1", args.port)
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""Newsletter fan-out throughput, and a crashed send resumed without mailing anyone twice
+
+    python -m benchmarks.newsletter_send --subscribers 5000 --connections 4 --delay 0.002 --connect-delay 0.02
+
+Sends an issue to `--subscribers` subscribers (English, Bengali and Hindi
+readers, a tenth of them unsubscribed) through the local SMTP stand-in in
+benchmarks.mock_smtp, three ways:
+
+- a new connection per message;
+- one pooled connection;
+- `--connections` pooled connections;
+
+checking each time that every active subscriber got exactly one mail and
+nobody else got any. Then starts a send in a child process, kills it once a
+third of the mail is out and resumes it here, checking that nobody got two
+mails and everyone got one except, at most, the batch the crash left
+"unknown". Exits with status 1 if any of that is off.
+"""
+import argparse
+import subprocess
+import sys
+import time
+from collections import Counter
+from benchmarks.common import configure_environment
+
+LANGUAGES = ("en", "bn", "hi")
+
+
+def seed_subscribers(engine, subscribers: int) -> set:
+    """Insert the subscribers, returns the addresses of the active ones"""
+    from app.models.newsletter import NewsletterSubscription
+
+    rows = [
+        {
+            "id": i,
+            "email": f"reader{i}@example.com",
+            "name": f"Reader {i}" if i % 2 else None,
+            "language": LANGUAGES[i % len(LANGUAGES)],
+            "active": i % 10 != 0
+        }
+        for i in range(1, subscribers + 1)
+    ]
+    with engine.begin() as connection:
+        connection.execute(NewsletterSubscription.__table__.insert(), rows)
+    return {row["email"] for row in rows if row["active"]}
+
+
+def create_issue(name: str) -> int:
+    import asyncio
+    from app.core.database import SessionLocal
+    from app.schemas.newsletter import NewsletterIssueCreate
+    from app.services.newsletter_service import NewsletterService
+
+    db = SessionLocal()
+    try:
+        issue = asyncio.run(NewsletterService(db).create_issue(NewsletterIssueCreate(
+            subject=f"This week on the blog ({name})", intro="Five posts worth a read.", post_ids=[1, 2, 3, 4, 5]
+        )))
+    finally:
+        db.close()
+    return issue["id"]
+
+
+def send(issue_id: int, port: int, connections: int, max_messages: int, batch_size: int,
+         lease_seconds: float = None) -> dict:
+    """Claim an issue and send it in this process"""
+    from app.core.config import settings
+    from app.core.database import SessionLocal
+    from app.core.mail import SmtpPool
+    from app.services.newsletter_service import claim_issue, send_issue
+
+    db = SessionLocal()
+    try:
+        claim_issue(db, issue_id, settings.NEWSLETTER_LEASE_SECONDS if lease_seconds is None else lease_seconds)
+    finally:
+        db.close()
+    pool = SmtpPool("127.0.0.1", port, size=connections, max_messages=max_messages)
+    try:
+        report = send_issue(issue_id, pool, batch_size=batch_size)
+    finally:
+        pool.close()
+    report["connections_opened"] = pool.connections_opened
+    return report
+
+
+def check(received: Counter, expected: set, unknown: set = frozenset()) -> list:
+    """Everything that doesn't add up, as messages"""
+    problems = []
+    twice = sorted(email for email, count in received.items() if count > 1)
+    if twice:
+        problems.append(f"{len(twice)} subscribers got more than one mail, e.g. {twice[0]}")
+    strangers = set(received) - expected
+    if strangers:
+        problems.append(f"{len(strangers)} mails to inactive or unknown addresses, e.g. {min(strangers)}")
+    missed = expected - set(received) - unknown
+    if missed:
+        problems.append(f"{len(missed)} subscribers got no mail, e.g. {min(missed)}")
+    return problems
+
+
+def deliveries(engine, issue_id: int):
+    """Delivery status per address, and the issue's counters"""
+    from sqlalchemy import select
+    from app.models.newsletter import NewsletterDelivery, NewsletterIssue, NewsletterSubscription
+
+    with engine.connect() as connection:
+        statuses = dict(connection.execute(
+            select(NewsletterSubscription.email, NewsletterDelivery.status)
+            .join(NewsletterSubscription, NewsletterSubscription.id == NewsletterDelivery.subscriber_id)
+            .where(NewsletterDelivery.issue_id == issue_id)
+        ).all())
+        issue = connection.execute(
+            select(NewsletterIssue.status, NewsletterIssue.sent_count, NewsletterIssue.unknown_count)
+            .where(NewsletterIssue.id == issue_id)
+        ).one()
+    return statuses, issue
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url")
+    parser.add_argument("--subscribers", type=int, default=5000)
+    parser.add_argument("--connections", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--delay", type=float, default=0.002, help="seconds the SMTP server takes per message")
+    parser.add_argument("--connect-delay", type=float, default=0.02, help="seconds before the SMTP greeting")
+    # Internal: the child process of the crash test
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--smtp-port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    configure_environment(args.database_url)
+
+    if args.worker:
+        send(args.worker, args.smtp_port, args.connections, 1000, args.batch_size)
+        return
+
+    from app.core.database import engine
+    from benchmarks.common import seed_posts
+    from benchmarks.mock_smtp import MockSMTP, serve_in_thread
+
+    seed_posts(engine, posts=5)
+    expected = seed_subscribers(engine, args.subscribers)
+    print(f"{len(expected)} active subscribers of {args.subscribers}")
+
+    failed = False
+    for name, connections, max_messages in (
+        ("connection per message", 1, 1),
+        ("one pooled connection", 1, 1000),
+        (f"{args.connections} pooled connections", args.connections, 1000),
+    ):
+        server = MockSMTP(args.delay, args.connect_delay)
+        port = serve_in_thread(server)
+        report = send(create_issue(name), port, connections, max_messages, args.batch_size)
+        print(
+            f"{name:<26} {report['messages_per_second']:8.0f} messages/s  {report['seconds']:6.1f}s  "
+            f"{report['connections_opened']:5d} connections  {report['batches']} batches"
+        )
+        problems = check(server.received, expected)
+        for problem in problems:
+            print(f"  MISMATCH {problem}")
+        failed = failed or bool(problems)
+
+    server = MockSMTP(args.delay, args.connect_delay)
+    port = serve_in_thread(server)
+    issue_id = create_issue("crash")
+    child = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.newsletter_send", "--worker", str(issue_id),
+        "--smtp-port", str(port), "--connections", str(args.connections), "--batch-size", str(args.batch_size)
+    ])
+    while server.messages < len(expected) // 3 and child.poll() is None:
+        time.sleep(0.001)
+    child.kill()
+    child.wait()
+    before = server.messages
+
+    # The child is known to be dead, so don't wait out its lease
+    report = send(issue_id, port, args.connections, 1000, args.batch_size, lease_seconds=0)
+    statuses, issue = deliveries(engine, issue_id)
+    unknown = {email for email, status in statuses.items() if status == "unknown"}
+    print(
+        f"crashed after {before} mails, resumed: {report['sent']} more; issue {issue.status}, "
+        f"{issue.sent_count} sent, {issue.unknown_count} unknown "
+        f"({sum(1 for email in unknown if server.received[email])} of them did get the mail)"
+    )
+    problems = check(server.received, expected, unknown)
+    if issue.status != "sent":
+        problems.append(f"issue is {issue.status} after the resumed send")
+    if len(unknown) > args.batch_size:
+        problems.append(f"{len(unknown)} unknown deliveries, more than one batch")
+    for problem in problems:
+        print(f"  MISMATCH {problem}")
+    failed = failed or bool(problems)
+
+    print("every subscriber mailed at most once" if not failed else "deliveries DO NOT add up")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Throughput and exactness of poll voting under a burst of concurrent votes
+
+    python -m benchmarks.poll_votes --voters 5000 --repeat 0.2 --concurrency 500
+
+Fires `--voters` votes at once through POST /api/polls/{id}/vote, each from
+its own IP address (sent as X-Forwarded-For), plus a `--repeat` share of
+second votes from the same addresses. Runs once with one transaction per
+vote (max_batch=1) and once with the batched writer, and checks each time
+that:
+
+- every address got exactly one 201, the repeats 409;
+- each option's vote_count equals its rows in poll_votes and the 201s for it;
+- GET /results reports the same counts.
+
+Exits with status 1 if any count is off.
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from collections import Counter
+from benchmarks.common import configure_environment, percentile
+
+
+async def run(app, poll_id: int, option_ids, voters: int, repeat: float, concurrency: int, seed: int):
+    import httpx
+
+    rng = random.Random(seed)
+    votes = [(f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}", rng.choice(option_ids)) for i in range(voters)]
+    votes += [(ip, rng.choice(option_ids)) for ip, _ in rng.sample(votes, int(voters * repeat))]
+    rng.shuffle(votes)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, statuses, counted = [], Counter(), Counter()
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", limits=limits) as client:
+        async def vote(ip, option_id):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post(
+                    f"/api/polls/{poll_id}/vote", json={"option_id": option_id},
+                    headers={"X-Forwarded-For": ip}
+                )
+                latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] += 1
+            if response.status_code == 201:
+                counted[option_id] += 1
+            return ip, response.status_code
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(vote(ip, option_id) for ip, option_id in votes))
+        seconds = time.perf_counter() - started
+        reported = (await client.get(f"/api/polls/{poll_id}/results")).json()
+
+    accepted = Counter(ip for ip, status in results if status == 201)
+    return {
+        "seconds": seconds,
+        "latencies": latencies,
+        "statuses": statuses,
+        "counted": counted,
+        "accepted": accepted,
+        "reported": {option["id"]: option["vote_count"] for option in reported["options"]},
+        "voters": voters
+    }
+
+
+def check(engine, poll_id: int, outcome: dict) -> list:
+    """Everything that doesn't add up, as messages"""
+    from sqlalchemy import func, select
+    from app.models.poll import PollOption, PollVote
+
+    problems = []
+    with engine.connect() as connection:
+        stored = dict(connection.execute(
+            select(PollOption.id, PollOption.vote_count).where(PollOption.poll_id == poll_id)
+        ).all())
+        rows = dict(connection.execute(
+            select(PollVote.option_id, func.count()).where(PollVote.poll_id == poll_id).group_by(PollVote.option_id)
+        ).all())
+
+    if len(outcome["accepted"]) != outcome["voters"] or max(outcome["accepted"].values()) != 1:
+        problems.append(f"{len(outcome['accepted'])} addresses accepted for {outcome['voters']} voters")
+    for option_id, vote_count in stored.items():
+        expected = (rows.get(option_id, 0), outcome["counted"][option_id], outcome["reported"].get(option_id))
+        if any(value != vote_count for value in expected):
+            problems.append(
+                f"option {option_id}: vote_count {vote_count}, rows {expected[0]}, "
+                f"201s {expected[1]}, results {expected[2]}"
+            )
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url")
+    parser.add_argument("--voters", type=int, default=5000)
+    parser.add_argument("--repeat", type=float, default=0.2, help="share of voters who vote twice")
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--options", type=int, default=4)
+    args = parser.parse_args()
+
+    configure_environment(args.database_url)
+
+    from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
+    from app.core.database import Base, SessionLocal, engine
+    from app.schemas.poll import PollCreate
+    from app.services.poll_service import PollService, poll_votes
+    from benchmarks.common import build_app
+    import app.models  # noqa: F401  (register every table)
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    failed = False
+    for name, max_batch in (("one transaction per vote", 1), ("batched", poll_votes.max_batch)):
+        poll_votes.max_batch = max_batch
+        poll_votes.batches = poll_votes.largest_batch = 0
+
+        db = SessionLocal()
+        try:
+            poll = asyncio.run(PollService(db).create_poll(PollCreate(
+                question=f"Benchmark poll ({name})?", options=[f"Option {i}" for i in range(args.options)]
+            )))
+        finally:
+            db.close()
+        option_ids = [option["id"] for option in poll["options"]]
+
+        async def measure():
+            app = build_app()
+            await app.router.startup()
+            try:
+                return await run(
+                    ProxyHeadersMiddleware(app, trusted_hosts="*"), poll["id"], option_ids,
+                    args.voters, args.repeat, args.concurrency, seed=42
+                )
+            finally:
+                await app.router.shutdown()
+
+        outcome = asyncio.run(measure())
+        latencies = sorted(outcome["latencies"])
+        statuses = ", ".join(f"{status}: {count}" for status, count in sorted(outcome["statuses"].items()))
+        print(
+            f"{name:<26} {len(latencies) / outcome['seconds']:8.0f} votes/s  "
+            f"p50 {percentile(latencies, 0.5) * 1000:7.1f}  p99 {percentile(latencies, 0.99) * 1000:7.1f} ms  "
+            f"{poll_votes.batches} transactions (largest {poll_votes.largest_batch})  [{statuses}]"
+        )
+        problems = check(engine, poll["id"], outcome)
+        for problem in problems:
+            print(f"  MISMATCH {problem}")
+        failed = failed or bool(problems)
+
+    print("counts exact" if not failed else "counts DO NOT add up")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Related posts index: build time, memory, updates and lookups
+
+    python -m benchmarks.related_posts --posts 10000,100000 --words 300
+
+Generates posts on `--posts // 50` topics: each topic has its own words and
+tags, and a post mixes words of its topic with words common to all of them.
+For every size it builds the index from memory (the database read is left
+out, so only the index is timed), then:
+
+- adds `--updates` new posts one at a time and removes as many;
+- looks up the related posts of random posts;
+- checks how many of each post's related posts are on its topic, which
+  should be nearly all of them.
+
+Exits with status 1 if less than 90% of the related posts are on topic.
+"""
+import argparse
+import random
+import sys
+import time
+from benchmarks.common import configure_environment, percentile
+
+COMMON_WORDS = 3000
+WORDS_PER_TOPIC = 60
+TAGS_PER_TOPIC = 3
+TOPIC_SHARE = 0.4
+
+
+class Corpus:
+    """Posts drawn from topics, with the topic of each post"""
+
+    def __init__(self, topics: int, words: int, seed: int = 42):
+        self.rng = random.Random(seed)
+        self.words = words
+        self.common = [f"common{i}" for i in range(COMMON_WORDS)]
+        # Zipf-like: a few common words are used a lot
+        self.common_weights = [1 / (rank + 1) for rank in range(COMMON_WORDS)]
+        self.topic_words = [[f"topic{t}word{i}" for i in range(WORDS_PER_TOPIC)] for t in range(topics)]
+        self.topic_tags = [[f"tag{t}x{i}" for i in range(TAGS_PER_TOPIC)] for t in range(topics)]
+        self.topics = {}
+
+    def post(self, post_id: int):
+        """(id, title, excerpt, content) and tags of a new post"""
+        topic = self.rng.randrange(len(self.topic_words))
+        self.topics[post_id] = topic
+        topical = round(self.words * TOPIC_SHARE)
+        words = self.rng.choices(self.topic_words[topic], k=topical) + self.rng.choices(
+            self.common, self.common_weights, k=self.words - topical
+        )
+        self.rng.shuffle(words)
+        title = " ".join(self.rng.choices(self.topic_words[topic], k=3) + self.rng.choices(self.common, k=3))
+        tags = self.rng.sample(self.topic_tags[topic], 2) + [f"tag{self.rng.randrange(len(self.topic_tags))}x0"]
+        return (post_id, title, " ".join(words[:30]), " ".join(words)), tags
+
+
+def on_topic(index, corpus: Corpus, post_ids) -> float:
+    """Share of the related posts of `post_ids` that are on the same topic"""
+    related = same = 0
+    for post_id in post_ids:
+        for other in index.related(post_id) or ():
+            related += 1
+            same += corpus.topics[other] == corpus.topics[post_id]
+    return same / related if related else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", default="10000,100000", help="comma separated index sizes")
+    parser.add_argument("--words", type=int, default=300)
+    parser.add_argument("--updates", type=int, default=200)
+    parser.add_argument("--lookups", type=int, default=10000)
+    args = parser.parse_args()
+
+    configure_environment()
+    from app.services.related_posts import RelatedPostsIndex
+
+    failed = False
+    for size in (int(value) for value in args.posts.split(",")):
+        corpus = Corpus(max(1, size // 50), args.words)
+        posts, tags = [], {}
+        for post_id in range(1, size + 1):
+            post, post_tags = corpus.post(post_id)
+            posts.append(post)
+            tags[post_id] = post_tags
+
+        started = time.perf_counter()
+        index = RelatedPostsIndex.build(posts, tags)
+        build_seconds = time.perf_counter() - started
+
+        adds = []
+        for post_id in range(size + 1, size + args.updates + 1):
+            post, post_tags = corpus.post(post_id)
+            started = time.perf_counter()
+            index.add(*post, post_tags)
+            adds.append(time.perf_counter() - started)
+        added_on_topic = on_topic(index, corpus, range(size + 1, size + args.updates + 1))
+
+        removes = []
+        for post_id in corpus.rng.sample(range(1, size + 1), args.updates):
+            started = time.perf_counter()
+            index.remove(post_id)
+            removes.append(time.perf_counter() - started)
+
+        lookup_ids = [corpus.rng.randint(1, size) for _ in range(args.lookups)]
+        started = time.perf_counter()
+        for post_id in lookup_ids:
+            index.related(post_id)
+        lookup_us = (time.perf_counter() - started) / len(lookup_ids) * 1e6
+
+        share = on_topic(index, corpus, range(1, size + 1))
+        print(
+            f"{size:>7} posts: build {build_seconds:6.1f}s ({size / build_seconds:6.0f} posts/s), "
+            f"{index.nbytes() / 2 ** 20:5.0f} MiB, "
+            f"add p50 {percentile(adds, 0.5) * 1000:5.1f} ms, remove p50 {percentile(removes, 0.5) * 1000:5.2f} ms, "
+            f"lookup {lookup_us:4.1f} us, on topic {share:.1%} (added posts {added_on_topic:.1%})"
+        )
+        if share < 0.9 or added_on_topic < 0.9:
+            print("  MISMATCH fewer than 90% of the related posts share the post's topic")
+            failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""Trending posts: precomputed rankings vs ranking per request
+
+    python -m benchmarks.trending --posts 20000 --active 5000 --requests 200
+
+Seeds `--posts` posts, and hourly view buckets over the last week for
+`--active` of them, a few of them much more viewed than the rest. Then:
+
+- times GET /api/posts/top with and without the (published, view_count)
+  index, which is what it sorted on before;
+- times GET /api/posts/trending for each window, served from the
+  precomputed ranking, against ranking the buckets on every request;
+- times a ranking refresh, and a view counter flush of `--views` views
+  into the hourly buckets.
+
+The response cache is off so every request goes to the database. Exits with
+status 1 if a ranking differs from decayed scores computed here, or if a
+flushed view is missing from its bucket.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from benchmarks.common import configure_environment, percentile, seed_posts
+
+
+def seed_buckets(engine, posts: int, active: int, hour: int, seed: int = 7) -> dict:
+    """Insert a week of hourly views for `active` posts, returns {(post id, hour): views}"""
+    from app.models.blog_stat import PostViewBucket
+    from app.services.trending import KEEP_HOURS
+
+    rng = random.Random(seed)
+    buckets = {}
+    for post_id in rng.sample(range(1, posts + 1), active):
+        # Popularity falls off steeply, and each post peaks at its own hour
+        popularity = rng.paretovariate(1.2)
+        peak = hour - rng.randrange(KEEP_HOURS)
+        for bucket in range(max(peak - 12, hour - KEEP_HOURS + 1), min(peak + 12, hour) + 1):
+            views = int(popularity * 20 / (1 + abs(bucket - peak)))
+            if views:
+                buckets[post_id, bucket] = views
+
+    with engine.begin() as connection:
+        connection.execute(PostViewBucket.__table__.insert(), [
+            {"post_id": post_id, "hour": bucket, "views": views} for (post_id, bucket), views in buckets.items()
+        ])
+    return buckets
+
+
+def expected_ranking(buckets: dict, window, hour: int, size: int):
+    """Every post's score, and (post id, score) of the top `size`, computed without the database"""
+    scores = {}
+    for (post_id, bucket), views in buckets.items():
+        if hour - window.hours < bucket <= hour:
+            scores[post_id] = scores.get(post_id, 0.0) + views * 0.5 ** ((hour - bucket) / window.half_life)
+    return scores, sorted(scores.items(), key=lambda item: (-item[1], -item[0]))[:size]
+
+
+def same_ranking(ranking, expected, scores: dict) -> bool:
+    """Whether `ranking` has the expected scores, in order; posts with equal scores may swap"""
+    def close(a, b):
+        return abs(a - b) <= 1e-6 * max(1.0, b)
+
+    return len(ranking) == len(expected) and all(
+        close(score, want) and close(score, scores.get(post_id, 0.0))
+        for (post_id, score), (_, want) in zip(ranking, expected)
+    )
+
+
+def summary(name: str, latencies: list) -> str:
+    return (
+        f"{name:<44} p50 {percentile(latencies, 0.5) * 1000:7.2f} ms  "
+        f"p95 {percentile(latencies, 0.95) * 1000:7.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url")
+    parser.add_argument("--posts", type=int, default=20000)
+    parser.add_argument("--active", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--views", type=int, default=20000)
+    args = parser.parse_args()
+
+    os.environ.setdefault("CACHE_BACKEND", "none")
+    configure_environment(args.database_url)
+
+    import httpx
+    from sqlalchemy import select
+    from app.core.database import SessionLocal, engine
+    from app.models.blog_post import BlogPost
+    from app.models.blog_stat import PostViewBucket
+    from app.services.trending import WINDOWS, TrendingService, current_hour, trending_posts
+    from app.services.view_counter import view_counter
+    from benchmarks.common import build_app
+
+    hour = current_hour()
+    seed_posts(engine, args.posts)
+    started = time.perf_counter()
+    buckets = seed_buckets(engine, args.posts, args.active, hour)
+    print(f"seeded {len(buckets)} hourly buckets for {args.active} posts in {time.perf_counter() - started:.1f}s")
+
+    problems = []
+    top_index = next(index for index in BlogPost.__table__.indexes if index.name == "ix_blog_posts_published_view_count")
+
+    async def run():
+        app = build_app()
+        await app.router.startup()
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            async def timed(url: str, requests: int) -> list:
+                latencies = []
+                for _ in range(requests):
+                    started = time.perf_counter()
+                    response = await client.get(url)
+                    response.raise_for_status()
+                    latencies.append(time.perf_counter() - started)
+                return latencies
+
+            print(summary("GET /posts/top, (published, view_count) index", await timed("/api/posts/top", args.requests)))
+            top_index.drop(engine)
+            print(summary("GET /posts/top, no index (before)", await timed("/api/posts/top", args.requests)))
+            top_index.create(engine)
+
+            started = time.perf_counter()
+            trending_posts.refresh()
+            print(f"ranking refresh, every window: {(time.perf_counter() - started) * 1000:.1f} ms")
+
+            for name, window in WINDOWS.items():
+                ranking = trending_posts.trending(name)
+                scores, expected = expected_ranking(buckets, window, hour, trending_posts.size)
+                if not same_ranking(ranking, expected, scores):
+                    problems.append(f"{name} ranking differs from the decayed scores")
+                response = await client.get(f"/api/posts/trending?window={name}&limit=10")
+                if [post["id"] for post in response.json()] != [post_id for post_id, _ in ranking[:10]]:
+                    problems.append(f"GET /posts/trending?window={name} differs from the ranking")
+
+                print(summary(f"GET /posts/trending?window={name}", await timed(
+                    f"/api/posts/trending?window={name}&limit=10", args.requests
+                )))
+                # What every request did if it ranked the buckets itself
+                per_request = []
+                for _ in range(args.requests):
+                    started = time.perf_counter()
+                    db = SessionLocal()
+                    try:
+                        TrendingService(db).rank(window, hour, 10)
+                    finally:
+                        db.close()
+                    per_request.append(time.perf_counter() - started)
+                print(summary(f"  ranking the buckets per request (window {name})", per_request))
+        await app.router.shutdown()
+
+    asyncio.run(run())
+
+    # Views going through the buffer into the buckets of the current hour
+    rng = random.Random(11)
+    added = {}
+    for _ in range(args.views):
+        post_id = rng.randint(1, args.posts)
+        view_counter.add(post_id)
+        added[post_id] = added.get(post_id, 0) + 1
+    hour = current_hour()
+    started = time.perf_counter()
+    view_counter.flush()
+    print(f"flush of {args.views} views on {len(added)} posts: {(time.perf_counter() - started) * 1000:.1f} ms")
+    with engine.connect() as connection:
+        stored = dict(connection.execute(
+            select(PostViewBucket.post_id, PostViewBucket.views).where(PostViewBucket.hour == hour)
+        ).all())
+    for post_id, views in added.items():
+        if stored.get(post_id, 0) - buckets.get((post_id, hour), 0) != views:
+            problems.append(f"post {post_id}: {views} views flushed, bucket holds {stored.get(post_id)}")
+            break
+
+    for problem in problems:
+        print(f"  MISMATCH {problem}")
+    print("rankings and buckets check out" if not problems else "trending DOES NOT check out")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+// Development copy; the static build replaces it with the hashed asset names
+self.PRECACHE_MANIFEST = {
+    "version": "dev",
+    "pages": ["/"],
+    "assets": [
+        "/css/chatbot.css",
+        "/css/style.css",
+        "/js/app.js",
+        "/js/chatbot.js",
+        "/js/comments.js",
+        "/logo.svg"
+    ]
+};
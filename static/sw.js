@@ -1,17 +1,21 @@
 // Service Worker for caching and performance optimization
-const CACHE_NAME = 'techsci-blog-v1.0.0';
-const STATIC_CACHE = 'techsci-static-v1.0.0';
+
+// Defines self.PRECACHE_MANIFEST: the pages and same-origin assets to cache
+// on install, and a version that changes with them. The static build
+// (python -m app.core.static_build) writes it with the content-hashed asset
+// names; the copy in static/ lists the plain names for development.
+importScripts('/precache-manifest.js');
+
+const STATIC_CACHE = `techsci-static-${self.PRECACHE_MANIFEST.version}`;
 const DYNAMIC_CACHE = 'techsci-dynamic-v1.0.0';
 
+// Hashed assets never change, so they are served cache-first
+const PRECACHED_ASSETS = new Set(self.PRECACHE_MANIFEST.assets);
+
 // Resources to cache immediately
 const STATIC_ASSETS = [
-    '/',
-    '/css/style.css',
-    '/css/chatbot.css',
-    '/js/app.js',
-    '/js/chatbot.js',
-    '/js/comments.js',
-    '/logo.svg',
+    ...self.PRECACHE_MANIFEST.pages,
+    ...self.PRECACHE_MANIFEST.assets,
     'https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap',
     'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css'
 ];
@@ -64,7 +68,7 @@ self.addEventListener('fetch', event => {
     }
 
     // Cache-first strategy for static assets
-    if (STATIC_ASSETS.some(asset => url.href.includes(asset))) {
+    if (PRECACHED_ASSETS.has(url.pathname)) {
         event.respondWith(
             caches.match(event.request)
                 .then(response => {
@@ -0,0 +1,78 @@
+"""Fixtures: the API on a fresh SQLite database for every test
+
+The app reads its settings when it is imported, so the environment is set up
+here, before any test imports from `app`. The response cache is off, so every
+request reaches the database.
+"""
+import os
+
+import pytest
+from benchmarks.common import configure_environment
+
+os.environ.setdefault("CACHE_BACKEND", "none")
+configure_environment()
+
+SEEDED_POSTS = 30
+
+
+@pytest.fixture
+def engine():
+    """The app's engine, on empty tables"""
+    from app.core.database import Base, engine
+    import app.models  # noqa: F401  (register every table)
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    # The search table is outside the models; the app builds it again on startup
+    with engine.begin() as connection:
+        connection.exec_driver_sql("DROP TABLE IF EXISTS blog_posts_fts")
+    return engine
+
+
+@pytest.fixture
+def session(engine):
+    from app.core.database import SessionLocal
+
+    db = SessionLocal()
+    yield db
+    db.close()
+
+
+def start_client():
+    from fastapi.testclient import TestClient
+    from benchmarks.common import build_app
+
+    return TestClient(build_app())
+
+
+@pytest.fixture
+def client(engine):
+    """A TestClient on the API, started up on empty tables"""
+    with start_client() as client:
+        yield client
+
+
+@pytest.fixture
+def seeded_client(engine):
+    """A TestClient on the API, started up on SEEDED_POSTS published posts with tags"""
+    from benchmarks.common import seed_posts
+
+    seed_posts(engine, SEEDED_POSTS)
+    with start_client() as client:
+        yield client
+
+
+@pytest.fixture
+def request_stats(monkeypatch):
+    """The RequestStats (statements run, ...) of every request made, in order"""
+    from app.core.metrics import metrics
+
+    recorded = []
+    observe_request = metrics.observe_request
+
+    def observe(method, route, status, seconds, stats):
+        recorded.append(stats)
+        observe_request(method, route, status, seconds, stats)
+
+    monkeypatch.setattr(metrics, "observe_request", observe)
+    return recorded
@@ -0,0 +1,61 @@
+import asyncio
+import json
+
+import httpx
+from sqlalchemy.exc import OperationalError
+
+from app.services.ai_service import AIService, ai_service
+from app.services.async_blog_post_service import AsyncBlogPostService
+from app.services.blog_post_service import BlogPostService
+
+ANSWER = {"title": "A generated post", "content": "Generated content that is long enough.", "tags": ["ai"]}
+
+
+def test_backoff_gives_the_concurrency_slot_back():
+    attempts = []
+
+    async def upstream(request):
+        prompt = json.loads(request.content)["messages"][1]["content"]
+        attempts.append(prompt)
+        if prompt == "first" and attempts.count("first") == 1:
+            return httpx.Response(503, headers={"Retry-After": "0.3"})
+        return httpx.Response(200, json={"choices": [{"message": {"content": json.dumps(ANSWER)}}]})
+
+    async def run():
+        service = AIService(base_url="http://upstream", api_key="test", max_concurrency=1, max_retries=2)
+        service.start()
+        service._client = httpx.AsyncClient(transport=httpx.MockTransport(upstream))
+        finished = []
+
+        async def generate(prompt):
+            await service.generate_blog_post(prompt)
+            finished.append(prompt)
+
+        first = asyncio.create_task(generate("first"))
+        await asyncio.sleep(0.05)
+        await asyncio.gather(first, generate("second"))
+        await service.stop()
+        return finished
+
+    # "second" ran while "first" waited to retry, in the one slot there is
+    assert asyncio.run(run()) == ["second", "first"]
+    assert attempts == ["first", "second", "first"]
+
+
+def test_stream_ends_with_an_error_event_when_saving_fails(client, monkeypatch):
+    async def stream_blog_post(prompt):
+        yield json.dumps(ANSWER)
+
+    async def create_post(self, post_data, ai_prompt=None):
+        raise OperationalError("INSERT INTO blog_posts", {}, Exception("database is locked"))
+
+    monkeypatch.setattr(ai_service, "stream_blog_post", stream_blog_post)
+    monkeypatch.setattr(BlogPostService, "create_post", create_post)
+    monkeypatch.setattr(AsyncBlogPostService, "create_post", create_post)
+
+    response = client.post("/api/posts/generate/stream", json={"prompt": "Write about databases"})
+
+    assert response.status_code == 200
+    events = [block.split("\n")[0] for block in response.text.strip().split("\n\n")]
+    assert events == [": generating", "event: token", "event: error"]
+    assert "database is locked" in response.text
@@ -0,0 +1,70 @@
+import json
+
+from app.services.archive_service import PostArchiveService
+from tests.conftest import SEEDED_POSTS
+
+
+def ndjson(records) -> str:
+    return "\n".join(json.dumps(record) for record in records) + "\n"
+
+
+def test_export_imports_back(seeded_client):
+    archive = seeded_client.get("/api/posts/export").text
+
+    report = seeded_client.post("/api/posts/import", content=archive).json()
+
+    assert report["imported"] == SEEDED_POSTS and report["skipped"] == 0
+    assert report["aborted"] is False
+
+
+def test_lines_failing_the_post_schema_are_skipped(client):
+    valid = {"title": "A valid post", "content": "Long enough content.", "tags": ["python"], "published": True}
+    report = client.post("/api/posts/import", content=ndjson([
+        valid,
+        {**valid, "title": "ab"},
+        {**valid, "content": 12345678901},
+        {**valid, "tags": "python"},
+        {**valid, "view_count": -5},
+        {**valid, "created_at": "yesterday"},
+        {**valid, "excerpt": "x" * 501},
+        ["not", "an", "object"],
+    ]) + "{not json\n").json()
+
+    assert report["imported"] == 1 and report["skipped"] == 8
+    assert [error["line"] for error in report["errors"]] == list(range(2, 10))
+    assert report["errors"][0]["error"].startswith("title: String should have at least 3 characters")
+    assert report["errors"][2]["error"].startswith("tags: ")
+
+
+def test_import_stopped_by_the_database_is_reported(client, monkeypatch):
+    import_batch = PostArchiveService.import_batch
+    calls = []
+
+    def failing_second_batch(self, posts):
+        calls.append(len(posts))
+        if len(calls) == 2:
+            raise RuntimeError("database is locked")
+        return import_batch(self, posts)
+
+    monkeypatch.setattr(PostArchiveService, "import_batch", failing_second_batch)
+    posts = [{"title": f"Post number {i}", "content": "Long enough content."} for i in range(5)]
+
+    response = client.post("/api/posts/import?batch_size=2", content=ndjson(posts))
+
+    assert response.status_code == 409
+    report = response.json()
+    assert report["aborted"] is True and report["imported"] == 2
+    assert "database is locked" in report["error"]
+
+
+def test_short_translations_are_served(client):
+    report = client.post("/api/posts/import", content=ndjson([{
+        "title": "A post in English", "content": "Some content in English.", "published": True,
+        "title_bn": "পোস্ট", "content_bn": "লেখা"
+    }])).json()
+    assert report["imported"] == 1
+
+    post_id = client.get("/api/posts").json()["content"][0]["id"]
+    response = client.get(f"/api/posts/{post_id}?lang=bn")
+    assert response.status_code == 200
+    assert response.json()["title"] == "পোস্ট" and response.json()["content"] == "লেখা"
@@ -0,0 +1,47 @@
+from sqlalchemy import text, update
+
+from app.core.markdown import excerpt, plain_text
+from app.models.blog_post import BlogPost
+from tests.conftest import start_client
+
+
+def test_list_makes_excerpt_for_posts_stored_without_one(engine, seeded_client):
+    with engine.begin() as connection:
+        connection.execute(update(BlogPost).where(BlogPost.id == 3).values(
+            excerpt=None, content="# Heading\n\nSome **bold** words and a [link](https://example.com)."
+        ))
+
+    posts = {post["id"]: post for post in seeded_client.get("/api/posts?size=50").json()["content"]}
+
+    assert posts[3]["excerpt"] == excerpt(plain_text("# Heading\n\nSome **bold** words and a [link](https://example.com)."))
+    assert posts[3]["excerpt"] == "Heading Some bold words and a link."
+    # Stored excerpts are served as they are
+    assert posts[4]["excerpt"]
+
+
+def test_list_page_runs_a_fixed_number_of_statements(seeded_client, request_stats):
+    for size in (5, 20):
+        response = seeded_client.get(f"/api/posts?size={size}")
+        assert response.status_code == 200
+        assert len(response.json()["content"]) == size
+    # Count, page, tags of the page: the same for any page size
+    assert [stats.statements for stats in request_stats] == [3, 3]
+
+    request_stats.clear()
+    response = seeded_client.get("/api/posts?size=20&cursor=")
+    assert response.status_code == 200
+    # Page and tags, no count in cursor mode
+    assert [stats.statements for stats in request_stats] == [2]
+
+
+def test_statistics_are_built_on_a_database_without_the_stats_table(engine):
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE blog_stats"))
+        connection.execute(text(
+            "INSERT INTO blog_posts (id, title, content, published, created_at) VALUES (1, 'First', 'First post.', 1, '2024-01-01')"
+        ))
+
+    with start_client() as client:
+        response = client.get("/api/posts/stats")
+    assert response.status_code == 200
+    assert response.json()["total_posts"] == 1
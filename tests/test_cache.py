@@ -0,0 +1,61 @@
+import asyncio
+from email.utils import formatdate
+
+from starlette.requests import Request
+
+from app.core.cache import MemoryCacheBackend, ResponseCache
+
+
+def request(path: str = "/api/posts", **headers) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": path,
+        "query_string": b"",
+        "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()],
+    })
+
+
+def test_conditional_requests_use_the_etag_only():
+    cache = ResponseCache(MemoryCacheBackend())
+
+    async def run():
+        body = {"version": 1}
+
+        async def produce():
+            return body
+
+        first = await cache.respond(request(), ["posts"], produce)
+        etag, last_modified = first.headers["etag"], first.headers["last-modified"]
+        assert (await cache.respond(request(if_none_match=etag), ["posts"], produce)).status_code == 304
+
+        # Changed within the same second: Last-Modified can't tell the two apart
+        body = {"version": 2}
+        await cache.invalidate("posts")
+        second = await cache.respond(request(if_modified_since=last_modified), ["posts"], produce)
+        assert second.status_code == 200 and second.body == b'{"version":2}'
+        assert (await cache.respond(request(if_none_match=etag), ["posts"], produce)).status_code == 200
+        future = formatdate(usegmt=True)
+        assert (await cache.respond(request(if_modified_since=future), ["posts"], produce)).status_code == 200
+
+    asyncio.run(run())
+
+
+def test_dropped_counters_never_go_back():
+    backend = MemoryCacheBackend(max_counters=3)
+
+    async def run():
+        for _ in range(5):
+            await backend.incr("post:1")
+        seen = await backend.get_counters(["post:1"])
+        for post_id in range(2, 10):
+            await backend.incr(f"post:{post_id}")
+
+        assert len(backend._counters) == 3
+        # post:1 was dropped at 5, and never reads a value below that again
+        dropped = (await backend.get_counters(["post:1"]))[0]
+        assert dropped >= seen[0]
+        await backend.incr("post:1")
+        assert (await backend.get_counters(["post:1"]))[0] > dropped
+
+    asyncio.run(run())
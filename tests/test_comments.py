@@ -0,0 +1,88 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.services.comment_service import MAX_THREAD_DEPTH
+
+
+def comment(client, post_id: int, parent_id: int = None) -> dict:
+    response = client.post("/api/posts/comments", json={
+        "post_id": post_id, "parent_id": parent_id, "author_name": "Reader", "author_email": "reader@example.com",
+        "content": "A thoughtful comment."
+    })
+    assert response.status_code == 201, response.text
+    return response.json()
+
+
+def shown_ids(threads) -> list:
+    return [comment_id for thread in threads for comment_id in [thread["id"]] + shown_ids(thread["replies"])]
+
+
+def counts(client, post_id: int):
+    shown = shown_ids(client.get(f"/api/posts/{post_id}/comments?size=50").json()["content"])
+    return client.get(f"/api/posts/{post_id}/comments/count").json()["count"], len(shown)
+
+
+def test_reply_is_approved_only_after_its_parent(seeded_client):
+    parent = comment(seeded_client, 1)
+    reply = comment(seeded_client, 1, parent["id"])
+
+    response = seeded_client.patch(f"/api/posts/comments/{reply['id']}/approve")
+    assert response.status_code == 400
+    assert counts(seeded_client, 1) == (0, 0)
+
+    assert seeded_client.patch(f"/api/posts/comments/{parent['id']}/approve").status_code == 200
+    assert seeded_client.patch(f"/api/posts/comments/{reply['id']}/approve").status_code == 200
+    assert counts(seeded_client, 1) == (2, 2)
+
+
+def test_auto_approved_reply_to_a_pending_comment_waits(seeded_client, monkeypatch):
+    parent = comment(seeded_client, 2)
+    monkeypatch.setattr(settings, "COMMENTS_AUTO_APPROVE", True)
+
+    reply = comment(seeded_client, 2, parent["id"])
+
+    assert reply["approved"] is False
+    assert counts(seeded_client, 2) == (0, 0)
+
+
+def test_replies_deeper_than_shown_are_refused(seeded_client, monkeypatch):
+    monkeypatch.setattr(settings, "COMMENTS_AUTO_APPROVE", True)
+    parent_id = None
+    for _ in range(MAX_THREAD_DEPTH + 1):
+        parent_id = comment(seeded_client, 3, parent_id)["id"]
+
+    response = seeded_client.post("/api/posts/comments", json={
+        "post_id": 3, "parent_id": parent_id, "author_name": "Reader", "author_email": "reader@example.com",
+        "content": "One level too deep."
+    })
+
+    assert response.status_code == 400
+    assert counts(seeded_client, 3) == (MAX_THREAD_DEPTH + 1, MAX_THREAD_DEPTH + 1)
+
+
+def test_posts_api_without_the_comments_api_adds_the_comment_count(engine):
+    from app.api import blog_posts
+
+    with engine.begin() as connection:
+        connection.execute(text("ALTER TABLE blog_posts DROP COLUMN comment_count"))
+        connection.execute(text(
+            "INSERT INTO blog_posts (id, title, content, published, view_count, is_ai_generated, created_at) "
+            "VALUES (1, 'First', 'First post.', 1, 0, 0, '2024-01-01')"
+        ))
+        connection.execute(text(
+            "INSERT INTO blog_comments (id, post_id, author_name, author_email, content, approved, created_at) "
+            "VALUES (1, 1, 'Reader', 'reader@example.com', 'Nice.', 1, '2024-01-02')"
+        ))
+
+    # Pooled connections keep the table_info they read before the column was dropped
+    engine.dispose()
+
+    app = FastAPI()
+    app.include_router(blog_posts.router, prefix="/api")
+    with TestClient(app) as client:
+        assert client.get("/api/posts").status_code == 200
+        assert client.get("/api/posts/1").status_code == 200
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT comment_count FROM blog_posts")).scalar() == 1
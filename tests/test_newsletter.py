@@ -0,0 +1,56 @@
+import re
+from urllib.parse import urlsplit
+
+from sqlalchemy import select, text
+
+from app.models.newsletter import NewsletterSubscription
+from app.services.newsletter_service import unsubscribe_url
+from tests.conftest import start_client
+
+
+def is_active(session, email: str) -> bool:
+    session.expire_all()
+    return session.execute(select(NewsletterSubscription.active).where(NewsletterSubscription.email == email)).scalar()
+
+
+def test_opening_the_unsubscribe_link_changes_nothing(client, session):
+    client.post("/api/newsletter/subscribe", json={"email": "Reader@Example.com", "language": "en"})
+    link = urlsplit(unsubscribe_url("reader@example.com"))
+    path = f"{link.path}?{link.query}"
+
+    page = client.get(path)
+    assert page.status_code == 200 and page.headers["content-type"].startswith("text/html")
+    assert is_active(session, "reader@example.com")
+
+    # The page's form posts back to the same link
+    action = re.search(r'<form method="post" action="([^"]+)"', page.text).group(1).replace("&amp;", "&")
+    response = client.post(link.path + action, headers={"Accept": "text/html"})
+    assert response.status_code == 200 and "reader@example.com" in response.text
+    assert not is_active(session, "reader@example.com")
+
+
+def test_one_click_unsubscribe_and_bad_links(client, session):
+    client.post("/api/newsletter/subscribe", json={"email": "other@example.com", "language": "bn"})
+    link = urlsplit(unsubscribe_url("other@example.com"))
+
+    response = client.post(f"{link.path}?{link.query}", data={"List-Unsubscribe": "One-Click"})
+    assert response.json() == {"email": "other@example.com", "active": False}
+    assert not is_active(session, "other@example.com")
+
+    forged = f"{link.path}?email=other@example.com&token=0000"
+    assert client.get(forged).status_code == 403
+    assert client.post(forged).status_code == 403
+
+
+def test_issues_work_on_a_database_from_before_them(engine):
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE newsletter_deliveries"))
+        connection.execute(text("DROP TABLE newsletter_issues"))
+        connection.execute(text(
+            "INSERT INTO blog_posts (id, title, content, published, created_at) VALUES (1, 'First', 'First post.', 1, '2024-01-01')"
+        ))
+
+    with start_client() as client:
+        response = client.post("/api/newsletter/issues", json={"subject": "Weekly", "post_ids": [1]})
+        assert response.status_code == 201, response.text
+        assert client.get(f"/api/newsletter/issues/{response.json()['id']}").status_code == 200
@@ -0,0 +1,28 @@
+from sqlalchemy import text
+
+
+def test_required_fields_cant_be_cleared(client):
+    page = {"slug": "about", "title": "About", "content": "About this blog."}
+    assert client.post("/api/pages", json=page).status_code == 201
+
+    for field in ("title", "content", "published"):
+        response = client.put("/api/pages/about", json={field: None})
+        assert response.status_code == 422, field
+
+    # Translations are optional and may be cleared
+    assert client.put("/api/pages/about", json={"title_bn": None}).status_code == 200
+    assert client.get("/api/pages/about").json()["title"] == "About"
+
+
+def test_update_rejected_by_the_database_is_a_bad_request(engine, client):
+    client.post("/api/pages", json={"slug": "terms", "title": "Terms", "content": "The terms."})
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TRIGGER pages_no_spam BEFORE UPDATE ON pages WHEN new.content LIKE '%spam%' "
+            "BEGIN SELECT RAISE(ABORT, 'CHECK constraint failed: no spam'); END"
+        ))
+
+    response = client.put("/api/pages/terms", json={"content": "Buy spam now."})
+
+    assert response.status_code == 400
+    assert client.get("/api/pages/terms").json()["content"] == "The terms."
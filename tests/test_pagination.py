@@ -0,0 +1,70 @@
+import base64
+import json
+
+import pytest
+from sqlalchemy import inspect, text, update
+
+from app.models.blog_post import BlogPost
+from app.services.blog_post_service import migrate_post_indexes
+from app.services.pagination import decode_cursor, encode_cursor
+from tests.conftest import SEEDED_POSTS
+
+
+def cursor_of(value) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("raw", [
+    ["created_at", 1, 2],
+    ["created_at", "yesterday", 2],
+    ["created_at", "2024-01-01T00:00:00", "2"],
+    ["created_at", "2024-01-01T00:00:00", None],
+    ["view_count", "10", 2],
+    ["view_count", True, 2],
+    ["title", 5, 2],
+    ["created_at", "2024-01-01T00:00:00"],
+    {"created_at": 1},
+    "created_at",
+])
+def test_malformed_cursors_are_rejected(raw):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(cursor_of(raw), raw[0] if isinstance(raw, list) else "created_at")
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor("view_count", 12, 7), "view_count") == (12, 7)
+    assert decode_cursor(encode_cursor("relevance", -1.5, 7), "relevance") == (-1.5, 7)
+    with pytest.raises(ValueError, match="sort order"):
+        decode_cursor(encode_cursor("view_count", 12, 7), "title")
+
+
+def test_crafted_cursor_is_a_bad_request(seeded_client):
+    for path in ("/api/posts", "/api/posts/tag/tag1", "/api/posts/search?keyword=python&"):
+        separator = "&" if "?" in path else "?"
+        response = seeded_client.get(f"{path}{separator}cursor={cursor_of(['created_at', 1, 2])}")
+        assert response.status_code == 400, path
+
+
+def test_view_count_cursor_walks_posts_with_null_counts(engine, seeded_client):
+    with engine.begin() as connection:
+        connection.execute(update(BlogPost).where(BlogPost.id <= 10).values(view_count=None))
+
+    seen, cursor = [], ""
+    while cursor is not None:
+        page = seeded_client.get(f"/api/posts?sort_by=view_count&size=7&cursor={cursor}").json()
+        seen += [post["id"] for post in page["content"]]
+        cursor = page["next_cursor"]
+
+    assert sorted(seen) == list(range(1, SEEDED_POSTS + 1))
+
+
+def test_feed_indexes_are_added_to_an_existing_table(engine):
+    with engine.begin() as connection:
+        connection.execute(text("DROP INDEX ix_blog_posts_published_created_at"))
+        connection.execute(text("DROP INDEX ix_blog_posts_published_view_count"))
+
+    migrate_post_indexes(engine)
+    migrate_post_indexes(engine)  # does nothing the second time
+
+    indexes = {index["name"] for index in inspect(engine).get_indexes("blog_posts")}
+    assert {"ix_blog_posts_published_created_at", "ix_blog_posts_published_view_count"} <= indexes
@@ -0,0 +1,77 @@
+import asyncio
+import random
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, select
+
+from app.core.cache import response_cache
+from app.core.database import SessionLocal
+from app.models.poll import PollOption, PollVote
+from app.schemas.poll import PollCreate
+from app.services.poll_service import DUPLICATE, RECORDED, PollService, PollVoteBatcher
+
+
+def test_poll_must_expire_in_the_future(client):
+    poll = {"question": "Tabs or spaces?", "options": ["Tabs", "Spaces"]}
+    past = (datetime.now(timezone.utc) - timedelta(minutes=1)).isoformat()
+    future = (datetime.now(timezone.utc) + timedelta(days=1)).isoformat()
+
+    response = client.post("/api/polls", json={**poll, "expires_at": past})
+    assert response.status_code == 400
+    assert client.post("/api/polls", json={**poll, "expires_at": future}).status_code == 201
+    assert client.post("/api/polls", json=poll).status_code == 201
+
+
+def test_concurrent_votes_match_the_counts(client):
+    polls = [
+        client.post("/api/polls", json={"question": f"Question {i}?", "options": ["A", "B", "C"]}).json()
+        for i in range(2)
+    ]
+    rng = random.Random(5)
+    # 400 votes from 120 IPs, so most IPs vote more than once
+    votes = []
+    for _ in range(400):
+        poll = rng.choice(polls)
+        votes.append((poll["id"], rng.choice(poll["options"])["id"], f"10.0.0.{rng.randrange(120)}"))
+
+    async def run():
+        batcher = PollVoteBatcher(SessionLocal, max_batch=50)
+        try:
+            return await asyncio.gather(*(batcher.submit(*vote) for vote in votes))
+        finally:
+            await batcher.stop()
+
+    outcomes = asyncio.run(run())
+
+    assert set(outcomes) <= {RECORDED, DUPLICATE}
+    first_votes = {(poll_id, ip) for poll_id, _, ip in votes}
+    assert outcomes.count(RECORDED) == len(first_votes)
+    with SessionLocal() as db:
+        rows = dict(db.execute(select(PollVote.option_id, func.count()).group_by(PollVote.option_id)).all())
+        counts = dict(db.execute(select(PollOption.id, PollOption.vote_count)).all())
+    assert sum(rows.values()) == len(first_votes)
+    assert {option_id: count for option_id, count in counts.items() if count} == rows
+
+
+def test_votes_are_written_when_the_cache_fails(session, monkeypatch):
+    poll = asyncio.run(PollService(session).create_poll(PollCreate(question="Question?", options=["A", "B"])))
+    option_id = poll["options"][0]["id"]
+
+    async def unreachable(*scopes):
+        raise ConnectionError("cache is down")
+
+    async def run():
+        batcher = PollVoteBatcher(SessionLocal)
+        try:
+            # One after the other, each in its own batch
+            return [
+                await asyncio.wait_for(batcher.submit(poll["id"], option_id, f"10.0.1.{i}"), timeout=5)
+                for i in range(3)
+            ]
+        finally:
+            await batcher.stop()
+
+    with monkeypatch.context() as patch:
+        patch.setattr(response_cache, "invalidate", unreachable)
+        outcomes = asyncio.run(run())
+    assert outcomes == [RECORDED] * 3
@@ -0,0 +1,34 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+
+from app.core.database import SessionLocal
+from app.models.blog_post import BlogPost
+from app.services.related_posts import RelatedPosts
+from app.services.view_counter import ViewCounter
+from benchmarks.common import seed_posts
+
+
+def test_views_leave_posts_out_of_the_sync(engine):
+    seed_posts(engine, 10)
+    written_at = datetime.utcnow() - timedelta(days=1)
+    with engine.begin() as connection:
+        connection.execute(update(BlogPost).values(created_at=written_at, updated_at=written_at))
+    related = RelatedPosts(SessionLocal)
+    related.build()
+    since = datetime.utcnow() - timedelta(seconds=5)
+
+    counter = ViewCounter(SessionLocal)
+    for post_id in range(1, 11):
+        counter.add(post_id, 3)
+    assert counter.flush() == 30
+
+    with engine.connect() as connection:
+        rows = connection.execute(select(BlogPost.view_count, BlogPost.updated_at)).all()
+    assert all(row.updated_at == written_at for row in rows)
+    # Nothing was edited, so the sync has no post to index again
+    assert related.update(since) == 0
+
+    with engine.begin() as connection:
+        connection.execute(update(BlogPost).where(BlogPost.id == 4).values(title="Edited"))
+    assert related.update(since) == 1
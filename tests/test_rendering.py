@@ -0,0 +1,72 @@
+import json
+import re
+
+from sqlalchemy import select
+
+from app.models.blog_post import BlogPost
+
+XSS_CONTENT = (
+    "Hello <script>alert(1)</script> world.\n\n"
+    "[click](javascript:alert(1)) and [also](JaVaScRiPt:alert(2)) "
+    "<img src=x onerror=alert(3)> <a href=\"javascript:alert(4)\">raw</a>"
+)
+
+
+def stored(engine, post_id: int):
+    with engine.connect() as connection:
+        return connection.execute(
+            select(BlogPost.content_html, BlogPost.excerpt).where(BlogPost.id == post_id)
+        ).one()
+
+
+def assert_sanitized(html: str):
+    # Raw HTML is kept as text, unsafe links as their markdown
+    assert "<script" not in html.lower() and "<img" not in html.lower()
+    assert not re.search(r"href\s*=\s*[\"']?\s*javascript:", html, re.IGNORECASE)
+    assert "&lt;script&gt;alert(1)&lt;/script&gt;" in html
+
+
+def test_created_post_is_stored_sanitized(engine, client):
+    post = client.post("/api/posts", json={"title": "Vectors", "content": XSS_CONTENT, "author": "Tester"}).json()
+
+    html, _ = stored(engine, post["id"])
+    assert_sanitized(html)
+    assert post["content_html"] == html
+
+
+def test_updated_and_imported_posts_are_stored_sanitized(engine, client):
+    post_id = client.post("/api/posts", json={"title": "Safe", "content": "Nothing to see here."}).json()["id"]
+    client.put(f"/api/posts/{post_id}", json={"content": XSS_CONTENT})
+    assert_sanitized(stored(engine, post_id).content_html)
+
+    batch_id = client.post("/api/posts", json={"title": "Batch", "content": "Nothing to see here."}).json()["id"]
+    client.patch("/api/posts/batch", json={"posts": [{"id": batch_id, "content": XSS_CONTENT}]})
+    assert_sanitized(stored(engine, batch_id).content_html)
+
+    report = client.post("/api/posts/import", content=json.dumps({"title": "Imported", "content": XSS_CONTENT})).json()
+    assert report["imported"] == 1
+    with engine.connect() as connection:
+        imported_id = connection.execute(select(BlogPost.id).where(BlogPost.title == "Imported")).scalar_one()
+    assert_sanitized(stored(engine, imported_id).content_html)
+
+
+def test_new_content_gets_a_new_excerpt_unless_one_is_sent(engine, client):
+    post_id = client.post("/api/posts", json={"title": "Excerpts", "content": "The first version of the text."}).json()["id"]
+    batch_id = client.post("/api/posts", json={"title": "Excerpts", "content": "The first version of the text."}).json()["id"]
+    assert stored(engine, post_id).excerpt == "The first version of the text."
+
+    client.put(f"/api/posts/{post_id}", json={"content": "The second version of the text."})
+    client.patch("/api/posts/batch", json={"posts": [{"id": batch_id, "content": "The second version of the text."}]})
+    assert stored(engine, post_id).excerpt == "The second version of the text."
+    assert stored(engine, batch_id).excerpt == "The second version of the text."
+
+    client.put(f"/api/posts/{post_id}", json={"content": "The third version of the text.", "excerpt": "Chosen"})
+    client.patch("/api/posts/batch", json={"posts": [
+        {"id": batch_id, "content": "The third version of the text.", "excerpt": "Chosen"}
+    ]})
+    assert stored(engine, post_id).excerpt == "Chosen"
+    assert stored(engine, batch_id).excerpt == "Chosen"
+
+    # An excerpt stays with the text it was written for, until that changes
+    client.put(f"/api/posts/{post_id}", json={"title": "Renamed"})
+    assert stored(engine, post_id).excerpt == "Chosen"
@@ -0,0 +1,58 @@
+from sqlalchemy import text, update
+
+from app.models.blog_post import BlogPost
+from app.services.search_service import init_search_index
+
+
+def search(client, keyword: str) -> dict:
+    response = client.get(f"/api/posts/search?keyword={keyword}")
+    assert response.status_code == 200
+    return {post["id"]: post for post in response.json()["content"]}
+
+
+def test_snippets_escape_the_post_text(client):
+    post = client.post("/api/posts", json={
+        "title": "Markup in the body",
+        "content": 'Before <script>alert("x")</script> the zebrafish <img src=x onerror=alert(1)> after',
+        "published": True
+    }).json()
+
+    snippet = search(client, "zebrafish")[post["id"]]["snippet"]
+
+    assert "<mark>zebrafish</mark>" in snippet
+    assert "<script>" not in snippet and "<img" not in snippet
+    assert "&lt;script&gt;alert(&quot;x&quot;)&lt;/script&gt;" in snippet
+    assert snippet.replace("<mark>", "").replace("</mark>", "").count("<") == 0
+
+
+def test_translated_excerpts_are_searched(engine, client):
+    post = client.post("/api/posts", json={
+        "title": "Translated post", "content": "Only English words here.", "published": True
+    }).json()
+    with engine.begin() as connection:
+        connection.execute(update(BlogPost).where(BlogPost.id == post["id"]).values(
+            excerpt_bn="বাংলা সারাংশ", excerpt_hi="हिंदी सारांश"
+        ))
+
+    assert post["id"] in search(client, "সারাংশ")
+    assert post["id"] in search(client, "सारांश")
+
+
+def test_search_table_without_the_excerpt_columns_is_rebuilt(engine, client):
+    post = client.post("/api/posts", json={
+        "title": "Older index", "content": "Indexed before the upgrade.", "published": True
+    }).json()
+    with engine.begin() as connection:
+        for trigger in ("insert", "delete", "update"):
+            connection.execute(text(f"DROP TRIGGER blog_posts_fts_{trigger}"))
+        connection.execute(text("DROP TABLE blog_posts_fts"))
+        connection.execute(text(
+            "CREATE VIRTUAL TABLE blog_posts_fts USING fts5(title, excerpt, content, title_bn, content_bn, "
+            "title_hi, content_hi, content='blog_posts', content_rowid='id')"
+        ))
+        connection.execute(update(BlogPost).where(BlogPost.id == post["id"]).values(excerpt_hi="हिंदी सारांश"))
+
+    init_search_index(engine)
+
+    assert post["id"] in search(client, "सारांश")
+    assert post["id"] in search(client, "upgrade")
@@ -0,0 +1,31 @@
+from sqlalchemy import inspect, text
+
+from app.services.tag_service import migrate_tag_links
+
+
+def test_tag_links_are_migrated_from_a_database_without_a_tags_table(engine):
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE blog_post_tags"))
+        connection.execute(text("DROP TABLE tags"))
+        connection.execute(text(
+            "CREATE TABLE blog_post_tags (id INTEGER PRIMARY KEY, post_id BIGINT NOT NULL, tag VARCHAR(50))"
+        ))
+        connection.execute(text(
+            "INSERT INTO blog_posts (id, title, content, published, created_at) "
+            "VALUES (1, 'First', 'First post.', 1, '2024-01-01'), (2, 'Second', 'Second post.', 1, '2024-01-02')"
+        ))
+        connection.execute(text(
+            "INSERT INTO blog_post_tags (post_id, tag) "
+            "VALUES (1, 'python'), (1, 'web'), (1, 'python'), (2, 'python')"
+        ))
+
+    migrate_tag_links(engine)
+    migrate_tag_links(engine)  # does nothing the second time
+
+    assert "tag" not in {column["name"] for column in inspect(engine).get_columns("blog_post_tags")}
+    with engine.connect() as connection:
+        links = connection.execute(text(
+            "SELECT post_id, name FROM blog_post_tags JOIN tags ON tags.id = blog_post_tags.tag_id "
+            "ORDER BY post_id, name"
+        )).all()
+    assert [tuple(link) for link in links] == [(1, "python"), (1, "web"), (2, "python")]
@@ -0,0 +1,26 @@
+from sqlalchemy import func, select, text
+
+from app.models.blog_post import BlogPost
+from app.models.blog_stat import PostViewBucket
+from app.services.trending import trending_posts
+from app.services.view_counter import view_counter
+from tests.conftest import start_client
+
+
+def test_views_are_flushed_on_a_database_from_before_the_buckets(engine):
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE post_view_buckets"))
+        connection.execute(text(
+            "INSERT INTO blog_posts (id, title, content, published, view_count, created_at) "
+            "VALUES (1, 'First', 'First post.', 1, 0, '2024-01-01')"
+        ))
+
+    with start_client():
+        view_counter.add(1, 3)
+        assert view_counter.flush() == 3
+        assert view_counter.pending(1) == 0
+        trending_posts.refresh()
+
+    with engine.connect() as connection:
+        assert connection.execute(select(BlogPost.view_count).where(BlogPost.id == 1)).scalar() == 3
+        assert connection.execute(select(func.sum(PostViewBucket.views))).scalar() == 3
@@ -0,0 +1,129 @@
+import asyncio
+import hashlib
+import tracemalloc
+
+import pytest
+
+from app.core.config import settings
+
+BOUNDARY = "upload-test-boundary"
+CHUNK = bytes(range(256)) * 256  # 64 KiB
+
+
+@pytest.fixture
+def upload_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def app(engine):
+    """The API without its startup tasks, whose background work would count in the peak memory"""
+    from benchmarks.common import build_app
+
+    return build_app()
+
+
+def multipart_body(filename: str, chunks: int):
+    """The parts of a multipart body holding `chunks` CHUNKs as its `file` field"""
+    yield (
+        f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+        "Content-Type: application/octet-stream\r\n\r\n"
+    ).encode()
+    for _ in range(chunks):
+        yield CHUNK
+    yield f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+def post_upload(app, parts, content_length=None, trace=False):
+    """POST the body parts one message at a time
+
+    Returns the status, how many bytes the app read, and with `trace` the
+    peak memory allocated meanwhile.
+    """
+    headers = [(b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode())]
+    if content_length is not None:
+        headers.append((b"content-length", str(content_length).encode()))
+    scope = {
+        "type": "http", "http_version": "1.1", "method": "POST", "scheme": "http",
+        "path": "/api/upload/image", "raw_path": b"/api/upload/image", "root_path": "",
+        "query_string": b"", "headers": headers, "server": ("test", 80), "client": ("test", 1234)
+    }
+    parts = iter(parts)
+    received = {"bytes": 0}
+    sent = {}
+
+    async def receive():
+        part = next(parts, None)
+        if part is None:
+            return {"type": "http.request", "body": b"", "more_body": False}
+        received["bytes"] += len(part)
+        return {"type": "http.request", "body": part, "more_body": True}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            sent["status"] = message["status"]
+
+    if not trace:
+        asyncio.run(app(scope, receive, send))
+        return sent["status"], received["bytes"], None
+    tracemalloc.start()
+    try:
+        asyncio.run(app(scope, receive, send))
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return sent["status"], received["bytes"], peak
+
+
+def test_upload_streams_to_disk_in_bounded_memory(app, upload_dir):
+    # Warm up first: the first request compiles queries and starts threads
+    assert post_upload(app, multipart_body("small.gif", 1))[0] == 200
+
+    chunks = 48  # 3 MiB
+    status, _, peak = post_upload(app, multipart_body("big.gif", chunks), trace=True)
+
+    assert status == 200
+    digest = hashlib.sha256(CHUNK * chunks).hexdigest()
+    assert (upload_dir / f"{digest}.gif").stat().st_size == len(CHUNK) * chunks
+    assert peak < 1024 * 1024
+    assert not list(upload_dir.glob(".*.part"))
+
+
+def test_oversized_upload_stops_reading_at_the_limit(app, upload_dir, monkeypatch):
+    monkeypatch.setattr(settings, "MAX_FILE_SIZE", 1024 * 1024)
+    chunks = settings.MAX_FILE_SIZE // len(CHUNK) * 3
+    status, read, _ = post_upload(app, multipart_body("huge.gif", chunks))
+
+    assert status == 400
+    assert read < settings.MAX_FILE_SIZE + 2 * len(CHUNK)
+    assert not list(upload_dir.iterdir())
+
+    # Announced as too large: refused before reading the body
+    status, read, _ = post_upload(app, multipart_body("huge.gif", chunks), len(CHUNK) * chunks)
+    assert status == 400 and read == 0
+
+
+def test_disallowed_type_is_refused_before_the_file_is_read(app, upload_dir):
+    status, read, _ = post_upload(app, multipart_body("script.svg", 100))
+
+    assert status == 400
+    assert read <= 2 * len(CHUNK)
+
+
+def test_shared_file_is_kept_until_its_last_upload_is_deleted(client, upload_dir):
+    files = {"file": ("photo.gif", b"GIF89a same bytes", "image/gif")}
+    first = client.post("/api/upload/image", files=files).json()
+    second = client.post("/api/upload/image", files=files).json()
+    assert first["filename"] == second["filename"] and second["duplicate"]
+
+    path = upload_dir / first["filename"]
+    assert client.delete(f"/api/upload/images/{first['filename']}").status_code == 200
+    assert path.exists()
+    assert client.delete(f"/api/upload/images/{first['filename']}").status_code == 200
+    assert not path.exists()
+    assert client.delete(f"/api/upload/images/{first['filename']}").status_code == 404
+
+    # Uploaded again after it was removed: stored again
+    third = client.post("/api/upload/image", files=files).json()
+    assert not third["duplicate"] and path.exists()